@@ -0,0 +1,396 @@
+import os
+import wave
+import struct
+import bisect
+import threading
+
+np = None  # numpy, imported by peaks_available() on first use so importing this module stays cheap
+
+# Waveform peaks: level 0 holds min/max per PEAK_BLOCK samples, each level above merges PEAK_FACTOR peaks
+PEAK_BLOCK = 256
+PEAK_FACTOR = 4
+PEAK_SCAN_SAMPLES = 1 << 20  # samples read from the memory map per step
+PEAKS_SUFFIX = ".peaks"
+
+
+def read_wav(path):
+    """Return ((channels, sample_width, sample_rate), frames) for a WAV file"""
+    with wave.open(path, "rb") as wav_file:
+        params = (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+        frames = wav_file.readframes(wav_file.getnframes())
+    return params, frames
+
+
+def write_wav(path, frames, params):
+    """Write raw PCM frames to a WAV file"""
+    channels, sample_width, sample_rate = params
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames)
+
+
+def silence(params, milliseconds):
+    """PCM silence of the given length"""
+    channels, sample_width, sample_rate = params
+    frame_count = int(sample_rate * milliseconds / 1000)
+    return b"\x00" * (frame_count * channels * sample_width)
+
+
+def join_pcm(parts, output_file, silence_ms=0):
+    """Write (params, frames) parts of one format to a WAV file, separated by silence
+
+    Returns (offset, size) of every part within the data chunk.
+    """
+    params = None
+    gap = b""
+    layout = []
+    position = 0
+    tmp_file = output_file + ".tmp"
+    with wave.open(tmp_file, "wb") as out:
+        for index, (part_params, frames) in enumerate(parts):
+            if params is None:
+                params = part_params
+                out.setnchannels(params[0])
+                out.setsampwidth(params[1])
+                out.setframerate(params[2])
+                gap = silence(params, silence_ms)
+            elif part_params != params:
+                raise ValueError(f"Part {index + 1} has format {part_params}, expected {params}")
+            if index and gap:
+                out.writeframes(gap)
+                position += len(gap)
+            out.writeframes(frames)
+            layout.append((position, len(frames)))
+            position += len(frames)
+    os.replace(tmp_file, output_file)
+    return layout
+
+
+def wav_data_layout(path):
+    """Return ((channels, sample_width, sample_rate), data_offset, data_size) by walking the RIFF chunks"""
+    with open(path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{os.path.basename(path)} is not a WAV file")
+        params = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{os.path.basename(path)} has no data chunk")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                channels, sample_rate = struct.unpack("<HI", fmt[2:8])
+                params = (channels, struct.unpack("<H", fmt[14:16])[0] // 8, sample_rate)
+                chunk_size = 0
+            elif chunk_id == b"data":
+                if params is None:
+                    raise ValueError(f"{os.path.basename(path)} has no fmt chunk")
+                data_size = min(chunk_size, os.path.getsize(path) - f.tell())
+                return params, f.tell(), data_size
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def peaks_available():
+    """Import numpy if it is installed; waveform peaks need it"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class PeakLevel:
+    """Min/max arrays of one pyramid level with amortized O(1) appends"""
+
+    def __init__(self, mins=None, maxs=None):
+        self._mins = np.zeros(1024, dtype=np.int16) if mins is None else mins
+        self._maxs = np.zeros(1024, dtype=np.int16) if maxs is None else maxs
+        self.length = 0 if mins is None else len(mins)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def mins(self):
+        return self._mins[:self.length]
+
+    @property
+    def maxs(self):
+        return self._maxs[:self.length]
+
+    def extend(self, mins, maxs):
+        end = self.length + len(mins)
+        if end > len(self._mins):
+            capacity = max(end, 2 * len(self._mins))
+            self._mins = np.concatenate([self.mins, np.zeros(capacity - self.length, dtype=np.int16)])
+            self._maxs = np.concatenate([self.maxs, np.zeros(capacity - self.length, dtype=np.int16)])
+        self._mins[self.length:end] = mins
+        self._maxs[self.length:end] = maxs
+        self.length = end
+
+
+class PeakPyramid:
+    """Min/max peaks of 16-bit audio at several resolutions, extended as samples arrive
+
+    Drawing asks for one min/max pair per pixel; picking the coarsest level
+    that still has at least one peak per pixel keeps that O(width) however
+    long the audio is.
+    """
+
+    def __init__(self, sample_rate, channels=1):
+        if not peaks_available():
+            raise RuntimeError("numpy is needed for waveform peaks")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_count = 0  # frames appended so far
+        self.pending = np.zeros(0, dtype=np.int16)  # frames not filling a whole block yet
+        self.levels = [PeakLevel()]
+        self.version = 0
+
+    def append(self, samples):
+        """Add interleaved int16 samples (a NumPy array or raw little-endian bytes)"""
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype="<i2")
+        if self.channels > 1:
+            # Keep each frame's extremes as a (min, max) pair so blocks still see the loudest channel
+            frames = samples[:len(samples) - len(samples) % self.channels].reshape(-1, self.channels)
+            values = np.stack([frames.min(axis=1), frames.max(axis=1)], axis=1).reshape(-1)
+            width = 2 * PEAK_BLOCK
+            self.sample_count += len(frames)
+        else:
+            values = samples
+            width = PEAK_BLOCK
+            self.sample_count += len(samples)
+
+        pending = np.concatenate([self.pending, values])
+        complete = len(pending) - len(pending) % width
+        if complete:
+            blocks = pending[:complete].reshape(-1, width)
+            self._extend(0, blocks.min(axis=1), blocks.max(axis=1))
+        self.pending = pending[complete:].copy()
+        self.version += 1
+
+    def finish(self):
+        """Turn the trailing partial block into a peak once no more samples will arrive"""
+        if len(self.pending):
+            self._extend(0, self.pending.min(keepdims=True), self.pending.max(keepdims=True))
+            self.pending = np.zeros(0, dtype=np.int16)
+            self.version += 1
+
+    def _extend(self, level, mins, maxs):
+        """Append peaks to a level and fold the newly completed groups into the level above"""
+        while True:
+            current = self.levels[level]
+            current.extend(mins, maxs)
+            if len(current) < PEAK_FACTOR:
+                return
+            if level + 1 == len(self.levels):
+                self.levels.append(PeakLevel())
+            start = len(self.levels[level + 1]) * PEAK_FACTOR
+            end = len(current) - len(current) % PEAK_FACTOR
+            if end <= start:
+                return
+            mins = current.mins[start:end].reshape(-1, PEAK_FACTOR).min(axis=1)
+            maxs = current.maxs[start:end].reshape(-1, PEAK_FACTOR).max(axis=1)
+            level += 1
+
+    def peaks(self, start, end, columns):
+        """(mins, maxs) of frames start..end reduced to at most `columns` pairs"""
+        end = min(end, self.sample_count)
+        if columns <= 0 or end <= start or not len(self.levels[0]):
+            return np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int16)
+        frames_per_column = (end - start) / columns
+        level = 0
+        while level + 1 < len(self.levels) and len(self.levels[level + 1]) and \
+                PEAK_BLOCK * PEAK_FACTOR ** (level + 1) <= frames_per_column:
+            level += 1
+        block = PEAK_BLOCK * PEAK_FACTOR ** level
+        first = start // block
+        last = min(len(self.levels[level]), -(-end // block))
+        mins = self.levels[level].mins[first:last]
+        maxs = self.levels[level].maxs[first:last]
+        if len(mins) > columns:
+            edges = np.linspace(0, len(mins), columns, endpoint=False).astype(np.int64)
+            mins = np.minimum.reduceat(mins, edges)
+            maxs = np.maximum.reduceat(maxs, edges)
+        return mins, maxs
+
+    @property
+    def duration(self):
+        return self.sample_count / self.sample_rate if self.sample_rate else 0.0
+
+    def save(self, path, source_path):
+        """Write the pyramid to a sidecar file stamped with the size and mtime of the WAV it describes"""
+        stat = os.stat(source_path)
+        arrays = {"meta": np.array([self.sample_rate, self.channels, self.sample_count,
+                                    stat.st_size, stat.st_mtime_ns], dtype=np.int64)}
+        for index, level in enumerate(self.levels):
+            arrays[f"min{index}"] = level.mins
+            arrays[f"max{index}"] = level.maxs
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source_path):
+        """Read a sidecar file, or return None if it is missing or does not match the WAV"""
+        if not peaks_available():
+            return None
+        try:
+            stat = os.stat(source_path)
+            with np.load(path) as data:
+                sample_rate, channels, sample_count, size, mtime_ns = data["meta"].tolist()
+                if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                    return None
+                pyramid = cls(sample_rate, channels)
+                pyramid.sample_count = sample_count
+                levels = sum(1 for name in data.files if name.startswith("min"))
+                pyramid.levels = [PeakLevel(data[f"min{level}"], data[f"max{level}"]) for level in range(levels)]
+                return pyramid
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def from_wav(cls, path):
+        """Build the pyramid of a 16-bit WAV, reading the samples through a memory map"""
+        (channels, sample_width, sample_rate), offset, size = wav_data_layout(path)
+        if sample_width != 2:
+            raise ValueError(f"Only 16-bit audio is supported, got {sample_width * 8}-bit")
+        pyramid = cls(sample_rate, channels)
+        count = size // 2
+        if count:
+            samples = np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(count,))
+            step = PEAK_SCAN_SAMPLES * channels
+            for position in range(0, count, step):
+                pyramid.append(np.asarray(samples[position:position + step]))
+            del samples
+        pyramid.finish()
+        return pyramid
+
+
+def load_peaks(wav_path):
+    """Peaks of a WAV from its sidecar file, building and saving them when needed"""
+    sidecar = wav_path + PEAKS_SUFFIX
+    pyramid = PeakPyramid.load(sidecar, wav_path)
+    if pyramid is None:
+        pyramid = PeakPyramid.from_wav(wav_path)
+        try:
+            pyramid.save(sidecar, wav_path)
+        except OSError as e:
+            print(f"Log: Could not save waveform peaks: {e}")
+    return pyramid
+
+
+class PcmRingBuffer:
+    """Fixed-size FIFO of PCM bytes between a producer and the audio device"""
+
+    def __init__(self, capacity):
+        self.buffer = bytearray(capacity)
+        self.start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def free(self):
+        return len(self.buffer) - self.size
+
+    def write(self, data):
+        """Copy as much of data as fits and return the number of bytes taken"""
+        with self.lock:
+            count = min(len(data), len(self.buffer) - self.size)
+            end = (self.start + self.size) % len(self.buffer)
+            first = min(count, len(self.buffer) - end)
+            self.buffer[end:end + first] = data[:first]
+            self.buffer[:count - first] = data[first:count]
+            self.size += count
+            return count
+
+    def read(self, max_bytes):
+        """Remove and return up to max_bytes from the front"""
+        with self.lock:
+            count = min(max_bytes, self.size)
+            first = min(count, len(self.buffer) - self.start)
+            data = bytes(self.buffer[self.start:self.start + first]) + bytes(self.buffer[:count - first])
+            self.start = (self.start + count) % len(self.buffer)
+            self.size -= count
+            return data
+
+    def clear(self):
+        with self.lock:
+            self.start = 0
+            self.size = 0
+
+
+class PcmClip:
+    """Synthesized audio held in memory as a growing list of PCM chunks"""
+
+    def __init__(self, params=None):
+        self.params = params  # (channels, sample_width, sample_rate), set by the first chunk
+        self.chunks = []
+        self.offsets = []  # byte offset of each chunk
+        self.size = 0
+        self.complete = False
+
+    def append(self, frames, params=None):
+        if params is not None:
+            if self.params is None:
+                self.params = params
+            elif params != self.params:
+                raise ValueError(f"Audio format {params} does not match {self.params}")
+        if frames:
+            self.offsets.append(self.size)
+            self.chunks.append(frames)
+            self.size += len(frames)
+
+    def finish(self):
+        self.complete = True
+
+    @property
+    def frame_size(self):
+        return self.params[0] * self.params[1] if self.params else 2
+
+    def byte_offset(self, milliseconds):
+        """Offset of the frame playing at milliseconds, clamped to the audio rendered so far"""
+        if not self.params:
+            return 0
+        frame = int(milliseconds * self.params[2] / 1000)
+        return min(frame * self.frame_size, self.size - self.size % self.frame_size)
+
+    def milliseconds(self, byte_offset):
+        if not self.params:
+            return 0
+        return int(byte_offset / self.frame_size * 1000 / self.params[2])
+
+    def read(self, offset, max_bytes):
+        """Up to max_bytes starting at offset, without joining the whole clip"""
+        if offset >= self.size or max_bytes <= 0:
+            return b""
+        index = bisect.bisect_right(self.offsets, offset) - 1
+        parts = []
+        remaining = max_bytes
+        while remaining > 0 and index < len(self.chunks):
+            chunk = self.chunks[index]
+            start = offset - self.offsets[index]
+            part = chunk[start:start + remaining]
+            parts.append(part)
+            remaining -= len(part)
+            offset += len(part)
+            index += 1
+        return b"".join(parts)
+
+    def frames(self):
+        return b"".join(self.chunks)
+
+    def write(self, path):
+        """Write the clip to a WAV file"""
+        write_wav(path, self.frames(), self.params)
+        return path
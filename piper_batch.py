@@ -0,0 +1,283 @@
+"""Headless bulk synthesis from a CSV or JSONL manifest.
+
+Usage:
+    python piper_batch.py manifest.csv --output-dir renders --workers 16
+    python piper_ui.py batch manifest.jsonl --output-dir renders
+    python piper_ui.py batch --text "Hello there" --language en_US --voice libritts_r --speakers all
+
+Each manifest row has the fields id, text, language, voice and quality
+(quality is optional). One WAV per row is written to the output directory
+together with a results.jsonl manifest describing every row.
+
+The optional speaker field (or --speakers for every row) picks speakers of
+a multi-speaker model: "all", names from the model's speaker_id_map, ids
+and id ranges such as "0-99,120". A row is rendered once per speaker. All
+speakers of a model are rendered by the same warm Piper processes, so the
+model is loaded once per process rather than once per speaker.
+"""
+import os
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import as_completed
+
+from piper_paths import MODELS_DIR, CACHE_DIR, MODELS_JSON_PATH, find_piper_exe
+from piper_catalog import (load_model_repository, resolve_voice_quality, model_path_for, model_speakers,
+                           parse_speakers)
+from piper_pool import DEFAULT_MEMORY_BUDGET
+from piper_engine import ENGINES, create_engine
+from piper_cache import SynthesisCache, copy_file
+from piper_metrics import METRICS, format_stage_summary
+
+MANIFEST_FIELDS = ["id", "text", "language", "voice", "quality", "speaker"]
+PROGRESS_INTERVAL = 100  # rows between progress lines
+
+
+def read_manifest(path):
+    """Yield manifest rows as dicts from a .csv or .jsonl file"""
+    if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    row.setdefault("id", str(line_number))
+                    yield row
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for line_number, row in enumerate(csv.DictReader(f), 2):
+                if not row.get("id"):
+                    row["id"] = str(line_number)
+                yield row
+
+
+def safe_filename(row_id):
+    """Turn a manifest id into a file name"""
+    name = re.sub(r"[^\w.-]+", "_", str(row_id)).strip("._")
+    return name[:120] or "item"
+
+
+class BatchRunner:
+    def __init__(self, piper_exe, output_dir, workers, repository, models_dir=MODELS_DIR,
+                 cache=None, memory_budget=DEFAULT_MEMORY_BUDGET, skip_existing=False, engine="auto",
+                 speakers=None):
+        self.output_dir = output_dir
+        self.speakers = speakers  # speaker selection for rows without a speaker field
+        self.model_speakers = {}  # model path -> [(name, speaker id)]
+        self.repository = repository
+        self.models_dir = models_dir
+        self.cache = cache
+        self.skip_existing = skip_existing
+        self.duplicates = {}  # cache key -> results waiting on an in-flight render of the same text
+        self.pool = create_engine(
+            engine,
+            piper_exe,
+            output_dir,
+            workers_per_model=workers,
+            max_workers=workers,
+            memory_budget=memory_budget,
+        )
+
+    def resolve_model(self, row):
+        """Return (model_path, quality) for a manifest row, raising ValueError if unusable"""
+        language_code = row.get("language")
+        voice_id = row.get("voice")
+        quality, quality_info = resolve_voice_quality(self.repository, language_code, voice_id, row.get("quality"))
+        if quality_info is None:
+            raise ValueError(f"Unknown voice {language_code}/{voice_id}")
+        model_path = model_path_for(self.models_dir, language_code, voice_id, quality_info)
+        if not os.path.exists(model_path):
+            raise ValueError(f"Model not downloaded: {model_path}")
+        return model_path, quality
+
+    def expand_speakers(self, row):
+        """The row once per selected speaker; rows without a speaker selection are returned as they are"""
+        spec = row.get("speaker")
+        if spec in (None, ""):
+            spec = self.speakers
+        if spec in (None, ""):
+            return [row]
+        try:
+            model_path, _ = self.resolve_model(row)
+        except ValueError:
+            return [row]  # submit_row reports the error
+        if model_path not in self.model_speakers:
+            self.model_speakers[model_path] = model_speakers(model_path)
+        selected = parse_speakers(spec, self.model_speakers[model_path])
+        if len(selected) == 1:
+            name, speaker_id = selected[0]
+            return [dict(row, speaker=name, speaker_id=speaker_id)]
+        return [dict(row, id=f"{row['id']}_{name}", speaker=name, speaker_id=speaker_id)
+                for name, speaker_id in selected]
+
+    def submit_row(self, row):
+        """Start work for a row; returns (future or None, result dict or None if deferred)"""
+        result = {"id": row["id"], "output": None, "status": "ok", "cached": False}
+        speaker_id = row.get("speaker_id")
+        if speaker_id is not None:
+            result["speaker"] = row["speaker"]
+            result["speaker_id"] = speaker_id
+        text = (row.get("text") or "").strip()
+        if not text:
+            result.update(status="error", error="Empty text")
+            return None, result
+
+        try:
+            with METRICS.span("model_resolution"):
+                model_path, result["quality"] = self.resolve_model(row)
+        except ValueError as e:
+            result.update(status="error", error=str(e))
+            return None, result
+
+        output_file = os.path.join(self.output_dir, safe_filename(row["id"]) + ".wav")
+        result["output"] = output_file
+        if self.skip_existing and os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+            result["cached"] = True
+            return None, result
+
+        if self.cache is not None:
+            params = {"speaker_id": speaker_id} if speaker_id is not None else {}
+            key = result["cache_key"] = self.cache.key_for(model_path, text, params)
+            if key in self.duplicates:
+                self.duplicates[key].append(result)
+                return None, None
+            if self.cache.fetch(key, output_file):
+                result["cached"] = True
+                return None, result
+            self.duplicates[key] = []
+
+        # Renders write the output in place, so an old file there (possibly a hardlink made by an
+        # earlier version of the cache) is removed first rather than written through
+        if os.path.lexists(output_file):
+            os.remove(output_file)
+        return self.pool.submit(model_path, text, output_file, speaker_id), result
+
+    def run(self, rows, results_file):
+        started = time.monotonic()
+        pending = {}
+        done = 0
+        failed = 0
+
+        def record(result):
+            nonlocal done, failed
+            done += 1
+            if result["status"] != "ok":
+                failed += 1
+            METRICS.increment("batch_rows_total", status=result["status"], cached="yes" if result["cached"] else "no")
+            result.pop("cache_key", None)
+            results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            if done % PROGRESS_INTERVAL == 0:
+                elapsed = time.monotonic() - started
+                print(f"Log: {done} rows done ({failed} failed), {done / max(elapsed, 1e-6):.1f} rows/s")
+
+        for manifest_row in rows:
+            try:
+                expanded = self.expand_speakers(manifest_row)
+            except ValueError as e:
+                record({"id": manifest_row["id"], "output": None, "status": "error", "cached": False, "error": str(e)})
+                continue
+            for row in expanded:
+                future, result = self.submit_row(row)
+                if future is not None:
+                    pending[future] = result
+                elif result is not None:
+                    record(result)
+
+        for future in as_completed(pending):
+            result = pending[future]
+            key = result.get("cache_key")
+            try:
+                future.result()
+                if self.cache is not None and "cache_key" in result:
+                    self.cache.put(result["cache_key"], result["output"])
+            except Exception as e:
+                result.update(status="error", error=str(e))
+            record(result)
+
+            # Rows with the same text and voice reuse this render
+            for duplicate in self.duplicates.pop(key, []):
+                if result["status"] == "ok":
+                    copy_file(result["output"], duplicate["output"])
+                    duplicate["cached"] = True
+                else:
+                    duplicate.update(status="error", error=result["error"])
+                record(duplicate)
+
+        elapsed = time.monotonic() - started
+        print(f"Log: Batch finished: {done} rows, {failed} failed, {elapsed:.1f} s")
+        return failed
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="piper_batch", description="Synthesize a CSV/JSONL manifest without the GUI")
+    parser.add_argument("manifest", nargs="?", help="CSV or JSONL file with id, text, language, voice, quality, speaker")
+    parser.add_argument("--text", help="Render this text instead of a manifest (with --language/--voice)")
+    parser.add_argument("--language", help="Language code for --text, e.g. en_US")
+    parser.add_argument("--voice", help="Voice id for --text")
+    parser.add_argument("--quality", help="Voice quality for --text")
+    parser.add_argument("--speakers", help='Speakers for rows without a speaker field: "all", names, ids or ranges like 0-99')
+    parser.add_argument("--output-dir", default="batch_output", help="Directory for the WAV files")
+    parser.add_argument("--results", help="Results manifest path (default: <output-dir>/results.jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of Piper processes")
+    parser.add_argument("--piper", help="Path to the piper executable")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Piper processes or in-process ONNX Runtime")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Directory with downloaded models")
+    parser.add_argument("--models-json", default=MODELS_JSON_PATH, help="Voice repository file")
+    parser.add_argument("--memory-budget-mb", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="Memory budget for warm Piper processes")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the synthesis cache")
+    parser.add_argument("--skip-existing", action="store_true", help="Keep WAVs that already exist in the output directory")
+    parser.add_argument("--metrics-file", help="Write stage timings here (.prom for Prometheus text, else JSON)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if bool(args.manifest) == bool(args.text):
+        parser.error("give either a manifest or --text")
+    os.makedirs(args.output_dir, exist_ok=True)
+    results_path = args.results or os.path.join(args.output_dir, "results.jsonl")
+    cache = None if args.no_cache else SynthesisCache(os.path.join(CACHE_DIR, "synthesis"))
+
+    try:
+        runner = BatchRunner(
+            find_piper_exe(args.piper),
+            os.path.abspath(args.output_dir),
+            max(1, args.workers),
+            load_model_repository(args.models_json),
+            models_dir=args.models_dir,
+            cache=cache,
+            memory_budget=args.memory_budget_mb * 1024 * 1024,
+            skip_existing=args.skip_existing,
+            engine=args.engine,
+            speakers=args.speakers,
+        )
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        with open(results_path, "w", encoding="utf-8") as results_file:
+            if args.text:
+                rows = [{"id": "speech", "text": args.text, "language": args.language,
+                         "voice": args.voice, "quality": args.quality}]
+            else:
+                rows = read_manifest(args.manifest)
+            failed = runner.run(rows, results_file)
+    finally:
+        runner.close()
+    print(f"Log: Results written to {results_path}")
+    print(f"Log: Stage timings:\n{format_stage_summary(METRICS.stage_summary())}")
+    if args.metrics_file:
+        METRICS.write(args.metrics_file)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+"""Measure what each installed voice model costs: cold start, speed and memory.
+
+Usage:
+    python piper_benchmark.py [--language en_US] [--quality medium] [--engine piper|onnx] [--output results.json]
+    python piper_benchmark.py --fake
+    python piper_benchmark.py --compare baseline.json [results.json]
+
+Every model reads the same fixed corpus. For each one the results record
+process spawn time, model load time, time to first audio (cold and warm),
+real-time factor, peak resident memory and the extra latency of going
+through PiperWorkerPool. --fake benchmarks the orchestration with
+piper_fake.py and generated stand-in models, so no voices are needed.
+Results are written as JSON so runs of different versions can be compared.
+"""
+import os
+import re
+import sys
+import json
+import time
+import wave
+import shutil
+import hashlib
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import statistics
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from piper_paths import MODELS_DIR, CACHE_DIR, BASE_DIR, PIPER_EXE, find_piper_exe
+from piper_catalog import QUALITIES, VoiceCatalog
+from piper_inventory import ModelInventory
+
+BENCHMARK_DIR = os.path.join(CACHE_DIR, "benchmarks")
+FAKE_PIPER = os.path.join(BASE_DIR, "piper_fake.py")
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_REPEATS = 3  # warm passes over the corpus per model
+
+# Fixed corpus: keep it unchanged so results stay comparable across versions
+BENCHMARK_CORPUS = [
+    "Hello.",
+    "The quick brown fox jumps over the lazy dog.",
+    "Please confirm your appointment for Tuesday, the fourteenth of March, at half past three.",
+    "It was a bright cold day in April, and the clocks were striking thirteen.",
+    "Neural text to speech systems turn written language into natural sounding audio, "
+    "one sentence at a time, on an ordinary laptop without a network connection.",
+    "Numbers like 1,234.56 and dates like 2024-01-31 exercise the text normalizer.",
+]
+
+# Stand-in model sizes for --fake, close to real Piper voices of each quality
+FAKE_MODEL_SIZES = {"x_low": 28, "low": 63, "medium": 63, "high": 114}  # MiB
+FAKE_SAMPLE_RATES = {"x_low": 16000, "low": 16000, "medium": 22050, "high": 22050}
+
+LOADED_PATTERN = re.compile(r"Loaded voice in ([0-9.]+) second")
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+def wav_duration(path):
+    with wave.open(path, "rb") as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+def process_peak_rss(pid):
+    """Peak resident memory of a running process in bytes, or None where it cannot be read"""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if psutil is not None:
+        try:
+            info = psutil.Process(pid).memory_info()
+            return getattr(info, "peak_wset", None) or info.rss
+        except psutil.Error:
+            pass
+    return None
+
+
+def own_peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return process_peak_rss(os.getpid())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def find_models(models_dir, language=None, quality=None):
+    """(label dict, model path) for every installed model, labelled from the catalog where possible"""
+    catalog = VoiceCatalog(models_dir=models_dir)
+    try:
+        labels = {os.path.normcase(os.path.join(models_dir, path)): key
+                  for key, path in catalog.index["paths"].items()}
+    except (OSError, ValueError) as e:
+        print(f"Log: Voice catalog unavailable ({e}), labelling models by file name")
+        labels = {}
+
+    inventory = ModelInventory(models_dir)
+    inventory.scan()
+    models = []
+    for record in inventory.installed_records():
+        key = labels.get(os.path.normcase(record.path))
+        if key is None:
+            # Piper file names look like en_US-amy-medium.onnx
+            parts = os.path.splitext(os.path.basename(record.path))[0].split("-")
+            key = (parts[0], "-".join(parts[1:-1]) or parts[0], parts[-1] if len(parts) > 1 else "")
+        if language and key[0] != language or quality and key[2] != quality:
+            continue
+        models.append(({"language": key[0], "voice": key[1], "quality": key[2]}, record.path))
+    return models
+
+
+def create_fake_models(directory):
+    """Sparse stand-in models of every quality for benchmarking with piper_fake.py"""
+    models = []
+    for quality in QUALITIES:
+        model_path = os.path.join(directory, f"en_US-fake-{quality}.onnx")
+        with open(model_path, "wb") as f:
+            f.truncate(FAKE_MODEL_SIZES[quality] * 1024 * 1024)
+        with open(model_path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"audio": {"sample_rate": FAKE_SAMPLE_RATES[quality]}, "num_speakers": 1}, f)
+        models.append(({"language": "en_US", "voice": "fake", "quality": quality}, model_path))
+    return models
+
+
+class PiperProcess:
+    """One piper process driven over the JSON-input protocol, timing every step"""
+
+    def __init__(self, command, model_path, work_dir):
+        self.work_dir = work_dir
+        self.stderr_lines = []
+        start = time.perf_counter()
+        self.process = subprocess.Popen(
+            command + ["--model", model_path, "--json-input", "--output_dir", work_dir],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
+        )
+        self.started = start
+        self.spawn_seconds = time.perf_counter() - start
+        self.stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self.stderr_thread.start()
+        self.count = 0
+
+    def _read_stderr(self):
+        for line in iter(self.process.stderr.readline, b""):
+            self.stderr_lines.append(line.decode("utf-8", "replace").rstrip())
+
+    def synthesize(self, text):
+        """Return (seconds until the WAV was reported, audio seconds)"""
+        self.count += 1
+        output_file = os.path.join(self.work_dir, f"bench_{self.count}.wav")
+        start = time.perf_counter()
+        self.process.stdin.write((json.dumps({"text": text, "output_file": output_file}) + "\n").encode("utf-8"))
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        elapsed = time.perf_counter() - start
+        if not line:
+            self.process.wait()
+            tail = self.stderr_lines[-1] if self.stderr_lines else ""
+            raise RuntimeError(f"piper exited with code {self.process.returncode} {tail}".strip())
+        path = line.decode("utf-8", "replace").strip() or output_file
+        duration = wav_duration(path)
+        os.remove(path)
+        return elapsed, duration
+
+    def load_seconds(self):
+        for line in self.stderr_lines:
+            match = LOADED_PATTERN.search(line)
+            if match:
+                return float(match.group(1))
+        return None
+
+    def close(self):
+        peak_rss = process_peak_rss(self.process.pid)
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        return peak_rss
+
+
+def warm_pass(synthesize, corpus, repeats):
+    """Run the corpus repeats times; returns (synthesis seconds, audio seconds, latencies of the first text)"""
+    synthesis = audio = 0.0
+    first_latencies = []
+    for _ in range(repeats):
+        for index, text in enumerate(corpus):
+            elapsed, duration = synthesize(text)
+            synthesis += elapsed
+            audio += duration
+            if index == 0:
+                first_latencies.append(elapsed)
+    return synthesis, audio, first_latencies
+
+
+def benchmark_piper_model(command, model_path, corpus, repeats, work_dir):
+    process = PiperProcess(command, model_path, work_dir)
+    try:
+        cold_latency, _ = process.synthesize(corpus[0])
+        first_audio = time.perf_counter() - process.started
+        synthesis, audio, first_latencies = warm_pass(process.synthesize, corpus, repeats)
+        load = process.load_seconds()
+        if load is None:
+            # No load message on stderr: the cold request minus a warm one is the load
+            load = max(0.0, cold_latency - statistics.median(first_latencies))
+    finally:
+        peak_rss = process.close()
+    return {
+        "spawn_ms": milliseconds(process.spawn_seconds),
+        "load_ms": milliseconds(load),
+        "first_audio_ms": milliseconds(first_audio),
+        "warm_first_audio_ms": milliseconds(statistics.median(first_latencies)),
+        "rtf": round(synthesis / audio, 4) if audio else None,
+        "audio_seconds": round(audio, 3),
+        "synthesis_seconds": round(synthesis, 3),
+        "peak_rss": peak_rss,
+    }
+
+
+def pool_overhead(piper_exe, model_path, corpus, repeats, work_dir, direct_result):
+    """Extra milliseconds per request of PiperWorkerPool compared with talking to piper directly"""
+    from piper_pool import PiperWorkerPool
+
+    pool = PiperWorkerPool(piper_exe, work_dir)
+    try:
+        pool.submit(model_path, corpus[0], os.path.join(work_dir, "pool_warm.wav")).result()
+
+        def synthesize(text):
+            output_file = os.path.join(work_dir, "pool.wav")
+            start = time.perf_counter()
+            path = pool.submit(model_path, text, output_file).result()
+            elapsed = time.perf_counter() - start
+            return elapsed, wav_duration(path)
+
+        synthesis, _, _ = warm_pass(synthesize, corpus, repeats)
+    finally:
+        pool.shutdown()
+    requests = repeats * len(corpus)
+    return milliseconds((synthesis - direct_result["synthesis_seconds"]) / requests)
+
+
+def benchmark_onnx_model(model_path, corpus, repeats):
+    """Runs in a fresh process so peak memory belongs to this model alone"""
+    from piper_engine import OnnxVoice
+
+    start = time.perf_counter()
+    voice = OnnxVoice(model_path)
+    load = time.perf_counter() - start
+    sample_rate = voice.config.sample_rate
+
+    def synthesize(text):
+        began = time.perf_counter()
+        pcm = voice.synthesize(text)
+        return time.perf_counter() - began, len(pcm) / sample_rate
+
+    synthesize(corpus[0])
+    first_audio = time.perf_counter() - start
+    synthesis, audio, first_latencies = warm_pass(synthesize, corpus, repeats)
+    return {
+        "spawn_ms": None,
+        "load_ms": milliseconds(load),
+        "first_audio_ms": milliseconds(first_audio),
+        "warm_first_audio_ms": milliseconds(statistics.median(first_latencies)),
+        "rtf": round(synthesis / audio, 4) if audio else None,
+        "audio_seconds": round(audio, 3),
+        "synthesis_seconds": round(synthesis, 3),
+        "peak_rss": own_peak_rss(),
+    }
+
+
+def summarize(results):
+    """Median of each measurement per quality, the numbers behind the quality choice"""
+    summary = {}
+    for quality in QUALITIES:
+        rows = [row for row in results if row.get("quality") == quality and not row.get("error")]
+        if not rows:
+            continue
+        summary[quality] = {"models": len(rows)}
+        for field in ("load_ms", "first_audio_ms", "warm_first_audio_ms", "rtf", "peak_rss", "pool_overhead_ms"):
+            values = [row[field] for row in rows if row.get(field) is not None]
+            if values:
+                summary[quality][field] = statistics.median(values)
+    return summary
+
+
+def format_bytes(size):
+    return f"{size / (1024 * 1024):.0f} MB" if size else "-"
+
+
+def print_results(results):
+    print(f"{'model':36} {'load':>8} {'first':>8} {'warm':>8} {'rtf':>7} {'rss':>8}")
+    for row in results:
+        name = f"{row['language']}/{row['voice']}/{row['quality']}"
+        if row.get("error"):
+            print(f"{name:36} error: {row['error']}")
+            continue
+        print(f"{name:36} {row['load_ms']:>6.0f}ms {row['first_audio_ms']:>6.0f}ms "
+              f"{row['warm_first_audio_ms']:>6.0f}ms {row['rtf']:>7.3f} {format_bytes(row['peak_rss']):>8}")
+
+
+def compare(baseline_path, current_path):
+    """Print the change of every measurement between two result files"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    if baseline.get("corpus_sha256") != current.get("corpus_sha256"):
+        print("Log: The two runs used different corpora; timings are not directly comparable")
+
+    def rows(data):
+        return {(row["language"], row["voice"], row["quality"]): row for row in data["results"] if not row.get("error")}
+
+    old_rows, new_rows = rows(baseline), rows(current)
+    for key in sorted(old_rows.keys() & new_rows.keys()):
+        changes = []
+        for field in ("load_ms", "first_audio_ms", "warm_first_audio_ms", "rtf", "peak_rss"):
+            old, new = old_rows[key].get(field), new_rows[key].get(field)
+            if old and new is not None:
+                changes.append(f"{field} {(new - old) * 100 / old:+.1f}%")
+        print(f"{'/'.join(key):36} {', '.join(changes)}")
+    return 0
+
+
+def latest_results():
+    try:
+        names = sorted(name for name in os.listdir(BENCHMARK_DIR) if name.endswith(".json"))
+    except OSError:
+        names = []
+    return os.path.join(BENCHMARK_DIR, names[-1]) if names else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="piper_benchmark", description="Benchmark the installed voice models")
+    parser.add_argument("--engine", choices=["piper", "onnx"], default="piper", help="What runs the models")
+    parser.add_argument("--piper", default=PIPER_EXE, help="Path to the piper executable")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Directory with downloaded models")
+    parser.add_argument("--language", help="Only models of this language, e.g. en_US")
+    parser.add_argument("--quality", choices=QUALITIES, help="Only models of this quality")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Warm passes over the corpus")
+    parser.add_argument("--no-pool", action="store_true", help="Skip measuring the PiperWorkerPool overhead")
+    parser.add_argument("--fake", action="store_true", help="Use piper_fake.py and stand-in models")
+    parser.add_argument("--output", help="Results file (default: cache/benchmarks/benchmark-<time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare BASELINE with the latest (or given) results")
+    parser.add_argument("results", nargs="?", help="Results file for --compare")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        current = args.results or latest_results()
+        if not current:
+            print("Error: No results to compare with")
+            return 2
+        return compare(args.compare, current)
+
+    fake_dir = None
+    if args.fake:
+        fake_dir = tempfile.mkdtemp(prefix="piper_fake_models_")
+        models = create_fake_models(fake_dir)
+        piper_exe = FAKE_PIPER
+        command = [sys.executable, FAKE_PIPER]
+        args.engine = "piper"
+    else:
+        models = find_models(args.models_dir, args.language, args.quality)
+        piper_exe = find_piper_exe(args.piper)
+        command = [piper_exe]
+        if args.engine == "piper" and not os.path.exists(piper_exe):
+            print(f"Error: Piper executable not found at {piper_exe}")
+            return 2
+    if not models:
+        print("Error: No installed models match; download some or try --fake")
+        return 2
+
+    # PiperWorkerPool runs piper_exe directly, which a .py script cannot be on Windows
+    measure_pool = not args.no_pool and not (args.fake and sys.platform == "win32")
+    work_dir = tempfile.mkdtemp(prefix="piper_benchmark_")
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) \
+        if args.engine == "onnx" else None
+    results = []
+    try:
+        for labels, model_path in models:
+            row = dict(labels, model=os.path.basename(model_path), model_size=os.path.getsize(model_path))
+            print(f"Log: Benchmarking {labels['language']}/{labels['voice']}/{labels['quality']}")
+            try:
+                if args.engine == "onnx":
+                    row.update(executor.submit(benchmark_onnx_model, model_path, BENCHMARK_CORPUS, args.repeats).result())
+                    # A fresh process per model keeps peak memory per model
+                    executor.shutdown()
+                    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    row.update(benchmark_piper_model(command, model_path, BENCHMARK_CORPUS, args.repeats, work_dir))
+                    if measure_pool:
+                        row["pool_overhead_ms"] = pool_overhead(piper_exe, model_path, BENCHMARK_CORPUS,
+                                                                args.repeats, work_dir, row)
+            except Exception as e:
+                row["error"] = str(e)
+            results.append(row)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if fake_dir:
+            shutil.rmtree(fake_dir, ignore_errors=True)
+
+    report = {
+        "format": RESULTS_FORMAT_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "engine": "fake" if args.fake else args.engine,
+        "piper": None if args.engine == "onnx" else piper_exe,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "repeats": args.repeats,
+        "corpus_sha256": hashlib.sha256("\n".join(BENCHMARK_CORPUS).encode("utf-8")).hexdigest(),
+        "results": results,
+        "summary": summarize(results),
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print_results(results)
+    print(f"Log: Results written to {output}")
+    return 1 if any(row.get("error") for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
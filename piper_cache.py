@@ -0,0 +1,311 @@
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from piper_paths import CACHE_DIR
+from piper_text import normalize_text
+from piper_audio import write_wav, PEAKS_SUFFIX
+from piper_metrics import METRICS
+
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024  # 1 GiB of cached WAVs
+HASH_BLOCK_SIZE = 1024 * 1024
+MODEL_HASHES_PATH = os.path.join(CACHE_DIR, "model_hashes.json")
+
+DEFAULT_PHONEME_MEMORY_ENTRIES = 10000  # sentences kept in the in-memory tier
+DEFAULT_PHONEME_DISK_ENTRIES = 500000  # sentences kept in the SQLite tier
+
+
+def file_sha256(path):
+    """Hash a file in large blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def copy_file(src, dst):
+    """Copy src over dst through a temporary file
+
+    Never a hardlink: outputs are rendered to in place later, and a shared
+    inode would change the cached audio of another text along with them.
+    """
+    tmp_path = f"{dst}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelHashes:
+    """SHA-256 of model files, memoized by path, size and modification time and kept across runs
+
+    The synthesis cache, document renders and the model inventory all ask
+    this one source, so each model is hashed once rather than once per user.
+    """
+
+    def __init__(self, path=MODEL_HASHES_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f)
+        except (OSError, ValueError):
+            self.hashes = {}
+
+    def known(self, path):
+        """The hash of path if it is already known for the file as it is now, otherwise None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self.lock:
+            known = self.hashes.get(os.path.abspath(path))
+        if known and known["stamp"] == f"{stat.st_size}:{stat.st_mtime_ns}":
+            return known["sha256"]
+        return None
+
+    def get(self, path):
+        """The hash of path, reading the whole file if it is not known yet"""
+        digest = self.known(path)
+        if digest is not None:
+            return digest
+        stat = os.stat(path)
+        digest = file_sha256(path)
+        with self.lock:
+            self.hashes[os.path.abspath(path)] = {"stamp": f"{stat.st_size}:{stat.st_mtime_ns}", "sha256": digest}
+            self._save()
+        return digest
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.hashes, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Log: Could not save model hashes: {e}")
+
+
+_shared_model_hashes = None
+_shared_model_hashes_lock = threading.Lock()
+
+
+def shared_model_hashes():
+    """The process-wide ModelHashes, loaded on first use"""
+    global _shared_model_hashes
+    with _shared_model_hashes_lock:
+        if _shared_model_hashes is None:
+            _shared_model_hashes = ModelHashes()
+        return _shared_model_hashes
+
+
+class SynthesisCache:
+    """On-disk WAV cache keyed on model, config, normalized text and synthesis settings"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_SIZE, model_hashes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.model_hashes = model_hashes or shared_model_hashes()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the LRU order from the files already on disk"""
+        found = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".wav"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def model_hash(self, path):
+        """SHA-256 of a model or config file, through the shared memo"""
+        return self.model_hashes.get(path)
+
+    def model_files(self, model_path):
+        config_path = model_path + ".json"
+        return [model_path, config_path] if os.path.exists(config_path) else [model_path]
+
+    def hashes_known(self, model_path):
+        """True if key_for can build keys for this model without reading the model files"""
+        return all(self.model_hashes.known(path) for path in self.model_files(model_path))
+
+    def hash_model(self, model_path):
+        """Hash the model and its config ahead of key_for (reads the whole files the first time)"""
+        for path in self.model_files(model_path):
+            self.model_hash(path)
+
+    def key_for(self, model_path, text, params=None):
+        """Build the cache key for a synthesis request"""
+        digest = hashlib.sha256()
+        for path in self.model_files(model_path):
+            digest.update(self.model_hash(path).encode("ascii"))
+        digest.update(normalize_text(text).encode("utf-8"))
+        digest.update(json.dumps(params or {}, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".wav")
+
+    def get(self, key):
+        """Return the cached WAV path for a key, or None on a miss"""
+        path = self.path_for(key)
+        with self.lock:
+            if key in self.entries and os.path.exists(path):
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                METRICS.increment("cache_lookups_total", result="miss")
+                return None
+        METRICS.increment("cache_lookups_total", result="hit")
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def fetch(self, key, output_file):
+        """Place the cached WAV for a key at output_file; returns False on a miss"""
+        path = self.get(key)
+        if path is None:
+            return False
+        copy_file(path, output_file)
+        return True
+
+    def put(self, key, wav_path):
+        """Store a freshly synthesized WAV under its key"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        copy_file(wav_path, path)
+        return self._register(key, path)
+
+    def put_frames(self, key, frames, params):
+        """Store audio synthesized in memory under its key"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with METRICS.span("file_write"):
+            write_wav(tmp_path, frames, params)
+            os.replace(tmp_path, path)
+        return self._register(key, path)
+
+    def _register(self, key, path):
+        size = os.path.getsize(path)
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = size
+            self.total_bytes += size
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            for path in (self.path_for(key), self.path_for(key) + PEAKS_SUFFIX):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats_text(self):
+        return f"Cache: {self.hits} hits / {self.misses} misses ({self.total_bytes / (1024 * 1024):.1f} MB)"
+
+
+class PhonemeCache:
+    """Phonemes per (espeak voice, normalized sentence): an in-memory LRU in front of SQLite
+
+    Voices of one language share an espeak voice, so a sentence phonemized
+    for one of them is reused by the others and by later re-renders.
+    """
+
+    def __init__(self, path, memory_entries=DEFAULT_PHONEME_MEMORY_ENTRIES, disk_entries=DEFAULT_PHONEME_DISK_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()  # (espeak voice, sentence) -> phonemes, least recently used first
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS phonemes ("
+            "voice TEXT NOT NULL, sentence TEXT NOT NULL, phonemes TEXT NOT NULL, "
+            "PRIMARY KEY (voice, sentence))"
+        )
+        self.db.commit()
+
+    def get(self, voice, sentence):
+        """Cached phonemes for a sentence, or None"""
+        key = (voice, normalize_text(sentence))
+        with self.lock:
+            phonemes = self.memory.get(key)
+            if phonemes is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return phonemes
+            row = self.db.execute("SELECT phonemes FROM phonemes WHERE voice = ? AND sentence = ?", key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            phonemes = json.loads(row[0])
+            self._remember(key, phonemes)
+            return phonemes
+
+    def put(self, voice, sentence, phonemes):
+        key = (voice, normalize_text(sentence))
+        with self.lock:
+            self._remember(key, phonemes)
+            self.db.execute("INSERT OR REPLACE INTO phonemes VALUES (?, ?, ?)",
+                            key + (json.dumps(phonemes, ensure_ascii=False),))
+            self.db.commit()
+            self.writes += 1
+            if self.writes % 1000 == 0:
+                self._prune()
+
+    def _remember(self, key, phonemes):
+        self.memory[key] = phonemes
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _prune(self):
+        """Drop the oldest rows once the SQLite tier is over its limit"""
+        count = self.db.execute("SELECT COUNT(*) FROM phonemes").fetchone()[0]
+        if count > self.disk_entries:
+            self.db.execute("DELETE FROM phonemes WHERE rowid IN "
+                            "(SELECT rowid FROM phonemes ORDER BY rowid LIMIT ?)", (count - self.disk_entries,))
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def stats_text(self):
+        return f"Phonemes: {self.hits} memory hits / {self.disk_hits} disk hits / {self.misses} misses"
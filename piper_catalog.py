@@ -0,0 +1,422 @@
+import os
+import sys
+import json
+import pickle
+import argparse
+
+from piper_paths import MODELS_DIR, CACHE_DIR, MODELS_JSON_PATH, LANGUAGES_JSON_PATH
+
+# Qualities available for voices
+QUALITIES = ["x_low", "low", "medium", "high"]
+
+# User-facing names of the qualities
+QUALITY_DISPLAY_NAMES = {"x_low": "Extra Low", "low": "Low", "medium": "Medium", "high": "High"}
+
+# Quality picked when the requested one is not available, in order of preference
+DEFAULT_QUALITY_ORDER = ["medium", "high", "low", "x_low"]
+
+# Binary index of models.json, rebuilt whenever models.json or languages.json change
+CATALOG_INDEX_PATH = os.path.join(CACHE_DIR, "catalog.idx")
+CATALOG_INDEX_VERSION = 1
+
+# Upstream voice list of rhasspy/piper-voices and the URLs its file paths resolve to
+VOICES_JSON_URL = "https://huggingface.co/rhasspy/piper-voices/raw/main/voices.json"
+VOICE_FILE_URL = "https://huggingface.co/rhasspy/piper-voices/resolve/main/{path}?download=true"
+VOICE_CONFIG_URL = "https://huggingface.co/rhasspy/piper-voices/raw/main/{path}"
+VOICE_SAMPLE_URL = "https://rhasspy.github.io/piper-samples/samples/{family}/{code}/{voice}/{quality}/speaker_0.mp3"
+
+
+def load_model_repository(path=MODELS_JSON_PATH):
+    """Load the language -> voice -> quality repository from models.json"""
+    if not os.path.exists(path):
+        print("models.json not found, using an empty model repository.")
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            repository = json.load(f)
+        print("Model repository loaded from models.json.")
+        return repository
+    except json.JSONDecodeError as e:
+        print(f"Error decoding models.json: {e}")
+    except Exception as e:
+        print(f"An error occurred while loading models.json: {e}")
+    return {}
+
+
+def model_filename(url):
+    """File name of a model URL without its query string"""
+    return os.path.basename(url.split('?', 1)[0])
+
+
+def resolve_voice_quality(repository, language_code, voice_id, quality=None):
+    """Return (quality, quality_info) for a voice, falling back to another quality if needed
+
+    Returns (None, None) when the voice is unknown or has no qualities.
+    """
+    voice_info = repository.get(language_code, {}).get(voice_id)
+    if not voice_info or not voice_info.get("qualities"):
+        return None, None
+
+    qualities = voice_info["qualities"]
+    if quality in qualities:
+        return quality, qualities[quality]
+    for fallback in DEFAULT_QUALITY_ORDER:
+        if fallback in qualities:
+            return fallback, qualities[fallback]
+    first_quality = list(qualities.keys())[0]
+    return first_quality, qualities[first_quality]
+
+
+def model_path_for(models_dir, language_code, voice_id, quality_info):
+    """Local path of a voice model file"""
+    return os.path.join(models_dir, language_code, voice_id, model_filename(quality_info["url"]))
+
+
+def download_files(quality_info, model_path):
+    """(url, path, expected) pairs for a model and its config, as taken by piper_download"""
+    return [
+        (quality_info["url"], model_path, {key: quality_info.get(key) for key in ("size", "sha256", "md5")}),
+        (quality_info["config_url"], model_path + ".json",
+         {key: quality_info.get("config_" + key) for key in ("size", "sha256", "md5")}),
+    ]
+
+
+def model_speakers(model_path):
+    """(name, speaker id) pairs of a multi-speaker model from its .onnx.json, in id order
+
+    Single-speaker models, and models whose config is not downloaded, have none.
+    """
+    try:
+        with open(model_path + ".json", "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return []
+    speaker_id_map = config.get("speaker_id_map") or {}
+    num_speakers = config.get("num_speakers", 1)
+    if not speaker_id_map:
+        speaker_id_map = {str(speaker_id): speaker_id for speaker_id in range(num_speakers)}
+    if len(speaker_id_map) <= 1:
+        return []
+    return sorted(((str(name), int(speaker_id)) for name, speaker_id in speaker_id_map.items()),
+                  key=lambda item: item[1])
+
+
+def parse_speakers(spec, speakers):
+    """Select (name, speaker id) pairs of a model: "all", or a comma list of names, ids and id ranges"""
+    if not speakers:
+        raise ValueError("Voice has a single speaker")
+    by_name = dict(speakers)
+    by_id = {speaker_id: name for name, speaker_id in speakers}
+    spec = str(spec).strip()
+    if spec.lower() == "all":
+        return list(speakers)
+    selected = []
+    for part in spec.split(","):
+        part = part.strip()
+        if part in by_name:
+            selected.append((part, by_name[part]))
+            continue
+        try:
+            first, _, last = part.partition("-")
+            ids = range(int(first), int(last or first) + 1)
+        except ValueError:
+            raise ValueError(f"Unknown speaker {part!r}") from None
+        for speaker_id in ids:
+            if speaker_id not in by_id:
+                raise ValueError(f"Speaker id {speaker_id} out of range (model has {len(speakers)} speakers)")
+            selected.append((by_id[speaker_id], speaker_id))
+    return selected
+
+
+def iter_voice_models(repository, models_dir, language_code=None, quality=None, exact_quality=False,
+                      all_qualities=False):
+    """Yield (language_code, voice_id, quality, quality_info, model_path) for the repository
+
+    language_code limits the walk to one language. quality picks that quality
+    for every voice, falling back to another one unless exact_quality is set,
+    in which case voices without it are skipped. all_qualities yields every variant.
+    """
+    for language in sorted(repository):
+        if language_code and language != language_code:
+            continue
+        for voice_id, voice_info in repository[language].items():
+            qualities = voice_info.get("qualities", {})
+            if all_qualities:
+                selected = [(q, qualities[q]) for q in QUALITIES if q in qualities]
+            elif exact_quality and quality not in qualities:
+                selected = []
+            else:
+                selected = [resolve_voice_quality(repository, language, voice_id, quality)]
+            for voice_quality, quality_info in selected:
+                if quality_info is not None:
+                    yield (language, voice_id, voice_quality, quality_info,
+                           model_path_for(models_dir, language, voice_id, quality_info))
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _write_json(path, data):
+    """Write JSON next to path first so a crash never leaves a truncated file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+class VoiceCatalog:
+    """Precomputed language -> voice -> quality index of models.json
+
+    Nothing is read until the catalog is first used. The index is kept in a
+    pickle under CACHE_DIR and only rebuilt from JSON when models.json or
+    languages.json change, so lookups for the combo boxes never walk the
+    nested repository.
+    """
+
+    def __init__(self, repository_path=MODELS_JSON_PATH, languages_path=LANGUAGES_JSON_PATH,
+                 models_dir=MODELS_DIR, index_path=CATALOG_INDEX_PATH, inventory=None):
+        self.repository_path = repository_path
+        self.languages_path = languages_path
+        self.models_dir = models_dir
+        self.index_path = index_path
+        self.inventory = inventory  # piper_inventory.ModelInventory answering is_downloaded without a stat
+        self._index = None
+
+    def _signature(self):
+        return (CATALOG_INDEX_VERSION, _file_signature(self.repository_path), _file_signature(self.languages_path))
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self):
+        signature = self._signature()
+        try:
+            with open(self.index_path, "rb") as f:
+                index = pickle.load(f)
+            if index.get("signature") == signature:
+                return index
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Log: Ignoring unreadable catalog index: {e}")
+
+        index = self._build_index(load_model_repository(self.repository_path), self._load_language_names())
+        index["signature"] = signature
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Log: Could not write catalog index: {e}")
+        return index
+
+    def _load_language_names(self):
+        try:
+            with open(self.languages_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Log: Could not load language names: {e}")
+            return {}
+
+    @staticmethod
+    def _build_index(repository, language_names):
+        ordered = [code for code in language_names if code in repository]
+        ordered += sorted(code for code in repository if code not in language_names)
+        voices = {}
+        qualities = {}
+        paths = {}
+        for language_code in ordered:
+            voices[language_code] = [(voice_id, voice_info.get("name", voice_id))
+                                     for voice_id, voice_info in repository[language_code].items()]
+            for voice_id, voice_info in repository[language_code].items():
+                available = voice_info.get("qualities", {})
+                qualities[language_code, voice_id] = ([q for q in QUALITIES if q in available] +
+                                                      [q for q in available if q not in QUALITIES])
+                for quality, quality_info in available.items():
+                    paths[language_code, voice_id, quality] = os.path.join(
+                        language_code, voice_id, model_filename(quality_info["url"]))
+        return {
+            "repository": repository,
+            "languages": [(code, language_names.get(code, code)) for code in ordered],
+            "voices": voices,
+            "qualities": qualities,
+            "paths": paths,
+        }
+
+    def reload(self):
+        """Drop the loaded index; the next lookup rereads (or rebuilds) it"""
+        self._index = None
+
+    @property
+    def repository(self):
+        """The nested language -> voice -> quality dict of models.json"""
+        return self.index["repository"]
+
+    def languages(self):
+        """(language_code, display_name) pairs in display order"""
+        return self.index["languages"]
+
+    def voices(self, language_code):
+        """(voice_id, name) pairs of a language"""
+        return self.index["voices"].get(language_code, [])
+
+    def voice_info(self, language_code, voice_id):
+        return self.repository.get(language_code, {}).get(voice_id)
+
+    def voice_name(self, language_code, voice_id):
+        voice_info = self.voice_info(language_code, voice_id)
+        return voice_info["name"] if voice_info else voice_id
+
+    def qualities(self, language_code, voice_id):
+        """Qualities of a voice from lowest to highest"""
+        return self.index["qualities"].get((language_code, voice_id), [])
+
+    def default_quality(self, language_code, voice_id):
+        available = self.qualities(language_code, voice_id)
+        for quality in DEFAULT_QUALITY_ORDER:
+            if quality in available:
+                return quality
+        return available[0] if available else None
+
+    def model_path(self, language_code, voice_id, quality):
+        """Local path of a model variant, or None if the catalog does not have it"""
+        relative_path = self.index["paths"].get((language_code, voice_id, quality))
+        return os.path.join(self.models_dir, relative_path) if relative_path else None
+
+    def resolve(self, language_code, voice_id, quality=None):
+        """(quality, model_path) for a voice, with the same quality fallback as the app
+
+        Returns (None, None) for an unknown voice.
+        """
+        resolved_quality, quality_info = resolve_voice_quality(self.repository, language_code, voice_id, quality)
+        if quality_info is None:
+            return None, None
+        return resolved_quality, model_path_for(self.models_dir, language_code, voice_id, quality_info)
+
+    def is_downloaded(self, language_code, voice_id, quality):
+        model_path = self.model_path(language_code, voice_id, quality)
+        if self.inventory is not None:
+            return self.inventory.is_installed(model_path)
+        return bool(model_path) and os.path.exists(model_path)
+
+    def downloaded_qualities(self, language_code, voice_id):
+        return [quality for quality in self.qualities(language_code, voice_id)
+                if self.is_downloaded(language_code, voice_id, quality)]
+
+    def update_from_voices(self, voices):
+        """Merge an upstream voices.json dict into models.json and languages.json
+
+        Only variants whose files changed upstream are rewritten; voices keep
+        their display names and sample URLs. Returns counts of added, updated,
+        unchanged and removed variants.
+        """
+        repository = load_model_repository(self.repository_path)
+        language_names = self._load_language_names()
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+
+        for voice in voices.values():
+            language = voice["language"]
+            language_code = language["code"]
+            voice_id = voice["name"]
+            quality = voice["quality"]
+            seen.add((language_code, voice_id, quality))
+
+            model_file = config_file = None
+            for path, file_info in voice.get("files", {}).items():
+                if path.endswith(".onnx"):
+                    model_file = (path, file_info)
+                elif path.endswith(".onnx.json"):
+                    config_file = (path, file_info)
+            if model_file is None or config_file is None:
+                continue
+
+            quality_info = {
+                "url": VOICE_FILE_URL.format(path=model_file[0]),
+                "config_url": VOICE_CONFIG_URL.format(path=config_file[0]),
+                "size": model_file[1].get("size_bytes"),
+                "md5": model_file[1].get("md5_digest"),
+                "config_size": config_file[1].get("size_bytes"),
+                "config_md5": config_file[1].get("md5_digest"),
+            }
+            voice_info = repository.setdefault(language_code, {}).setdefault(voice_id, {"name": voice_id, "qualities": {}})
+            voice_info.setdefault("qualities", {})
+            existing = voice_info["qualities"].get(quality)
+            if existing is None:
+                counts["added"] += 1
+            elif all(existing.get(key) == value for key, value in quality_info.items()):
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["updated"] += 1
+            voice_info["qualities"][quality] = quality_info
+
+            if "sample_url" not in voice_info:
+                voice_info["sample_url"] = VOICE_SAMPLE_URL.format(
+                    family=language.get("family", language_code.split("_")[0]),
+                    code=language_code, voice=voice_id, quality=quality)
+            if language_code not in language_names:
+                language_names[language_code] = " ".join(
+                    part for part in (language.get("name_native"), language.get("country_english")) if part
+                ) or language_code
+
+        # Variants that disappeared upstream
+        for language_code in list(repository):
+            for voice_id in list(repository[language_code]):
+                qualities = repository[language_code][voice_id].get("qualities", {})
+                for quality in list(qualities):
+                    if (language_code, voice_id, quality) not in seen:
+                        del qualities[quality]
+                        counts["removed"] += 1
+                if not qualities:
+                    del repository[language_code][voice_id]
+            if not repository[language_code]:
+                del repository[language_code]
+
+        if counts["added"] or counts["updated"] or counts["removed"]:
+            _write_json(self.repository_path, repository)
+            _write_json(self.languages_path, language_names)
+            self.reload()
+        return counts
+
+
+def main(argv=None):
+    """Update models.json from upstream: python piper_catalog.py --update [voices.json or URL]"""
+    parser = argparse.ArgumentParser(prog="piper_catalog", description="Inspect or update the voice catalog")
+    parser.add_argument("--update", nargs="?", const=VOICES_JSON_URL, metavar="VOICES_JSON",
+                        help="Merge an upstream voices.json (file or URL) into models.json")
+    args = parser.parse_args(argv)
+
+    catalog = VoiceCatalog()
+    if args.update:
+        if args.update.startswith(("http://", "https://")):
+            from piper_download import get_session, REQUEST_TIMEOUT
+            response = get_session().get(args.update, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            voices = response.json()
+        else:
+            with open(args.update, "r", encoding="utf-8") as f:
+                voices = json.load(f)
+        counts = catalog.update_from_voices(voices)
+        print(f"Log: Catalog updated: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {counts['removed']} removed")
+
+    for language_code, display_name in catalog.languages():
+        variants = sum(len(catalog.qualities(language_code, voice_id)) for voice_id, _ in catalog.voices(language_code))
+        print(f"{language_code}\t{display_name}\t{len(catalog.voices(language_code))} voices, {variants} models")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Render long documents by synthesizing their sentences in parallel.
+
+Usage:
+    python piper_document.py book.txt --language en_US --voice amy --output book.wav
+    python piper_ui.py document book.txt --model voices/amy.onnx --workers 32
+
+The text is split at sentence boundaries, the sentences are spread over
+several warm Piper processes of the same voice and the resulting PCM is
+joined in text order with a configurable pause between sentences.
+
+With --incremental, the sentences of an earlier render of the same output
+file that are still in the text are copied from it (see piper_segments.py),
+so after an edit only the changed sentences are synthesized again.
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from contextlib import nullcontext
+from concurrent.futures import as_completed
+
+from piper_paths import MODELS_DIR, MODELS_JSON_PATH, find_piper_exe
+from piper_catalog import load_model_repository, resolve_voice_quality, model_path_for, model_speakers, parse_speakers
+from piper_pool import DEFAULT_MEMORY_BUDGET
+from piper_engine import ENGINES, create_engine
+from piper_text import split_sentences
+from piper_audio import read_wav, wav_data_layout, join_pcm, peaks_available, load_peaks
+from piper_cache import shared_model_hashes
+from piper_segments import SegmentMap, render_settings
+from piper_metrics import METRICS, format_stage_summary
+
+DEFAULT_SENTENCE_SILENCE_MS = 200
+DEFAULT_DOCUMENT_WORKERS = os.cpu_count() or 1
+
+
+def render_document(pool, model_path, text, output_file, silence_ms=DEFAULT_SENTENCE_SILENCE_MS,
+                    parallelism=DEFAULT_DOCUMENT_WORKERS, speaker_id=None, progress=None, incremental=False):
+    """Synthesize text sentence by sentence on the pool and join the result into output_file
+
+    progress, if given, is called with (finished_sentences, total_sentences).
+    With incremental, sentences already rendered in output_file are reused.
+    A segment map is written next to output_file either way, and with numpy
+    installed the waveform peaks the app draws it with.
+    """
+    with METRICS.span("text_prep"):
+        sentences = split_sentences(text)
+    if not sentences:
+        raise ValueError("No text to synthesize")
+
+    output_file = os.path.abspath(output_file)
+    settings = render_settings(shared_model_hashes().get(model_path), speaker_id, silence_ms)
+    previous = None
+    data_offset = 0
+    if incremental and os.path.exists(output_file):
+        try:
+            _, data_offset, data_size = wav_data_layout(output_file)
+            previous = SegmentMap.load(output_file, data_size)
+        except (OSError, ValueError) as e:
+            print(f"Log: Could not read the previous render: {e}")
+    plan = previous.plan(sentences, settings) if previous else [None] * len(sentences)
+    reused = sum(1 for segment in plan if segment)
+    if previous:
+        print(f"Log: Reusing {reused} of {len(sentences)} sentences from the previous render")
+
+    chunk_dir = tempfile.mkdtemp(prefix=".chunks-", dir=os.path.dirname(output_file))
+    futures = {}
+    try:
+        for index, (sentence, segment) in enumerate(zip(sentences, plan)):
+            if segment is None:
+                chunk_file = os.path.join(chunk_dir, f"{index:05d}.wav")
+                futures[index] = pool.submit(model_path, sentence, chunk_file, speaker_id, parallelism=parallelism)
+
+        for finished, future in enumerate(as_completed(futures.values()), reused + 1):
+            future.result()
+            if progress:
+                progress(finished, len(sentences))
+
+        def parts():
+            # The previous render is read while its replacement is written and closed before the swap
+            with open(output_file, "rb") if reused else nullcontext() as previous_file:
+                for index, segment in enumerate(plan):
+                    if segment is None:
+                        yield read_wav(futures[index].result())
+                    else:
+                        previous_file.seek(data_offset + segment["offset"])
+                        yield tuple(previous.params), previous_file.read(segment["size"])
+
+        with METRICS.span("file_write"):
+            layout = join_pcm(parts(), output_file, silence_ms)
+            segment_map = SegmentMap(settings, wav_data_layout(output_file)[0])
+            for sentence, (offset, size) in zip(sentences, layout):
+                segment_map.add(sentence, offset, size)
+            segment_map.save(output_file)
+        if peaks_available():
+            load_peaks(output_file)
+        return output_file
+    finally:
+        for future in futures.values():
+            future.cancel()
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="piper_document", description="Render a long text with parallel Piper workers")
+    parser.add_argument("text_file", help="UTF-8 text file, or - for standard input")
+    parser.add_argument("--output", required=True, help="WAV file to write")
+    parser.add_argument("--model", help="Path to an .onnx voice (instead of --language/--voice)")
+    parser.add_argument("--language", help="Language code, e.g. en_US")
+    parser.add_argument("--voice", help="Voice id, e.g. amy")
+    parser.add_argument("--quality", help="Voice quality")
+    parser.add_argument("--speaker", help="Speaker name or id of a multi-speaker voice")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DOCUMENT_WORKERS, help="Parallel Piper processes")
+    parser.add_argument("--silence-ms", type=int, default=DEFAULT_SENTENCE_SILENCE_MS, help="Pause between sentences")
+    parser.add_argument("--memory-budget-mb", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="Memory budget for the Piper processes")
+    parser.add_argument("--piper", help="Path to the piper executable")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Piper processes or in-process ONNX Runtime")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Directory with downloaded models")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only synthesize sentences that changed since the last render of --output")
+    parser.add_argument("--metrics-file", help="Write stage timings here (.prom for Prometheus text, else JSON)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    model_path = args.model
+    if not model_path:
+        quality, quality_info = resolve_voice_quality(load_model_repository(MODELS_JSON_PATH),
+                                                      args.language, args.voice, args.quality)
+        if quality_info is None:
+            print(f"Error: unknown voice {args.language}/{args.voice}", file=sys.stderr)
+            return 2
+        model_path = model_path_for(args.models_dir, args.language, args.voice, quality_info)
+    if not os.path.exists(model_path):
+        print(f"Error: model not found at {model_path}", file=sys.stderr)
+        return 2
+    speaker_id = None
+    if args.speaker is not None:
+        try:
+            speakers = parse_speakers(args.speaker, model_speakers(model_path))
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        if len(speakers) != 1:
+            print("Error: --speaker takes a single speaker", file=sys.stderr)
+            return 2
+        speaker_id = speakers[0][1]
+
+    if args.text_file == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.text_file, "r", encoding="utf-8") as f:
+            text = f.read()
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, args.workers)
+    try:
+        pool = create_engine(args.engine, find_piper_exe(args.piper), output_dir, workers_per_model=workers,
+                             max_workers=workers, memory_budget=args.memory_budget_mb * 1024 * 1024)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        render_document(
+            pool, model_path, text, args.output,
+            silence_ms=args.silence_ms,
+            parallelism=workers,
+            speaker_id=speaker_id,
+            incremental=args.incremental,
+            progress=lambda done, total: print(f"Log: {done}/{total} sentences rendered"),
+        )
+    finally:
+        pool.shutdown()
+    print(f"Log: Document written to {args.output}")
+    print(f"Log: Stage timings:\n{format_stage_summary(METRICS.stage_summary())}")
+    if args.metrics_file:
+        METRICS.write(args.metrics_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
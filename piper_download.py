@@ -0,0 +1,438 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from piper_metrics import METRICS
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes read from the socket at a time
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024  # bytes buffered before each write
+DEFAULT_SEGMENTS = 4  # parallel range requests for large files
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024  # files smaller than two segments use one connection
+PROGRESS_INTERVAL = 0.1  # seconds between progress callbacks
+REQUEST_TIMEOUT = 30  # seconds to connect / between received bytes
+CONNECTION_POOL_SIZE = 16
+DEFAULT_CONCURRENT_DOWNLOADS = 4  # items downloaded at once by a DownloadQueue
+QUEUE_SEGMENTS = 2  # range segments per file while several items download at once
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class IntegrityError(Exception):
+    pass
+
+
+def get_session():
+    """Shared requests session so downloads reuse pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported on first use: requests alone takes longer to import than the app window takes to open
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=CONNECTION_POOL_SIZE, pool_maxsize=CONNECTION_POOL_SIZE,
+                                  max_retries=3)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def verify_file(path, expected_size=None, sha256=None, md5=None):
+    """Raise IntegrityError if the file does not match the expected size or digests"""
+    size = os.path.getsize(path)
+    if expected_size is not None and size != int(expected_size):
+        raise IntegrityError(f"{os.path.basename(path)} is {size} bytes, expected {expected_size}")
+    for algorithm, expected in (("sha256", sha256), ("md5", md5)):
+        if expected and file_digest(path, algorithm) != expected.lower():
+            raise IntegrityError(f"{os.path.basename(path)} failed the {algorithm} check")
+
+
+class _Progress:
+    """Thread-safe byte counter that reports at most every PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, total, callback, done=0):
+        self.total = total
+        self.callback = callback
+        self.done = done
+        self.lock = threading.Lock()
+        self.last_report = 0.0
+
+    def add(self, count):
+        with self.lock:
+            self.done += count
+            now = time.monotonic()
+            if self.callback and now - self.last_report >= PROGRESS_INTERVAL:
+                self.last_report = now
+                self.callback(self.done, self.total)
+
+    def finish(self):
+        if self.callback:
+            self.callback(self.done, self.total)
+
+
+class Downloader:
+    """Resumable HTTP downloader with optional parallel range segments
+
+    Data is written to <path>.part; segmented downloads keep their progress in
+    <path>.part.json so an interrupted download continues where it stopped.
+    The file is only renamed into place after the size and digest checks pass.
+    """
+
+    def __init__(self, session=None, segments=DEFAULT_SEGMENTS):
+        self._session = session
+        self.segments = max(1, segments)
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = get_session()
+        return self._session
+
+    def probe(self, url):
+        """Return (size, accepts_ranges, sha256) reported by the server"""
+        response = self.session.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        size = response.headers.get("Content-Length")
+        accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+        # Hugging Face reports the LFS object's SHA-256 on the redirecting response
+        sha256 = None
+        for hop in [response] + list(response.history):
+            linked = hop.headers.get("X-Linked-Etag", "").strip('"')
+            if len(linked) == 64:
+                sha256 = linked
+                size = hop.headers.get("X-Linked-Size", size)
+                break
+        return (int(size) if size else None), accepts_ranges, sha256
+
+    def download(self, url, path, expected_size=None, sha256=None, md5=None, progress=None, cancel_event=None):
+        """Download url to path and return path; raises DownloadCancelled or IntegrityError"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        part_path = path + ".part"
+        state_path = part_path + ".json"
+
+        import requests
+        try:
+            size, accepts_ranges, server_sha256 = self.probe(url)
+        except requests.RequestException as e:
+            print(f"Log: HEAD request failed for {url} ({e}), downloading without a size")
+            size, accepts_ranges, server_sha256 = None, False, None
+        expected_size = expected_size if expected_size is not None else size
+        sha256 = sha256 or server_sha256
+
+        if (accepts_ranges and size and self.segments > 1
+                and size >= 2 * MIN_SEGMENT_SIZE):
+            self._download_segmented(url, part_path, state_path, size, progress, cancel_event)
+        else:
+            if os.path.exists(state_path):
+                # Left over from a segmented attempt; its .part file has holes
+                _remove_if_exists(state_path)
+                _remove_if_exists(part_path)
+            self._download_single(url, part_path, size, accepts_ranges, progress, cancel_event)
+
+        try:
+            verify_file(part_path, expected_size, sha256, md5)
+        except IntegrityError:
+            # A corrupt partial download must not be resumed
+            _remove_if_exists(part_path)
+            _remove_if_exists(state_path)
+            raise
+        os.replace(part_path, path)
+        _remove_if_exists(state_path)
+        return path
+
+    def _stream_to(self, response, file, counter, cancel_event, limit=None):
+        """Copy a response body into an open file through a large write buffer"""
+        buffer = bytearray()
+        written = 0
+        try:
+            for data in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DownloadCancelled("Download cancelled")
+                if limit is not None:
+                    data = data[:limit - written - len(buffer)]
+                buffer += data
+                counter.add(len(data))
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    file.write(buffer)
+                    written += len(buffer)
+                    buffer.clear()
+                if limit is not None and written + len(buffer) >= limit:
+                    break
+        finally:
+            # Bytes received before a dropped connection or a cancel are kept for the resume
+            file.write(buffer)
+        return written + len(buffer)
+
+    def _download_single(self, url, part_path, size, accepts_ranges, progress, cancel_event):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size is not None and offset > size:
+            offset = 0
+        if size is not None and offset == size:
+            return
+
+        headers = {"Range": f"bytes={offset}-"} if offset and accepts_ranges else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0  # server ignored the range; start over
+            else:
+                print(f"Log: Resuming {os.path.basename(part_path)} at {offset} bytes")
+            total = size or int(response.headers.get("Content-Length", 0)) or None
+            counter = _Progress(total, progress, done=offset)
+            with open(part_path, "r+b" if offset else "wb") as file:
+                file.seek(offset)
+                file.truncate()
+                self._stream_to(response, file, counter, cancel_event)
+            counter.finish()
+
+    def _download_segmented(self, url, part_path, state_path, size, progress, cancel_event):
+        segments = self._load_segments(state_path, size)
+        if segments is None or not os.path.exists(part_path):
+            segment_size = -(-size // self.segments)
+            segments = [[start, min(start + segment_size, size), 0] for start in range(0, size, segment_size)]
+            with open(part_path, "wb") as file:
+                file.truncate(size)
+        else:
+            print(f"Log: Resuming {os.path.basename(part_path)} from saved segments")
+
+        counter = _Progress(size, progress, done=sum(segment[2] for segment in segments))
+        state_lock = threading.Lock()
+        errors = []
+        stop = _StopFlag(cancel_event)
+
+        def save_state():
+            with state_lock:
+                with open(state_path, "w", encoding="utf-8") as f:
+                    json.dump({"size": size, "segments": segments}, f)
+
+        def fetch(segment):
+            start, end, done = segment
+            if start + done >= end:
+                return
+            try:
+                headers = {"Range": f"bytes={start + done}-{end - 1}"}
+                with self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise IOError("Server ignored the range request")
+                    with open(part_path, "r+b") as file:
+                        file.seek(start + done)
+                        tracked = _SegmentFile(file, segment, save_state)
+                        self._stream_to(response, tracked, counter, stop, limit=end - start - done)
+            except Exception as e:
+                errors.append(e)
+                stop.set()  # a failed segment stops its siblings; the saved state allows a resume
+
+        save_state()
+        threads = [threading.Thread(target=fetch, args=(segment,), daemon=True) for segment in segments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        save_state()
+        counter.finish()
+
+        if errors:
+            cancelled = [e for e in errors if isinstance(e, DownloadCancelled)]
+            failures = [e for e in errors if not isinstance(e, DownloadCancelled)]
+            raise failures[0] if failures else cancelled[0]
+
+    def _load_segments(self, state_path, size):
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("size") != size:
+            return None
+        return state["segments"]
+
+
+class _StopFlag:
+    """Stops the segments of one download without touching the caller's cancel event"""
+
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+        self.stopped = threading.Event()
+
+    def set(self):
+        self.stopped.set()
+
+    def is_set(self):
+        return self.stopped.is_set() or (self.cancel_event is not None and self.cancel_event.is_set())
+
+
+class _SegmentFile:
+    """File wrapper that records how much of a segment has been written"""
+
+    def __init__(self, file, segment, on_write):
+        self.file = file
+        self.segment = segment
+        self.on_write = on_write
+
+    def write(self, data):
+        if data:
+            self.file.write(data)
+            self.file.flush()
+            self.segment[2] += len(data)
+            self.on_write()
+
+
+class DownloadItem:
+    """One queued model download (the model file plus its config)"""
+
+    def __init__(self, key, files, description):
+        self.key = key
+        self.files = files
+        self.description = description
+        self.status = "queued"  # queued, downloading, done, failed, cancelled
+        self.error = None
+        self.percent = 0
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"
+
+
+class DownloadQueue:
+    """Bounded pool of concurrent downloads; enqueueing a path already in flight returns the same item"""
+
+    def __init__(self, max_concurrent=DEFAULT_CONCURRENT_DOWNLOADS, session=None, on_update=None):
+        self.downloader = Downloader(session, segments=QUEUE_SEGMENTS)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent), thread_name_prefix="download")
+        self.on_update = on_update
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def enqueue(self, key, files, description=""):
+        """Queue files (url, path, expected) under key and return the DownloadItem"""
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item.status in ("queued", "downloading"):
+                return item
+            item = DownloadItem(key, files, description)
+            self.items[key] = item
+            item.future = self.executor.submit(self._run, item)
+        self._notify(item)
+        return item
+
+    def active_items(self):
+        with self.lock:
+            return [item for item in self.items.values() if item.status in ("queued", "downloading")]
+
+    def cancel(self, key):
+        with self.lock:
+            item = self.items.get(key)
+        if item is not None and item.status in ("queued", "downloading"):
+            item.cancel()
+            if item.status == "cancelled":
+                self._notify(item)
+
+    def cancel_all(self):
+        for item in self.active_items():
+            self.cancel(item.key)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False)
+
+    def _notify(self, item):
+        if self.on_update is not None:
+            self.on_update(item)
+
+    def _run(self, item):
+        item.status = "downloading"
+        self._notify(item)
+        started = time.perf_counter()
+        try:
+            for index, (url, path, expected) in enumerate(item.files):
+                if os.path.exists(path):
+                    continue
+
+                def progress(done, total, index=index):
+                    if total:
+                        item.percent = int((index + done / total) * 100 / len(item.files))
+                        self._notify(item)
+
+                self.downloader.download(url, path, expected.get("size"), expected.get("sha256"), expected.get("md5"),
+                                         progress=progress, cancel_event=item.cancel_event)
+            item.percent = 100
+            item.status = "done"
+        except DownloadCancelled:
+            item.status = "cancelled"
+        except Exception as e:
+            item.status = "failed"
+            item.error = str(e)
+        METRICS.record_stage("download", time.perf_counter() - started, outcome=item.status)
+        METRICS.increment("downloads_total", status=item.status)
+        self._notify(item)
+        return item
+
+
+def main(argv=None):
+    """Prefetch models for offline use: python piper_download.py --language en_US --quality medium"""
+    from piper_paths import MODELS_DIR, MODELS_JSON_PATH
+    from piper_catalog import load_model_repository, iter_voice_models, download_files
+
+    parser = argparse.ArgumentParser(prog="piper_download", description="Download voice models ahead of time")
+    parser.add_argument("--language", help="Only voices of this language, e.g. en_US")
+    parser.add_argument("--quality", help="Only this quality, e.g. medium")
+    parser.add_argument("--all-qualities", action="store_true", help="Every quality of every selected voice")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENT_DOWNLOADS, help="Parallel downloads")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Where models are stored")
+    args = parser.parse_args(argv)
+
+    repository = load_model_repository(MODELS_JSON_PATH)
+    queue = DownloadQueue(args.concurrency)
+    items = []
+    for language, voice_id, quality, quality_info, model_path in iter_voice_models(
+            repository, args.models_dir, args.language, args.quality,
+            exact_quality=bool(args.quality), all_qualities=args.all_qualities):
+        items.append(queue.enqueue(model_path, download_files(quality_info, model_path),
+                                   f"{language}/{voice_id}/{quality}"))
+    print(f"Log: Prefetching {len(items)} models with {args.concurrency} concurrent downloads")
+
+    failed = 0
+    for future in as_completed([item.future for item in items]):
+        item = future.result()
+        if item.status != "done":
+            failed += 1
+            print(f"Log: {item.description}: {item.status} {item.error or ''}")
+        else:
+            print(f"Log: {item.description}: done")
+    queue.shutdown()
+    print(f"Log: Prefetch finished, {len(items) - failed} of {len(items)} models available")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
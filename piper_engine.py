@@ -0,0 +1,356 @@
+"""Synthesis engines: warm Piper subprocesses or ONNX Runtime inside this process.
+
+Every engine takes submit(model_path, text, output_file, speaker_id, parallelism)
+and returns a Future resolving to the written WAV path, so the app, batch,
+document and server code work with either. submit_pcm() resolves to the PCM
+itself for playback from memory; OnnxEngine never touches the disk for it.
+"""
+import os
+import sys
+import json
+import tempfile
+import threading
+import unicodedata
+import importlib.util
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# numpy and onnxruntime are imported by load_onnxruntime() when an ONNX voice is first needed
+np = None
+onnxruntime = None
+
+try:
+    from piper_phonemize import phonemize_espeak
+except ImportError:
+    phonemize_espeak = None
+
+from piper_paths import CACHE_DIR
+from piper_audio import read_wav, write_wav
+from piper_text import split_sentences
+from piper_cache import PhonemeCache
+from piper_metrics import METRICS
+from piper_tuning import DEFAULT_TIER, load_profile, pin_process
+
+ENGINES = ["auto", "piper", "onnx", "forkserver"]
+DEFAULT_MAX_VOICES = 4  # ONNX sessions kept loaded at once
+DEFAULT_SESSION_THREADS = 1  # intra-op threads per inference; requests run in parallel instead
+PHONEME_CACHE_PATH = os.path.join(CACHE_DIR, "phonemes.sqlite3")
+MAX_WAV_VALUE = 32767.0
+
+# Special symbols of Piper's phoneme id map
+PAD = "_"
+BOS = "^"
+EOS = "$"
+
+
+class SynthesisEngine:
+    """Interface shared by the synthesis engines"""
+
+    def submit(self, model_path, text, output_file, speaker_id=None, parallelism=None):
+        """Queue text for synthesis and return a Future resolving to output_file"""
+        raise NotImplementedError
+
+    def submit_pcm(self, model_path, text, speaker_id=None, parallelism=None):
+        """Queue text for synthesis and return a Future resolving to (params, frames) held in memory
+
+        Engines that can only write files render to a temporary WAV that is read back and removed.
+        """
+        fd, temp_file = tempfile.mkstemp(suffix=".wav", prefix="piper_")
+        os.close(fd)
+        result = Future()
+
+        def read_back(future):
+            try:
+                if not result.set_running_or_notify_cancel():
+                    return  # cancelled by the caller
+                error = future.exception()
+                if error is not None:
+                    result.set_exception(error)
+                else:
+                    with METRICS.span("file_read"):
+                        pcm = read_wav(temp_file)
+                    result.set_result(pcm)
+            except Exception as e:
+                result.set_exception(e)
+            finally:
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
+
+        try:
+            future = self.submit(model_path, text, temp_file, speaker_id, parallelism)
+        except Exception:
+            os.remove(temp_file)
+            raise
+        future.add_done_callback(read_back)
+        # Cancelling the returned future drops the request if it has not reached a worker yet
+        result.add_done_callback(lambda done: future.cancel() if done.cancelled() else None)
+        return result
+
+    def warm_up(self, model_path):
+        """Load a model ahead of its first request"""
+
+    def worker_count(self):
+        return 0
+
+    def memory_in_use(self):
+        return 0
+
+    def shutdown(self):
+        """Release processes, sessions and threads"""
+
+
+def onnx_available():
+    """True if onnxruntime and numpy are installed, without importing them"""
+    return onnxruntime is not None or all(importlib.util.find_spec(name) is not None
+                                          for name in ("numpy", "onnxruntime"))
+
+
+def load_onnxruntime():
+    """Import numpy and onnxruntime; done by the first voice loaded, off the caller's thread"""
+    global np, onnxruntime
+    if onnxruntime is None:
+        import numpy
+        import onnxruntime as runtime
+        np, onnxruntime = numpy, runtime
+
+
+class VoiceConfig:
+    """The parts of a Piper .onnx.json config needed for inference"""
+
+    def __init__(self, config):
+        self.sample_rate = config.get("audio", {}).get("sample_rate", 22050)
+        self.espeak_voice = config.get("espeak", {}).get("voice", "en-us")
+        self.phoneme_type = config.get("phoneme_type", "espeak")
+        self.phoneme_id_map = config.get("phoneme_id_map", {})
+        self.num_speakers = config.get("num_speakers", 1)
+        self.speaker_id_map = config.get("speaker_id_map", {})
+        inference = config.get("inference", {})
+        self.noise_scale = inference.get("noise_scale", 0.667)
+        self.length_scale = inference.get("length_scale", 1.0)
+        self.noise_w = inference.get("noise_w", 0.8)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+class OnnxVoice:
+    """One Piper model loaded into an onnxruntime.InferenceSession"""
+
+    def __init__(self, model_path, session_threads=DEFAULT_SESSION_THREADS, phoneme_cache=None):
+        load_onnxruntime()
+        self.model_path = model_path
+        self.phoneme_cache = phoneme_cache
+        self.config = VoiceConfig.load(model_path + ".json")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = session_threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.memory = os.path.getsize(model_path)
+
+    def phonemize(self, text):
+        """Phonemes of each sentence of text, taken from the phoneme cache where possible"""
+        if self.config.phoneme_type == "text":
+            return [list(unicodedata.normalize("NFD", text))]
+        if self.phoneme_cache is None:
+            return self._phonemize_espeak(text)
+
+        phonemes = []
+        for sentence in split_sentences(text):
+            cached = self.phoneme_cache.get(self.config.espeak_voice, sentence)
+            if cached is None:
+                cached = self._phonemize_espeak(sentence)
+                self.phoneme_cache.put(self.config.espeak_voice, sentence, cached)
+            phonemes.extend(cached)
+        return phonemes
+
+    def _phonemize_espeak(self, text):
+        if phonemize_espeak is None:
+            raise RuntimeError("The piper-phonemize package is needed to synthesize with ONNX Runtime")
+        return phonemize_espeak(text, self.config.espeak_voice)
+
+    def phoneme_ids(self, phonemes):
+        id_map = self.config.phoneme_id_map
+        ids = list(id_map[BOS])
+        for phoneme in phonemes:
+            if phoneme in id_map:
+                ids.extend(id_map[phoneme])
+                ids.extend(id_map[PAD])
+        ids.extend(id_map[EOS])
+        return ids
+
+    def synthesize_ids(self, phoneme_ids, speaker_id=None):
+        """Float audio for one sentence of phoneme ids"""
+        inputs = {
+            "input": np.array([phoneme_ids], dtype=np.int64),
+            "input_lengths": np.array([len(phoneme_ids)], dtype=np.int64),
+            "scales": np.array([self.config.noise_scale, self.config.length_scale, self.config.noise_w],
+                               dtype=np.float32),
+        }
+        if "sid" in self.input_names:
+            inputs["sid"] = np.array([speaker_id or 0], dtype=np.int64)
+        return self.session.run(None, inputs)[0].reshape(-1)
+
+    def synthesize(self, text, speaker_id=None):
+        """16-bit mono PCM of text as a NumPy array"""
+        sentences = [self.synthesize_ids(self.phoneme_ids(phonemes), speaker_id)
+                     for phonemes in self.phonemize(text) if phonemes]
+        if not sentences:
+            return np.zeros(0, dtype=np.int16)
+        audio = np.concatenate(sentences)
+        # Same normalization as Piper: scale the loudest sample to full range
+        audio = audio * (MAX_WAV_VALUE / max(0.01, float(np.max(np.abs(audio)))))
+        return np.clip(audio, -MAX_WAV_VALUE, MAX_WAV_VALUE).astype(np.int16)
+
+
+class OnnxEngine(SynthesisEngine):
+    """Runs Piper models with ONNX Runtime in this process, several requests at a time"""
+
+    def __init__(self, max_workers=None, max_voices=DEFAULT_MAX_VOICES, session_threads=DEFAULT_SESSION_THREADS,
+                 phoneme_cache=None, tuning=None):
+        if not onnx_available():
+            raise RuntimeError("onnxruntime and numpy are needed for the ONNX engine")
+        self.phoneme_cache = phoneme_cache
+        self.max_voices = max(1, max_voices)
+        self.session_threads = session_threads
+        # TuningProfile: concurrent requests and session threads by the quality of the model
+        self.tuning = tuning
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                           thread_name_prefix="onnx", initializer=self._pin_thread)
+        self.lock = threading.Lock()
+        self.voices = OrderedDict()  # model path -> OnnxVoice, least recently used first
+        self.loading = {}  # model path -> Event set once the voice is loaded
+        self.model_slots = {}  # model path -> Semaphore limiting its concurrent requests to the tuned count
+
+    def _pin_thread(self):
+        """Pin each executor thread (and the session threads it starts) to CPUs, as the profile asks"""
+        if self.tuning is None or not sys.platform.startswith("linux"):
+            return
+        cpus = self.tuning.allocate_cpus(self.tuning.tiers.get(DEFAULT_TIER))
+        if cpus:
+            pin_process(0, cpus)
+
+    def _tier(self, model_path):
+        return self.tuning.settings_for(model_path) if self.tuning is not None else None
+
+    def _model_slot(self, model_path):
+        """Context limiting a model to its tuned number of concurrent requests"""
+        tier = self._tier(model_path)
+        if tier is None:
+            return nullcontext()
+        with self.lock:
+            if model_path not in self.model_slots:
+                self.model_slots[model_path] = threading.Semaphore(tier.workers)
+            return self.model_slots[model_path]
+
+    def voice(self, model_path):
+        """The loaded voice for a model, loading it once even under concurrent requests"""
+        key = os.path.abspath(model_path)
+        while True:
+            with self.lock:
+                voice = self.voices.get(key)
+                if voice is not None:
+                    self.voices.move_to_end(key)
+                    return voice
+                loaded = self.loading.get(key)
+                if loaded is None:
+                    loaded = self.loading[key] = threading.Event()
+                    break
+            loaded.wait()
+
+        try:
+            print(f"Log: Loading {os.path.basename(key)} into ONNX Runtime")
+            with METRICS.span("model_load", engine="onnx"):
+                tier = self._tier(key)
+                voice = OnnxVoice(key, tier.threads if tier is not None else self.session_threads, self.phoneme_cache)
+            with self.lock:
+                self.voices[key] = voice
+                while len(self.voices) > self.max_voices:
+                    evicted, _ = self.voices.popitem(last=False)
+                    print(f"Log: Unloading {os.path.basename(evicted)} from ONNX Runtime")
+            return voice
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+            loaded.set()
+
+    def synthesize(self, model_path, text, speaker_id=None):
+        """Return (pcm, sample_rate) with pcm an int16 NumPy array"""
+        voice = self.voice(model_path)
+        return voice.synthesize(text, speaker_id), voice.config.sample_rate
+
+    def _synthesize_to_file(self, model_path, text, output_file, speaker_id):
+        params, frames = self._synthesize_pcm(model_path, text, speaker_id)
+        with METRICS.span("file_write"):
+            write_wav(output_file, frames, params)
+        return os.path.abspath(output_file)
+
+    def _synthesize_pcm(self, model_path, text, speaker_id):
+        voice = self.voice(model_path)
+        with self._model_slot(voice.model_path), METRICS.span("synthesis", engine="onnx"):
+            pcm, sample_rate = voice.synthesize(text, speaker_id), voice.config.sample_rate
+        if not len(pcm):
+            raise RuntimeError("No audio was produced for this text")
+        return (1, 2, sample_rate), pcm.tobytes()
+
+    def submit(self, model_path, text, output_file, speaker_id=None, parallelism=None):
+        return self.executor.submit(self._synthesize_to_file, model_path, text, output_file, speaker_id)
+
+    def submit_pcm(self, model_path, text, speaker_id=None, parallelism=None):
+        return self.executor.submit(self._synthesize_pcm, model_path, text, speaker_id)
+
+    def warm_up(self, model_path):
+        self.executor.submit(self.voice, model_path)
+
+    def worker_count(self):
+        with self.lock:
+            return len(self.voices)
+
+    def memory_in_use(self):
+        with self.lock:
+            return sum(voice.memory for voice in self.voices.values())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            self.voices.clear()
+        if self.phoneme_cache is not None:
+            print(f"Log: {self.phoneme_cache.stats_text()}")
+
+
+def create_engine(engine, piper_exe, output_dir, **pool_options):
+    """Build the requested engine; "auto" prefers Piper processes and falls back to ONNX Runtime
+
+    pool_options are PiperWorkerPool settings; the ONNX engine uses max_workers from them.
+    The engine follows this host's tuning profile (see piper_tuning.py) when there is one.
+    Raises RuntimeError when the engine cannot run here.
+    """
+    piper_found = bool(piper_exe) and os.path.exists(piper_exe)
+    if engine == "auto":
+        if not piper_found and not onnx_available():
+            raise RuntimeError(f"Piper executable not found at {piper_exe}, and onnxruntime is not installed")
+        engine = "piper" if piper_found else "onnx"
+
+    if engine not in ENGINES[1:]:
+        raise RuntimeError(f"Unknown engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    tuning = load_profile(engine)
+    if engine == "forkserver":
+        from piper_forkserver import ForkServerEngine
+        print("Log: Using the fork-server ONNX Runtime engine")
+        return ForkServerEngine(workers_per_model=pool_options.get("workers_per_model", 1),
+                                max_workers=pool_options.get("max_workers"), tuning=tuning)
+    if engine == "onnx":
+        print("Log: Using the in-process ONNX Runtime engine")
+        max_workers = pool_options.get("max_workers") or (tuning.max_workers() if tuning is not None else None)
+        return OnnxEngine(max_workers=max_workers, phoneme_cache=PhonemeCache(PHONEME_CACHE_PATH), tuning=tuning)
+    if not piper_found:
+        raise RuntimeError(f"Piper executable not found at {piper_exe}")
+
+    from piper_pool import PiperWorkerPool
+    return PiperWorkerPool(piper_exe, output_dir, tuning=tuning, **pool_options)
@@ -0,0 +1,341 @@
+"""Export synthesized audio as WAV, FLAC, Opus or MP3 off the caller's thread.
+
+Usage:
+    python piper_export.py --format flac --output-dir exported output/*.wav
+
+WAV exports are hardlinked when source and destination share a filesystem
+(except files of the app's cache and history, which are always copied),
+otherwise copied in kernel space with copy_file_range or sendfile, falling
+back to a buffered copy (Windows). Other formats are encoded by ffmpeg, one
+process per file, several files at once.
+"""
+import os
+import sys
+import time
+import wave
+import argparse
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from piper_audio import PcmClip, wav_data_layout
+from piper_paths import find_ffmpeg_exe
+from piper_metrics import METRICS
+
+COPY_BLOCK_SIZE = 64 * 1024 * 1024  # bytes per copy_file_range/sendfile call, between progress reports
+BUFFERED_COPY_SIZE = 4 * 1024 * 1024  # buffer of the plain copy fallback
+DEFAULT_EXPORT_JOBS = os.cpu_count() or 2
+
+# Export format -> (file extension, ffmpeg muxer and encoder arguments); WAV needs no encoder
+EXPORT_FORMATS = OrderedDict([
+    ("wav", (".wav", None)),
+    ("flac", (".flac", ["-c:a", "flac", "-f", "flac"])),
+    ("opus", (".opus", ["-c:a", "libopus", "-b:a", "48k", "-f", "ogg"])),
+    ("mp3", (".mp3", ["-c:a", "libmp3lame", "-q:a", "2", "-f", "mp3"])),
+])
+FORMAT_DISPLAY_NAMES = {"wav": "WAV", "flac": "FLAC", "opus": "Opus", "mp3": "MP3"}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def available_formats(ffmpeg_exe=None):
+    """Formats that can be written here; everything but WAV needs ffmpeg"""
+    if ffmpeg_exe:
+        return list(EXPORT_FORMATS)
+    return ["wav"]
+
+
+def export_path(source_path, output_dir, export_format):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(output_dir, stem + EXPORT_FORMATS[export_format][0])
+
+
+def _copy_range(src_fd, dst_fd, offset, count):
+    """Copy count bytes at offset inside the kernel where possible; returns (bytes copied, method)"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count, offset, offset), "copy_file_range"
+        except OSError:
+            pass
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        try:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            return os.sendfile(dst_fd, src_fd, offset, count), "sendfile"
+        except OSError:
+            pass
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    data = os.read(src_fd, min(count, BUFFERED_COPY_SIZE))
+    return os.write(dst_fd, data), "buffered"
+
+
+def fast_copy(src, dst, progress=None, cancel_event=None, allow_link=True):
+    """Copy src to dst with the cheapest available primitive and return the method used"""
+    part_path = dst + ".part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    if allow_link:
+        try:
+            os.link(src, part_path)
+            os.replace(part_path, dst)
+            if progress:
+                progress(1, 1)
+            return "hardlink"
+        except OSError:
+            pass  # another filesystem, or links not supported
+
+    method = "copy"
+    try:
+        with open(src, "rb") as fsrc, open(part_path, "wb") as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            copied = 0
+            while copied < size:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                count, method = _copy_range(fsrc.fileno(), fdst.fileno(), copied, min(COPY_BLOCK_SIZE, size - copied))
+                if count <= 0:
+                    raise OSError(f"{os.path.basename(src)} ended after {copied} of {size} bytes")
+                copied += count
+                if progress:
+                    progress(copied, size)
+        os.replace(part_path, dst)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return method
+
+
+def write_clip(clip, dst, progress=None, cancel_event=None):
+    """Write an in-memory PcmClip as a WAV file, chunk by chunk"""
+    part_path = dst + ".part"
+    try:
+        with wave.open(part_path, "wb") as out:
+            channels, sample_width, sample_rate = clip.params
+            out.setnchannels(channels)
+            out.setsampwidth(sample_width)
+            out.setframerate(sample_rate)
+            written = 0
+            for chunk in clip.chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                out.writeframes(chunk)
+                written += len(chunk)
+                if progress:
+                    progress(written, clip.size)
+        os.replace(part_path, dst)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return "memory"
+
+
+def transcode(source, dst, export_format, ffmpeg_exe, progress=None, cancel_event=None):
+    """Encode a WAV path or a PcmClip to dst with ffmpeg, reporting progress from its -progress output"""
+    if not ffmpeg_exe:
+        raise RuntimeError(f"ffmpeg is needed to export {FORMAT_DISPLAY_NAMES[export_format]}")
+    if isinstance(source, PcmClip):
+        channels, sample_width, sample_rate = source.params
+        duration_us = source.size / (channels * sample_width) / sample_rate * 1e6
+        input_args = ["-f", f"s{sample_width * 8}le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0"]
+    else:
+        (channels, sample_width, sample_rate), _, data_size = wav_data_layout(source)
+        duration_us = data_size / (channels * sample_width) / sample_rate * 1e6
+        input_args = ["-i", source]
+
+    part_path = dst + ".part"
+    command = [ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-y", *input_args,
+               *EXPORT_FORMATS[export_format][1], "-progress", "pipe:1", part_path]
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if isinstance(source, PcmClip) else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=creationflags)
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+    if isinstance(source, PcmClip):
+        threading.Thread(target=_feed_clip, args=(process, source), daemon=True).start()
+
+    try:
+        for line in process.stdout:
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                raise ExportCancelled()
+            key, _, value = line.decode("ascii", "replace").strip().partition("=")
+            # out_time_ms is also in microseconds; older ffmpeg builds only print that one
+            if key in ("out_time_us", "out_time_ms") and value.isdigit() and progress and duration_us:
+                progress(min(int(value), int(duration_us)), int(duration_us))
+        process.wait()
+        stderr_thread.join(timeout=1)
+        if process.returncode != 0:
+            message = b"".join(stderr_lines).decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {message[-500:]}")
+        os.replace(part_path, dst)
+    except BaseException:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return "ffmpeg"
+
+
+def _feed_clip(process, clip):
+    try:
+        for chunk in clip.chunks:
+            process.stdin.write(chunk)
+        process.stdin.close()
+    except OSError:
+        pass  # ffmpeg exited early; its exit code reports why
+
+
+class ExportItem:
+    """One file being exported"""
+
+    def __init__(self, key, source, destination, export_format):
+        self.key = key
+        self.source = source  # WAV path or PcmClip
+        self.destination = destination
+        self.export_format = export_format
+        self.description = os.path.basename(destination)
+        self.status = "queued"  # queued, exporting, done, failed, cancelled
+        self.error = None
+        self.percent = 0
+        self.method = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"
+
+
+class ExportQueue:
+    """Bounded pool of exports; transcodes run as parallel ffmpeg processes"""
+
+    def __init__(self, max_concurrent=DEFAULT_EXPORT_JOBS, ffmpeg_exe=None, on_update=None, no_link_dirs=()):
+        self.ffmpeg_exe = ffmpeg_exe
+        # Sources under these directories (the app's cache and history) are always copied, so an
+        # exported file edited in place cannot change them
+        self.no_link_dirs = [os.path.abspath(directory) for directory in no_link_dirs]
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent), thread_name_prefix="export")
+        self.on_update = on_update
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def enqueue(self, source, destination, export_format="wav"):
+        """Queue source (a WAV path or PcmClip) for export to destination and return the ExportItem"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+        key = os.path.abspath(destination)
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item.status in ("queued", "exporting"):
+                return item
+            item = ExportItem(key, source, destination, export_format)
+            self.items[key] = item
+            item.future = self.executor.submit(self._run, item)
+        self._notify(item)
+        return item
+
+    def enqueue_files(self, paths, output_dir, export_format="wav"):
+        """Queue many WAV files for export into output_dir"""
+        os.makedirs(output_dir, exist_ok=True)
+        return [self.enqueue(path, export_path(path, output_dir, export_format), export_format) for path in paths]
+
+    def may_link(self, source):
+        source = os.path.abspath(source)
+        return not any(source.startswith(directory + os.sep) for directory in self.no_link_dirs)
+
+    def active_items(self):
+        with self.lock:
+            return [item for item in self.items.values() if item.status in ("queued", "exporting")]
+
+    def cancel_all(self):
+        for item in self.active_items():
+            item.cancel()
+            if item.status == "cancelled":
+                self._notify(item)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False)
+
+    def _notify(self, item):
+        if self.on_update is not None:
+            self.on_update(item)
+
+    def _run(self, item):
+        item.status = "exporting"
+        self._notify(item)
+        started = time.perf_counter()
+
+        def progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            if percent != item.percent:
+                item.percent = percent
+                self._notify(item)
+
+        try:
+            directory = os.path.dirname(os.path.abspath(item.destination))
+            os.makedirs(directory, exist_ok=True)
+            if item.export_format != "wav":
+                item.method = transcode(item.source, item.destination, item.export_format, self.ffmpeg_exe,
+                                        progress, item.cancel_event)
+            elif isinstance(item.source, PcmClip):
+                item.method = write_clip(item.source, item.destination, progress, item.cancel_event)
+            elif os.path.abspath(item.source) == item.key:
+                item.method = "in place"
+            else:
+                item.method = fast_copy(item.source, item.destination, progress, item.cancel_event,
+                                        allow_link=self.may_link(item.source))
+            item.percent = 100
+            item.status = "done"
+        except ExportCancelled:
+            item.status = "cancelled"
+        except Exception as e:
+            item.status = "failed"
+            item.error = str(e)
+        METRICS.record_stage("export", time.perf_counter() - started, format=item.export_format, outcome=item.status)
+        METRICS.increment("exports_total", format=item.export_format, status=item.status)
+        self._notify(item)
+        return item
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="piper_export", description="Export WAV files, optionally transcoded")
+    parser.add_argument("files", nargs="+", help="WAV files to export")
+    parser.add_argument("--output-dir", required=True, help="Directory for the exported files")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="wav", help="Export format")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_EXPORT_JOBS, help="Files exported at once")
+    parser.add_argument("--ffmpeg", help="Path to ffmpeg (default: bundled ffmpeg folder, then PATH)")
+    args = parser.parse_args(argv)
+
+    ffmpeg_exe = find_ffmpeg_exe(args.ffmpeg)
+    if args.format not in available_formats(ffmpeg_exe):
+        print("Error: ffmpeg was not found, so only WAV can be exported")
+        return 2
+
+    queue = ExportQueue(args.jobs, ffmpeg_exe)
+    items = queue.enqueue_files(args.files, args.output_dir, args.format)
+    print(f"Log: Exporting {len(items)} files as {FORMAT_DISPLAY_NAMES[args.format]} with {args.jobs} jobs")
+    failed = 0
+    for future in as_completed([item.future for item in items]):
+        item = future.result()
+        if item.status != "done":
+            failed += 1
+            print(f"Log: {item.description}: {item.status} {item.error or ''}")
+        else:
+            print(f"Log: {item.description}: done ({item.method})")
+    queue.shutdown()
+    print(f"Log: Export finished, {len(items) - failed} of {len(items)} files written")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
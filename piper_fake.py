@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Stand-in for the piper executable, for benchmarking the app's orchestration without real voices.
+
+Usage:
+    python piper_fake.py --model voice.onnx --json-input --output_dir out < requests.jsonl
+
+Speaks the piper command line and JSON-input protocol: it "loads" the model
+by reading it into memory, then writes a WAV per request whose length follows
+the text and prints its path, taking FAKE_PIPER_RTF times the audio length to
+do so. The model load takes FAKE_PIPER_LOAD_MS, or a time that grows with the
+model size. Log lines on stderr mimic Piper's.
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import argparse
+
+SECONDS_PER_CHARACTER = 0.065  # speaking rate of the generated audio
+MIN_AUDIO_SECONDS = 0.2
+DEFAULT_RTF = 0.05
+LOAD_MS_BASE = 30
+LOAD_MS_PER_MB = 4
+QUALITY_SAMPLE_RATES = {"x_low": 16000, "low": 16000, "medium": 22050, "high": 22050}
+TONE_HZ = 220
+SPEAKER_TONE_STEP_HZ = 10  # each speaker of a multi-speaker model gets its own pitch
+TONE_AMPLITUDE = 3000
+
+
+def log(message):
+    sys.stderr.write(f"[piper] [info] {message}\n")
+    sys.stderr.flush()
+
+
+def sample_rate_for(model_path):
+    try:
+        with open(model_path + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)["audio"]["sample_rate"]
+    except (OSError, ValueError, KeyError):
+        quality = os.path.splitext(os.path.basename(model_path))[0].rsplit("-", 1)[-1]
+        return QUALITY_SAMPLE_RATES.get(quality, 22050)
+
+
+def load_model(model_path):
+    """Hold the model in memory like Piper does, and take as long as a real load would"""
+    start = time.perf_counter()
+    with open(model_path, "rb") as f:
+        weights = f.read()
+    load_ms = os.environ.get("FAKE_PIPER_LOAD_MS")
+    load_seconds = float(load_ms) / 1000 if load_ms else \
+        (LOAD_MS_BASE + LOAD_MS_PER_MB * len(weights) / (1024 * 1024)) / 1000
+    time.sleep(max(0.0, load_seconds - (time.perf_counter() - start)))
+    log(f"Loaded voice in {time.perf_counter() - start:.3f} second(s)")
+    return weights
+
+
+def tone(sample_rate, seconds, hz=TONE_HZ):
+    period = int(sample_rate / hz)
+    cycle = b"".join(int(TONE_AMPLITUDE * math.sin(2 * math.pi * i / period)).to_bytes(2, "little", signed=True)
+                     for i in range(period))
+    frame_count = int(sample_rate * seconds)
+    return (cycle * (frame_count // period + 1))[:frame_count * 2]
+
+
+def synthesize(text, sample_rate, rtf, speaker=0):
+    start = time.perf_counter()
+    audio_seconds = max(MIN_AUDIO_SECONDS, len(text.strip()) * SECONDS_PER_CHARACTER)
+    frames = tone(sample_rate, audio_seconds, TONE_HZ + SPEAKER_TONE_STEP_HZ * speaker)
+    time.sleep(max(0.0, audio_seconds * rtf - (time.perf_counter() - start)))
+    infer = time.perf_counter() - start
+    log(f"Real-time factor: {infer / audio_seconds:.4f} (infer={infer:.3f} sec, audio={audio_seconds:.3f} sec)")
+    return frames
+
+
+def write_wav(path, frames, sample_rate):
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="piper_fake", description="Piper stand-in for benchmarks")
+    parser.add_argument("-m", "--model", required=True)
+    parser.add_argument("-f", "--output_file", "--output-file")
+    parser.add_argument("-d", "--output_dir", "--output-dir", default=".")
+    parser.add_argument("--output-raw", "--output_raw", action="store_true")
+    parser.add_argument("--json-input", action="store_true")
+    parser.add_argument("-s", "--speaker", type=int, default=0)
+    args, _ = parser.parse_known_args(argv)
+
+    weights = load_model(args.model)
+    sample_rate = sample_rate_for(args.model)
+    rtf = float(os.environ.get("FAKE_PIPER_RTF", DEFAULT_RTF))
+
+    if args.output_file and not args.json_input:
+        write_wav(args.output_file, synthesize(sys.stdin.read(), sample_rate, rtf, args.speaker), sample_rate)
+        return 0
+
+    for index, line in enumerate(sys.stdin):
+        if not line.strip():
+            continue
+        request = json.loads(line) if args.json_input else {"text": line}
+        frames = synthesize(request.get("text", ""), sample_rate, rtf, int(request.get("speaker_id", args.speaker)))
+        if args.output_raw:
+            sys.stdout.buffer.write(frames)
+            sys.stdout.buffer.flush()
+            continue
+        output_file = request.get("output_file") or os.path.join(args.output_dir, f"{int(time.time() * 1000)}_{index}.wav")
+        write_wav(output_file, frames, sample_rate)
+        print(os.path.abspath(output_file), flush=True)
+    del weights
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""Fork-server engine: every ONNX model is loaded once and shared by all of its workers.
+
+Usage:
+    PIPER_ENGINE=forkserver python piper_ui.py
+    python piper_ui.py serve --engine forkserver --workers 16
+    python piper_forkserver.py --model en_US-amy-high.onnx --workers 16
+
+A Piper process holds its own copy of the model weights, so 16 workers of one
+voice cost 16 models of memory. This engine starts a single server process
+that loads each model into ONNX Runtime once and forks the workers from it;
+the weight pages stay shared copy-on-write, so an extra worker costs only its
+own buffers. memory_report() lists the resident (RSS) and proportional (PSS)
+memory of every process; PSS splits shared pages between the processes that
+map them, so its sum is what the workers really cost together.
+
+Sessions use one intra-op thread, since ONNX Runtime's thread pool does not
+survive a fork; parallelism comes from the number of workers instead. Needs
+os.fork (Linux or macOS).
+"""
+import os
+import sys
+import queue
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import send_handle, recv_handle
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from piper_audio import write_wav
+from piper_engine import SynthesisEngine, OnnxVoice, onnx_available
+from piper_metrics import METRICS
+
+DEFAULT_WORKERS_PER_MODEL = 1
+SERVER_SHUTDOWN_TIMEOUT = 5  # seconds
+WARM_UP_TEXT = "Hello."  # rendered once in the server so workers inherit an initialized session
+CHECKOUT_POLL = 1.0  # seconds between checks for a free worker slot
+
+
+def process_memory(pid):
+    """{"rss", "pss", "shared"} of a process in bytes, pss None where the OS does not report it; None if unreadable"""
+    try:
+        values = {}
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="ascii") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                fields = rest.split()
+                if len(fields) == 2 and fields[1] == "kB":
+                    values[name] = int(fields[0]) * 1024
+        return {"rss": values.get("Rss", 0), "pss": values.get("Pss"),
+                "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)}
+    except (OSError, ValueError):
+        pass
+    if psutil is not None:
+        try:
+            info = psutil.Process(pid).memory_info()
+            return {"rss": info.rss, "pss": None, "shared": getattr(info, "shared", 0)}
+        except psutil.Error:
+            pass
+    return None
+
+
+def run_worker(voice, conn):
+    """Body of a forked worker: synthesize (text, speaker_id) requests until the app hangs up"""
+    while True:
+        try:
+            text, speaker_id = conn.recv()
+        except (EOFError, OSError):
+            return 0
+        try:
+            pcm = voice.synthesize(text, speaker_id)
+            conn.send((True, ((1, 2, voice.config.sample_rate), pcm.tobytes())))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+def serve(fd):
+    """Body of the server process: load models on request and fork workers that share them"""
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # the kernel reaps finished workers
+    control = Connection(fd)
+    voices = {}
+    while True:
+        try:
+            request = control.recv()
+        except (EOFError, OSError):
+            return 0
+        model_path = request["model"]
+        try:
+            voice = voices.get(model_path)
+            if voice is None:
+                print(f"Log: Fork server loading {os.path.basename(model_path)}")
+                voice = OnnxVoice(model_path, session_threads=1)
+                voice.synthesize(WARM_UP_TEXT)
+                voices[model_path] = voice
+            ours, theirs = socket.socketpair()
+            pid = os.fork()
+            if pid == 0:
+                control.close()
+                ours.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                os._exit(run_worker(voice, Connection(theirs.detach())))
+            theirs.close()
+        except Exception as e:
+            control.send({"error": str(e)})
+            continue
+        control.send({"pid": pid})
+        send_handle(control, ours.fileno(), request["app_pid"])
+        ours.close()
+
+
+class ForkedWorker:
+    def __init__(self, key, pid, conn):
+        self.key = key
+        self.pid = pid
+        self.conn = conn
+
+
+class ForkServerEngine(SynthesisEngine):
+    """ONNX Runtime workers forked from one server process that holds each model once"""
+
+    def __init__(self, workers_per_model=DEFAULT_WORKERS_PER_MODEL, max_workers=None, tuning=None):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("The fork-server engine needs os.fork (Linux or macOS)")
+        if not onnx_available():
+            raise RuntimeError("onnxruntime and numpy are needed for the fork-server engine")
+        self.workers_per_model = max(1, workers_per_model)
+        self.tuning = tuning  # TuningProfile: workers and CPU affinity by the quality of the model
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                           thread_name_prefix="forkserver")
+        self.lock = threading.Lock()
+        self.control_lock = threading.Lock()  # one request at a time on the server's control connection
+        self.server = None
+        self.control = None
+        self.workers = {}  # model path -> [ForkedWorker]
+        self.idle = {}  # model path -> Queue of idle ForkedWorker
+        self.starting = {}  # model path -> workers being forked
+        self.model_worker_limits = {}  # per-model overrides from bursts (the parallelism argument)
+        self.closed = False
+
+    def _tier(self, key):
+        return self.tuning.settings_for(key) if self.tuning is not None else None
+
+    def _worker_limit(self, key):
+        tier = self._tier(key)
+        base = tier.workers if tier is not None else self.workers_per_model
+        return max(base, self.model_worker_limits.get(key, 0))
+
+    def _start_server(self):
+        ours, theirs = socket.socketpair()
+        command = [sys.executable, os.path.abspath(__file__), "--serve", str(theirs.fileno())]
+        print(f"Log: Starting fork server: {' '.join(command)}")
+        with METRICS.span("process_start", engine="forkserver"):
+            self.server = subprocess.Popen(command, pass_fds=(theirs.fileno(),),
+                                           cwd=os.path.dirname(os.path.abspath(__file__)))
+        theirs.close()
+        self.control = Connection(ours.detach())
+
+    def _spawn_worker(self, key):
+        """Fork a worker for a model, loading the model into the server first if needed"""
+        with self.control_lock:
+            if self.closed:
+                raise RuntimeError("Fork-server engine has been shut down")
+            if self.server is None or self.server.poll() is not None:
+                self._start_server()
+            try:
+                with METRICS.span("model_load", engine="forkserver"):
+                    self.control.send({"model": key, "app_pid": os.getpid()})
+                    reply = self.control.recv()
+                    if "error" in reply:
+                        raise RuntimeError(reply["error"])
+                    fd = recv_handle(self.control)
+            except (EOFError, OSError) as e:
+                raise RuntimeError(f"Fork server exited: {e}")
+        worker = ForkedWorker(key, reply["pid"], Connection(fd))
+        METRICS.increment("worker_starts_total", engine="forkserver")
+        cpus = self.tuning.allocate_cpus(self._tier(key)) if self.tuning is not None else None
+        if cpus:
+            from piper_tuning import pin_process
+            pin_process(worker.pid, cpus)
+        print(f"Log: Forked worker {worker.pid} for {os.path.basename(key)}")
+        return worker
+
+    def _checkout(self, key):
+        """An idle worker of the model, forking a new one while under its worker limit"""
+        while True:
+            with self.lock:
+                if self.closed:
+                    raise RuntimeError("Fork-server engine has been shut down")
+                idle = self.idle.setdefault(key, queue.Queue())
+                try:
+                    return idle.get_nowait()
+                except queue.Empty:
+                    pass
+                running = len(self.workers.get(key, [])) + self.starting.get(key, 0)
+                if running < self._worker_limit(key):
+                    self.starting[key] = self.starting.get(key, 0) + 1
+                    break
+            try:
+                return idle.get(timeout=CHECKOUT_POLL)
+            except queue.Empty:
+                continue
+        try:
+            worker = self._spawn_worker(key)
+        finally:
+            with self.lock:
+                self.starting[key] -= 1
+        with self.lock:
+            self.workers.setdefault(key, []).append(worker)
+        return worker
+
+    def _retire(self, worker):
+        with self.lock:
+            workers = self.workers.get(worker.key, [])
+            if worker in workers:
+                workers.remove(worker)
+        worker.conn.close()
+
+    def _synthesize_pcm(self, model_path, text, speaker_id):
+        key = os.path.abspath(model_path)
+        # A worker that died between requests is replaced and the request tried once more
+        for attempt in range(2):
+            worker = self._checkout(key)
+            try:
+                with METRICS.span("synthesis", engine="forkserver"):
+                    worker.conn.send((text, speaker_id))
+                    ok, result = worker.conn.recv()
+                break
+            except (EOFError, OSError) as e:
+                self._retire(worker)
+                if attempt:
+                    raise RuntimeError(f"Fork-server worker {worker.pid} exited: {e}")
+                print(f"Log: Fork-server worker {worker.pid} exited, retrying on another worker")
+            except BaseException:
+                # A garbled or interrupted exchange leaves the connection out of step; never reuse it
+                self._retire(worker)
+                raise
+        self.idle[key].put(worker)
+        if not ok:
+            raise RuntimeError(result)
+        params, frames = result
+        if not frames:
+            raise RuntimeError("No audio was produced for this text")
+        return tuple(params), frames
+
+    def _synthesize_to_file(self, model_path, text, output_file, speaker_id):
+        params, frames = self._synthesize_pcm(model_path, text, speaker_id)
+        with METRICS.span("file_write"):
+            write_wav(output_file, frames, params)
+        return os.path.abspath(output_file)
+
+    def _note_parallelism(self, model_path, parallelism):
+        if parallelism:
+            with self.lock:
+                self.model_worker_limits[os.path.abspath(model_path)] = max(1, parallelism)
+
+    def submit(self, model_path, text, output_file, speaker_id=None, parallelism=None):
+        self._note_parallelism(model_path, parallelism)
+        return self.executor.submit(self._synthesize_to_file, model_path, text, output_file, speaker_id)
+
+    def submit_pcm(self, model_path, text, speaker_id=None, parallelism=None):
+        self._note_parallelism(model_path, parallelism)
+        return self.executor.submit(self._synthesize_pcm, model_path, text, speaker_id)
+
+    def warm_up(self, model_path):
+        key = os.path.abspath(model_path)
+
+        def start():
+            with self.lock:
+                if self.workers.get(key) or self.starting.get(key):
+                    return
+            self.idle.setdefault(key, queue.Queue()).put(self._checkout(key))
+
+        self.executor.submit(start)
+
+    def worker_count(self):
+        with self.lock:
+            return sum(len(workers) for workers in self.workers.values())
+
+    def memory_report(self):
+        """Memory of the server and of every worker: [{"role", "model", "pid", "rss", "pss", "shared"}]"""
+        with self.lock:
+            processes = [("server", None, self.server.pid)] if self.server is not None else []
+            processes += [("worker", os.path.basename(worker.key), worker.pid)
+                          for workers in self.workers.values() for worker in workers]
+        report = []
+        for role, model, pid in processes:
+            memory = process_memory(pid)
+            if memory is not None:
+                report.append(dict(memory, role=role, model=model, pid=pid))
+        return report
+
+    def memory_in_use(self):
+        """What the server and workers cost together: the sum of their PSS (RSS where PSS is not reported)"""
+        return sum(row["pss"] if row["pss"] is not None else row["rss"] for row in self.memory_report())
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            workers = [worker for workers in self.workers.values() for worker in workers]
+            self.workers = {}
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for worker in workers:
+            worker.conn.close()  # the worker sees EOF and exits
+        with self.control_lock:
+            if self.control is not None:
+                self.control.close()
+            if self.server is not None:
+                try:
+                    self.server.wait(timeout=SERVER_SHUTDOWN_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    self.server.kill()
+                    self.server.wait()
+
+
+def format_mb(size):
+    return f"{size / (1024 * 1024):.1f} MB" if size is not None else "-"
+
+
+def print_memory_report(report):
+    print(f"{'role':8} {'pid':>7} {'rss':>10} {'pss':>10} {'shared':>10}  model")
+    for row in report:
+        print(f"{row['role']:8} {row['pid']:>7} {format_mb(row['rss']):>10} {format_mb(row['pss']):>10} "
+              f"{format_mb(row['shared']):>10}  {row['model'] or ''}")
+    rss = sum(row["rss"] for row in report)
+    pss = sum(row["pss"] if row["pss"] is not None else row["rss"] for row in report)
+    print(f"Total RSS {format_mb(rss)} (roughly what separate processes would need), "
+          f"actual use (PSS) {format_mb(pss)}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="piper_forkserver",
+                                     description="Run a voice on fork-server workers and show their memory use")
+    parser.add_argument("--model", help="Path to a Piper .onnx model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Workers to fork")
+    parser.add_argument("--text", default="The quick brown fox jumps over the lazy dog.", help="Text each request renders")
+    parser.add_argument("--requests", type=int, help="Requests to render (default: two per worker)")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)  # control socket of a server process
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.serve is not None:
+        return serve(args.serve)
+    if not args.model:
+        parser.error("--model is required")
+
+    workers = max(1, args.workers)
+    try:
+        engine = ForkServerEngine(workers_per_model=workers, max_workers=workers)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        futures = [engine.submit_pcm(args.model, args.text, parallelism=workers)
+                   for _ in range(args.requests or workers * 2)]
+        wait(futures)
+        failed = [future.exception() for future in futures if future.exception() is not None]
+        if failed:
+            print(f"Error: {len(failed)} request(s) failed: {failed[0]}", file=sys.stderr)
+        print_memory_report(engine.memory_report())
+    finally:
+        engine.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Inventory of the voice models installed under MODELS_DIR.
+
+Usage:
+    python piper_inventory.py [--hash]
+
+The models directory is walked once with os.scandir; afterwards only the
+directories reported by a file watcher are rescanned, so "is this model
+installed?" is a dictionary lookup instead of a stat call per query.
+"""
+import os
+import sys
+import argparse
+import threading
+
+from piper_paths import MODELS_DIR
+from piper_cache import shared_model_hashes
+
+MODEL_EXTENSION = ".onnx"
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class ModelRecord:
+    """One .onnx file found on disk"""
+
+    def __init__(self, path, size, mtime_ns, has_config):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.has_config = has_config
+
+    @property
+    def installed(self):
+        return self.size > 0 and self.has_config
+
+
+class ModelInventory:
+    """Side-effect free answers about which models are on disk"""
+
+    def __init__(self, models_dir=MODELS_DIR, model_hashes=None):
+        self.models_dir = models_dir
+        self.model_hashes = model_hashes or shared_model_hashes()  # the memo the synthesis cache uses too
+        self.lock = threading.Lock()
+        self.records = {}  # normalized model path -> ModelRecord
+        self.dirs = {}  # normalized directory path -> directory path, as of the last scans
+
+    def _scan_tree(self, directory, visited):
+        """Yield a ModelRecord for every .onnx file below directory, adding each directory read to visited"""
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        visited[_key(directory)] = directory
+        names = {entry.name for entry in entries}
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._scan_tree(entry.path, visited)
+                elif entry.name.endswith(MODEL_EXTENSION) and entry.is_file():
+                    stat = entry.stat()
+                    yield ModelRecord(entry.path, stat.st_size, stat.st_mtime_ns,
+                                      entry.name + ".json" in names)
+            except OSError:
+                continue
+
+    def scan(self, directory=None):
+        """Rescan directory (default: the whole models directory) and return the number of models in it"""
+        directory = directory or self.models_dir
+        prefix = _key(directory) + os.sep
+        visited = {}
+        found = {_key(record.path): record for record in self._scan_tree(directory, visited)}
+        with self.lock:
+            for key in [key for key in self.records if key.startswith(prefix)]:
+                del self.records[key]
+            self.records.update(found)
+            for key in [key for key in self.dirs if key == _key(directory) or key.startswith(prefix)]:
+                del self.dirs[key]
+            self.dirs.update(visited)
+        return len(found)
+
+    def refresh(self, path):
+        """Update the record of one model file after it was written or removed"""
+        key = _key(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.records.pop(key, None)
+            return
+        record = ModelRecord(path, stat.st_size, stat.st_mtime_ns, os.path.exists(path + ".json"))
+        with self.lock:
+            self.records[key] = record
+
+    def is_installed(self, model_path):
+        """True if the model and its config are on disk, as of the last scan"""
+        if not model_path:
+            return False
+        record = self.records.get(_key(model_path))
+        return record is not None and record.installed
+
+    def record(self, model_path):
+        return self.records.get(_key(model_path))
+
+    def installed_records(self):
+        with self.lock:
+            return sorted((record for record in self.records.values() if record.installed), key=lambda r: r.path)
+
+    def total_size(self):
+        return sum(record.size for record in self.installed_records())
+
+    def directories(self, below=None):
+        """The directories found by the last scans, optionally only below (and including) one, for the file watcher"""
+        with self.lock:
+            if below is None:
+                return list(self.dirs.values())
+            key = _key(below)
+            return [path for dir_key, path in self.dirs.items() if dir_key == key or dir_key.startswith(key + os.sep)]
+
+    def sha256(self, record, compute=False):
+        """SHA-256 of a record's model from the shared memo; None if not hashed yet and compute is off"""
+        if compute:
+            return self.model_hashes.get(record.path)
+        return self.model_hashes.known(record.path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="piper_inventory", description="List the installed voice models")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Directory with downloaded models")
+    parser.add_argument("--hash", action="store_true", help="Compute SHA-256 of models not hashed yet")
+    args = parser.parse_args(argv)
+
+    inventory = ModelInventory(args.models_dir)
+    inventory.scan()
+    for record in inventory.installed_records():
+        try:
+            digest = inventory.sha256(record, compute=args.hash)
+        except OSError as e:
+            print(f"Log: Could not hash {record.path}: {e}")
+            digest = None
+        print(f"{os.path.relpath(record.path, args.models_dir)}\t{record.size / (1024 * 1024):.1f} MB\t{digest or '-'}")
+    print(f"Log: {len(inventory.installed_records())} models, {inventory.total_size() / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Priority job scheduler for the app's synthesis and download work.
+
+Jobs are started by priority (then in the order they were queued), with at
+most limits[kind] jobs of a kind running at once. A job's run callable only
+starts its work and returns; the work reports back through finish() (or
+progress()), so the scheduler never waits on anything and can be driven
+from the GUI thread. A job can depend on another one, such as a render
+waiting for its voice to download, and fails if that one does not finish.
+Queued jobs can be cancelled or moved to another priority at any time;
+cancelling a running job calls its cancel callable.
+"""
+import time
+import itertools
+import threading
+
+PRIORITIES = ["high", "normal", "low"]  # highest first
+ACTIVE_STATES = ("queued", "running")
+DEFAULT_KEEP_FINISHED = 200  # finished jobs kept for the job list
+
+
+class Job:
+    """One unit of work; state is queued, running, done, failed or cancelled"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, description, run, priority="normal", depends_on=None, cancel=None):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.description = description
+        self.run = run  # run(job): start the work without blocking
+        self.cancel_callback = cancel  # cancel(job): stop work that is already running
+        self.priority = priority if priority in PRIORITIES else "normal"
+        self.depends_on = depends_on
+        self.state = "queued"
+        self.progress = 0
+        self.status_text = ""
+        self.error = None
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+    def summary(self):
+        """One line for the job list"""
+        state = self.state
+        if self.state == "running":
+            state = self.status_text or (f"{self.progress}%" if self.progress else "running")
+        elif self.state == "failed" and self.error:
+            state = f"failed: {self.error}"
+        priority = "" if self.priority == "normal" or not self.active else f" [{self.priority}]"
+        return f"{self.description} - {state}{priority}"
+
+
+class JobScheduler:
+    """Starts queued jobs by priority, at most limits[kind] at a time for each kind"""
+
+    def __init__(self, limits, on_update=None, keep_finished=DEFAULT_KEEP_FINISHED):
+        self.limits = dict(limits)
+        self.on_update = on_update  # on_update(job) after every change of a job
+        self.keep_finished = keep_finished
+        self.jobs = {}  # id -> Job, in the order they were queued
+        self.lock = threading.RLock()
+        self.dispatching = False
+
+    def submit(self, job):
+        with self.lock:
+            self.jobs[job.id] = job
+        self._notify(job)
+        self.dispatch()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def active_jobs(self, kind=None):
+        with self.lock:
+            return [job for job in self.jobs.values() if job.active and (kind is None or job.kind == kind)]
+
+    def queued_count(self, kind=None):
+        return sum(1 for job in self.active_jobs(kind) if job.state == "queued")
+
+    def set_priority(self, job_id, priority):
+        """Move a queued job ahead of or behind others; running jobs keep running"""
+        job = self.jobs.get(job_id)
+        if job is None or not job.active or priority not in PRIORITIES:
+            return False
+        job.priority = priority
+        self._notify(job)
+        self.dispatch()
+        return True
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; queued jobs that depend on it fail"""
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        was_running = job.state == "running"
+        self._end(job, "cancelled")
+        if was_running and job.cancel_callback is not None:
+            try:
+                job.cancel_callback(job)
+            except Exception as e:
+                print(f"Log: Error cancelling job {job.description}: {e}")
+        self.dispatch()
+        return True
+
+    def cancel_all(self, kind=None):
+        # Queued jobs first, so cancelling a running one does not start the next
+        for job in sorted(self.active_jobs(kind), key=lambda job: job.state == "running"):
+            self.cancel(job.id)
+
+    def progress(self, job, percent=None, status_text=None):
+        if not job.active:
+            return
+        if percent is not None:
+            job.progress = percent
+        if status_text is not None:
+            job.status_text = status_text
+        self._notify(job)
+
+    def finish(self, job, error=None, result=None):
+        """Report the end of a running job's work; reports for cancelled jobs are ignored"""
+        if job.state != "running":
+            return
+        job.result = result
+        job.error = error
+        if error is None:
+            job.progress = 100
+        self._end(job, "failed" if error else "done")
+        self.dispatch()
+
+    def clear_finished(self):
+        with self.lock:
+            for job_id in [job.id for job in self.jobs.values() if not job.active]:
+                del self.jobs[job_id]
+
+    def dispatch(self):
+        """Start the most urgent queued jobs that have a free slot and nothing left to wait for"""
+        with self.lock:
+            if self.dispatching:
+                return  # a job started below finished synchronously; the loop picks up the rest
+            self.dispatching = True
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    break
+                job.state = "running"
+                job.started = time.time()
+                self._notify(job)
+                try:
+                    job.run(job)
+                except Exception as e:
+                    print(f"Log: Job {job.description} failed to start: {e}")
+                    job.error = str(e)
+                    self._end(job, "failed")
+        finally:
+            with self.lock:
+                self.dispatching = False
+
+    def _next_job(self):
+        failed, candidates = [], []
+        with self.lock:
+            running = {}
+            for job in self.jobs.values():
+                if job.state == "running":
+                    running[job.kind] = running.get(job.kind, 0) + 1
+            for job in self.jobs.values():
+                if job.state != "queued":
+                    continue
+                dependency = job.depends_on
+                if dependency is not None and dependency.state != "done":
+                    if not dependency.active:
+                        failed.append(job)
+                    continue
+                if running.get(job.kind, 0) < self.limits.get(job.kind, 1):
+                    candidates.append(job)
+        for job in failed:
+            job.error = f"{job.depends_on.description} {job.depends_on.state}"
+            self._end(job, "failed")
+        if not candidates:
+            return None
+        return min(candidates, key=lambda job: (PRIORITIES.index(job.priority), job.id))
+
+    def _end(self, job, state):
+        job.state = state
+        job.finished = time.time()
+        self._notify(job)
+        self._trim()
+
+    def _trim(self):
+        with self.lock:
+            finished = [job.id for job in self.jobs.values() if not job.active]
+            for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self.jobs[job_id]
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
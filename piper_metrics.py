@@ -0,0 +1,215 @@
+"""Stage timings, latency histograms and counters, exported as JSON or Prometheus text.
+
+Code measures a stage with
+
+    with METRICS.span("synthesis", engine="piper"):
+        ...
+
+which records its duration in the piper_stage_duration_seconds histogram.
+Counters go through METRICS.increment(). Everything is thread-safe and
+cheap enough to leave on; recent spans are kept for the app's debug overlay.
+"""
+import os
+import json
+import time
+import bisect
+import threading
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+METRIC_PREFIX = "piper_"
+STAGE_HISTOGRAM = "stage_duration_seconds"
+# Histogram upper bounds in seconds, from cache hits to cold starts of large voices
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SPANS = 50
+
+# Stages recorded across the app, in request order
+STAGES = ["startup", "text_prep", "model_resolution", "download", "queue_wait", "process_start", "model_load",
+          "synthesis", "file_read", "file_write", "playback_start", "time_to_first_audio", "request", "export"]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            total += count
+            yield bound, total
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    """Named counters and histograms, each split by labels"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = OrderedDict()  # (name, label key) -> value
+        self.histograms = OrderedDict()  # (name, label key) -> Histogram
+        self.recent = deque(maxlen=RECENT_SPANS)  # (time, stage, seconds, labels)
+        self.started = time.time()
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record_stage(self, stage, seconds, **labels):
+        self.observe(STAGE_HISTOGRAM, seconds, stage=stage, **labels)
+        with self.lock:
+            self.recent.append((time.time(), stage, seconds, labels))
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time the body of a with block as one occurrence of stage; failures are labelled"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record_stage(stage, time.perf_counter() - start, outcome="error", **labels)
+            raise
+        self.record_stage(stage, time.perf_counter() - start, **labels)
+
+    def stage_summary(self):
+        """{stage: {count, p50, p95, sum}} over all labels, for logs and the overlay"""
+        merged = {}
+        with self.lock:
+            for (name, key), histogram in self.histograms.items():
+                if name != STAGE_HISTOGRAM:
+                    continue
+                stage = dict(key)["stage"]
+                target = merged.get(stage)
+                if target is None:
+                    target = merged[stage] = Histogram(self.buckets)
+                target.counts = [a + b for a, b in zip(target.counts, histogram.counts)]
+                target.count += histogram.count
+                target.sum += histogram.sum
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        return OrderedDict(
+            (stage, {"count": histogram.count, "sum": histogram.sum,
+                     "p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95)})
+            for stage, histogram in sorted(merged.items(), key=lambda item: order.get(item[0], len(order))))
+
+    def recent_spans(self):
+        with self.lock:
+            return list(self.recent)
+
+    def to_json(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "exported": time.time(),
+                "counters": [{"name": METRIC_PREFIX + name, "labels": dict(key), "value": value}
+                             for (name, key), value in self.counters.items()],
+                "histograms": [{
+                    "name": METRIC_PREFIX + name,
+                    "labels": dict(key),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                    "buckets": [[bound if bound != float("inf") else "+Inf", total]
+                                for bound, total in histogram.cumulative()],
+                } for (name, key), histogram in self.histograms.items()],
+            }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name in OrderedDict.fromkeys(name for name, _ in self.counters):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+                for (counter_name, key), value in self.counters.items():
+                    if counter_name == name:
+                        lines.append(f"{METRIC_PREFIX}{name}{_format_labels(key)} {value}")
+            for name in OrderedDict.fromkeys(name for name, _ in self.histograms):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                for (histogram_name, key), histogram in self.histograms.items():
+                    if histogram_name != name:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        bound_text = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(key, [('le', bound_text)])} {total}")
+                    lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to path: Prometheus text for .prom files, JSON otherwise"""
+        if path.endswith(".prom"):
+            data = self.to_prometheus()
+        else:
+            data = json.dumps(self.to_json(), indent=2)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # scrapers never see a half-written file
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.recent.clear()
+            self.started = time.time()
+
+
+# Process-wide registry shared by the engines, queues, server and app
+METRICS = MetricsRegistry()
+
+
+def format_stage_summary(summary):
+    """One line per stage: count, median and 95th percentile in milliseconds"""
+    lines = []
+    for stage, values in summary.items():
+        p50 = f"{values['p50'] * 1000:.1f}" if values["p50"] is not None else "-"
+        p95 = f"{values['p95'] * 1000:.1f}" if values["p95"] is not None else "-"
+        lines.append(f"{stage:20} n={values['count']:<5} p50={p50:>8} ms  p95={p95:>8} ms")
+    return "\n".join(lines)
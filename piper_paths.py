@@ -0,0 +1,37 @@
+import os
+import shutil
+
+# Define application paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+CONFIG_DIR = os.path.join(BASE_DIR, "configs")
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+SAMPLES_DIR = os.path.join(BASE_DIR, "samples")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+PIPER_EXE = os.path.join(BASE_DIR, "piper_win", "piper.exe")
+FFMPEG_EXE = os.path.join(BASE_DIR, "ffmpeg", "ffmpeg.exe")
+ICON_PATH = os.path.join(BASE_DIR, "assets", "icon.ico")
+MODELS_JSON_PATH = os.path.join(BASE_DIR, "models.json")
+LANGUAGES_JSON_PATH = os.path.join(BASE_DIR, "languages.json")
+
+
+def ensure_directories():
+    """Create the application data directories"""
+    for directory in [MODELS_DIR, CONFIG_DIR, OUTPUT_DIR, SAMPLES_DIR, CACHE_DIR]:
+        os.makedirs(directory, exist_ok=True)
+
+
+def find_piper_exe(preferred=None):
+    """Locate the piper executable: explicit path, bundled piper_win build, then PATH"""
+    for candidate in [preferred, PIPER_EXE, os.path.join(BASE_DIR, "piper_win", "piper")]:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return shutil.which("piper") or PIPER_EXE
+
+
+def find_ffmpeg_exe(preferred=None):
+    """Locate ffmpeg for transcoding exports: explicit path, bundled ffmpeg folder, then PATH; None if missing"""
+    for candidate in [preferred, FFMPEG_EXE, os.path.join(BASE_DIR, "ffmpeg", "ffmpeg")]:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return shutil.which("ffmpeg")
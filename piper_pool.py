@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import Future
+
+from piper_engine import SynthesisEngine
+from piper_metrics import METRICS
+from piper_tuning import pin_process, thread_environment
+
+# Default pool settings
+DEFAULT_WORKERS_PER_MODEL = 1
+DEFAULT_IDLE_TIMEOUT = 300  # seconds before an unused Piper process is closed
+BURST_IDLE_TIMEOUT = 30  # seconds before workers above workers_per_model are closed
+DEFAULT_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024  # 2 GiB for all warm processes
+DEFAULT_BATCH_SIZE = 1  # JSON lines written to a Piper process before reading its results
+DEFAULT_BATCH_WINDOW = 0.0  # seconds a worker waits for more jobs to fill a batch
+
+# Rough resident size of a Piper process: ONNX weights plus runtime overhead
+MODEL_MEMORY_FACTOR = 2.5
+PROCESS_BASE_MEMORY = 40 * 1024 * 1024
+
+
+def estimate_worker_memory(model_path):
+    """Estimate the memory a Piper process needs for a given model"""
+    try:
+        model_size = os.path.getsize(model_path)
+    except OSError:
+        model_size = 0
+    return int(model_size * MODEL_MEMORY_FACTOR) + PROCESS_BASE_MEMORY
+
+
+class SynthesisJob:
+    def __init__(self, text, output_file, speaker_id=None):
+        self.text = text
+        self.output_file = os.path.abspath(output_file)
+        self.speaker_id = speaker_id
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+    def to_json_line(self):
+        request = {"text": self.text, "output_file": self.output_file}
+        if self.speaker_id is not None:
+            request["speaker_id"] = int(self.speaker_id)
+        return json.dumps(request, ensure_ascii=False) + "\n"
+
+
+class PiperWorker:
+    """A long-lived piper process that synthesizes one JSON line at a time"""
+
+    def __init__(self, pool, key, piper_exe, model_path, output_dir, threads=None, cpus=None):
+        self.pool = pool
+        self.key = key
+        self.model_path = model_path
+        self.memory = estimate_worker_memory(model_path)
+        self.last_used = time.monotonic()
+        self.busy = False
+        self.stop_requested = threading.Event()
+        self.stderr_tail = deque(maxlen=20)
+        self.cold = True  # the first batch also pays for loading the model
+
+        command = [
+            piper_exe,
+            "--model", model_path,
+            "--json-input",
+            "--output_dir", output_dir,
+        ]
+        print(f"Log: Starting Piper worker: {' '.join(command)}")
+        creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        with METRICS.span("process_start", engine="piper"):
+            self.process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=os.path.dirname(piper_exe) or None,
+                creationflags=creationflags,
+                env=thread_environment(threads) if threads else None,
+            )
+        if cpus and pin_process(self.process.pid, cpus):
+            print(f"Log: Piper worker {self.process.pid} pinned to CPUs {','.join(map(str, cpus))}")
+        METRICS.increment("worker_starts_total", engine="piper")
+
+        # Drain stderr so Piper never blocks on a full pipe
+        self.stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self.stderr_thread.start()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _read_stderr(self):
+        for line in iter(self.process.stderr.readline, b""):
+            self.stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+
+    def _run(self):
+        jobs = self.pool._job_queue(self.key)
+        while not self.stop_requested.is_set():
+            try:
+                job = jobs.get(timeout=1.0)
+            except queue.Empty:
+                idle_for = time.monotonic() - self.last_used
+                if idle_for > self.pool.idle_timeout:
+                    print(f"Log: Piper worker for {os.path.basename(self.model_path)} idle, closing")
+                    break
+                if idle_for > BURST_IDLE_TIMEOUT and self.pool._is_burst_worker(self):
+                    print(f"Log: Extra Piper worker for {os.path.basename(self.model_path)} idle, closing")
+                    break
+                if self.pool._is_starving_other_models(self.key):
+                    print(f"Log: Piper worker for {os.path.basename(self.model_path)} yielding to another model")
+                    break
+                continue
+
+            batch = [job for job in self._fill_batch(jobs, job) if job.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for job in batch:
+                METRICS.record_stage("queue_wait", started - job.queued_at, engine="piper")
+            self.busy = True
+            try:
+                self._synthesize_batch(batch)
+            finally:
+                self.busy = False
+                self.cold = False
+                self.last_used = time.monotonic()
+                self.pool._touch(self.key)
+            if self.process.poll() is not None:
+                break
+
+        self.close()
+        self.pool._worker_exited(self)
+
+    def _fill_batch(self, jobs, first_job):
+        """Collect up to batch_size queued jobs, waiting at most batch_window for stragglers"""
+        batch = [first_job]
+        deadline = time.monotonic() + self.pool.batch_window
+        while len(batch) < self.pool.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _synthesize_batch(self, batch):
+        """Write every job of the batch to Piper at once and resolve them as their WAVs appear"""
+        try:
+            if self.process.poll() is not None:
+                raise RuntimeError(self._exit_message())
+            self.process.stdin.write("".join(job.to_json_line() for job in batch).encode("utf-8"))
+            self.process.stdin.flush()
+        except Exception as e:
+            error = e if isinstance(e, RuntimeError) else RuntimeError(self._exit_message())
+            for job in batch:
+                job.future.set_exception(error)
+            return
+
+        since = time.perf_counter()
+        for index, job in enumerate(batch):
+            try:
+                result = self._read_result(job)
+            except Exception as e:
+                METRICS.increment("synthesis_errors_total", engine="piper")
+                job.future.set_exception(e)
+                if self.process.poll() is not None:
+                    for remaining in batch[index + 1:]:
+                        remaining.future.set_exception(RuntimeError(self._exit_message()))
+                    return
+                continue
+            # Piper answers in input order, so each job took the time since the previous answer
+            finished = time.perf_counter()
+            METRICS.record_stage("synthesis", finished - since, engine="piper",
+                                 cold="yes" if self.cold and index == 0 else "no")
+            since = finished
+            job.future.set_result(result)
+
+    def _read_result(self, job):
+        # Piper prints the path of each finished WAV on its own line, in input order
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError(self._exit_message())
+
+        output_file = line.decode("utf-8", errors="replace").strip() or job.output_file
+        if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+            raise RuntimeError(f"Piper did not produce {output_file}")
+        return output_file
+
+    def _exit_message(self):
+        self.process.poll()
+        message = f"Piper exited with code {self.process.returncode}"
+        if self.stderr_tail:
+            message += f"\nPiper stderr: {self.stderr_tail[-1]}"
+        return message
+
+    def close(self):
+        """Stop the piper process by closing its stdin"""
+        self.stop_requested.set()
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except Exception:
+                self.process.kill()
+
+
+class PiperWorkerPool(SynthesisEngine):
+    """Keeps warm Piper processes per model so each request skips process start and model load"""
+
+    def __init__(self, piper_exe, output_dir, workers_per_model=DEFAULT_WORKERS_PER_MODEL,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 max_workers=None, batch_size=DEFAULT_BATCH_SIZE, batch_window=DEFAULT_BATCH_WINDOW, tuning=None):
+        self.piper_exe = piper_exe
+        self.output_dir = output_dir
+        self.workers_per_model = max(1, workers_per_model)
+        self.max_workers = max_workers  # cap across all models, None for no cap
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.lock = threading.RLock()
+        self.queues = {}
+        self.workers = {}
+        self.last_used = {}
+        self.model_worker_limits = {}  # per-model overrides of workers_per_model
+        self.tuning = tuning  # TuningProfile: workers, threads and affinity by the quality of the model
+        self.closed = False
+
+    def submit(self, model_path, text, output_file, speaker_id=None, parallelism=None):
+        """Queue text for synthesis and return a Future resolving to the WAV path
+
+        parallelism lets a burst of requests (such as the sentences of a long
+        document) use more workers for this model than workers_per_model; the
+        extra workers close again shortly after the burst.
+        """
+        if self.closed:
+            raise RuntimeError("Worker pool has been shut down")
+
+        key = os.path.abspath(model_path)
+        job = SynthesisJob(text, output_file, speaker_id)
+        with self.lock:
+            if parallelism:
+                self.model_worker_limits[key] = max(1, parallelism)
+            self._job_queue(key).put(job)
+            self._touch(key)
+            self._ensure_workers(key)
+        return job.future
+
+    def warm_up(self, model_path):
+        """Start a worker for the model ahead of the first request"""
+        key = os.path.abspath(model_path)
+        with self.lock:
+            self._touch(key)
+            if not self.workers.get(key):
+                self._spawn_worker(key)
+
+    def _job_queue(self, key):
+        with self.lock:
+            if key not in self.queues:
+                self.queues[key] = queue.Queue()
+            return self.queues[key]
+
+    def _touch(self, key):
+        with self.lock:
+            self.last_used[key] = time.monotonic()
+
+    def worker_count(self):
+        with self.lock:
+            return sum(len(workers) for workers in self.workers.values())
+
+    def _tier(self, key):
+        return self.tuning.settings_for(key) if self.tuning is not None else None
+
+    def _base_worker_limit(self, key):
+        """Workers kept for a model outside bursts: its tuned count, else workers_per_model"""
+        tier = self._tier(key)
+        return tier.workers if tier is not None else self.workers_per_model
+
+    def _worker_limit(self, key):
+        return self.model_worker_limits.get(key, self._base_worker_limit(key))
+
+    def _is_burst_worker(self, worker):
+        """True for a worker started above workers_per_model that may now retire"""
+        with self.lock:
+            workers = self.workers.get(worker.key, [])
+            if len(workers) <= self._base_worker_limit(worker.key):
+                self.model_worker_limits.pop(worker.key, None)
+                return False
+            return self.queues[worker.key].empty()
+
+    def _ensure_workers(self, key):
+        workers = self.workers.setdefault(key, [])
+        idle = sum(1 for worker in workers if not worker.busy)
+        backlog = self.queues[key].qsize()
+        if len(workers) >= self._worker_limit(key) or backlog <= idle:
+            return
+        if self.max_workers is not None and self.worker_count() >= self.max_workers:
+            # At the cap; a worker of another model hands over once its queue drains
+            return
+        if workers and self.memory_in_use() + workers[0].memory > self.memory_budget:
+            # Another copy of this model would not fit; let the existing workers share the queue
+            return
+        self._spawn_worker(key)
+
+    def _is_starving_other_models(self, key):
+        """True when another model has queued work but no worker and the pool is at its cap"""
+        if self.max_workers is None:
+            return False
+        with self.lock:
+            if self.worker_count() < self.max_workers:
+                return False
+            return any(
+                other != key and not jobs.empty() and not self.workers.get(other)
+                for other, jobs in self.queues.items()
+            )
+
+    def _spawn_worker(self, key):
+        self._enforce_memory_budget(estimate_worker_memory(key), exclude=key)
+        try:
+            tier = self._tier(key)
+            worker = PiperWorker(self, key, self.piper_exe, key, self.output_dir,
+                                 threads=tier.threads if tier is not None else None,
+                                 cpus=self.tuning.allocate_cpus(tier) if tier is not None else None)
+        except OSError as e:
+            self._fail_pending(key, RuntimeError(f"Error starting Piper: {e}"))
+            return None
+        self.workers.setdefault(key, []).append(worker)
+        return worker
+
+    def _fail_pending(self, key, error):
+        jobs = self.queues.get(key)
+        while jobs is not None and not jobs.empty():
+            job = jobs.get_nowait()
+            if job.future.set_running_or_notify_cancel():
+                job.future.set_exception(error)
+
+    def memory_in_use(self):
+        with self.lock:
+            return sum(worker.memory for workers in self.workers.values() for worker in workers)
+
+    def _enforce_memory_budget(self, needed, exclude=None):
+        """Close idle workers of the least recently used models until the new worker fits"""
+        candidates = sorted(
+            (key for key in self.workers if key != exclude),
+            key=lambda key: self.last_used.get(key, 0),
+        )
+        for key in candidates:
+            if self.memory_in_use() + needed <= self.memory_budget:
+                return
+            for worker in list(self.workers[key]):
+                if not worker.busy:
+                    print(f"Log: Evicting Piper worker for {os.path.basename(key)} (memory budget)")
+                    worker.stop_requested.set()
+                    self.workers[key].remove(worker)
+
+    def _worker_exited(self, worker):
+        with self.lock:
+            workers = self.workers.get(worker.key, [])
+            if worker in workers:
+                workers.remove(worker)
+            if self.closed:
+                return
+            # Keep serving queued requests, starting with models that have no worker at all
+            pending = [key for key, jobs in self.queues.items() if not jobs.empty()]
+            pending.sort(key=lambda key: len(self.workers.get(key, [])))
+            for key in pending:
+                self._ensure_workers(key)
+
+    def shutdown(self):
+        """Close every Piper process"""
+        with self.lock:
+            self.closed = True
+            workers = [worker for workers in self.workers.values() for worker in workers]
+            self.workers = {}
+            for key in list(self.queues):
+                self._fail_pending(key, RuntimeError("Worker pool has been shut down"))
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,191 @@
+"""Voice previews for the sample button, kept under SAMPLES_DIR for every language.
+
+Previews live in samples/<family>/<language>/<voice>/<quality>/samples/ as
+speaker_<n>.mp3 (the clips of the Piper samples site, which the app ships
+for English voices and fetches for the others) or speaker_<n>.wav (rendered
+locally from an installed model). Previews are played from a small
+in-memory LRU of decoded clips, so going back and forth between voices does
+not touch the disk. MP3 samples are decoded with ffmpeg in the background,
+as soon as their voice is selected; without ffmpeg they are played from the
+file by QMediaPlayer instead.
+"""
+import os
+import sys
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from piper_audio import read_wav, PcmClip
+from piper_download import DownloadQueue
+
+DEFAULT_MEMORY_PREVIEWS = 32  # decoded clips kept in memory
+PREFETCH_CONCURRENCY = 4
+DECODE_SAMPLE_RATE = 22050  # MP3 samples are decoded to mono 16-bit PCM at this rate
+DECODE_TIMEOUT = 30  # seconds
+SAMPLE_URL_MARKER = "/samples/"
+
+# Sentence spoken by previews rendered from installed models, by language family
+PREVIEW_TEXTS = {
+    "en": "Hello! This is how I sound. I hope you like my voice.",
+    "de": "Hallo! So klingt meine Stimme. Ich hoffe, sie gefällt Ihnen.",
+    "es": "¡Hola! Así suena mi voz. Espero que te guste.",
+    "fr": "Bonjour ! Voici le son de ma voix. J'espère qu'elle vous plaît.",
+    "it": "Ciao! Questa è la mia voce. Spero che ti piaccia.",
+    "nl": "Hallo! Zo klinkt mijn stem. Ik hoop dat je hem mooi vindt.",
+    "pt": "Olá! É assim que a minha voz soa. Espero que goste.",
+    "pl": "Cześć! Tak brzmi mój głos. Mam nadzieję, że ci się podoba.",
+    "ru": "Привет! Так звучит мой голос. Надеюсь, он вам нравится.",
+    "uk": "Привіт! Так звучить мій голос. Сподіваюся, він вам подобається.",
+}
+
+
+def language_family(language_code):
+    return language_code.split("_", 1)[0]
+
+
+def preview_text(language_code):
+    return PREVIEW_TEXTS.get(language_family(language_code), PREVIEW_TEXTS["en"])
+
+
+def speaker_sample_name(speaker_id=None, extension=".mp3"):
+    return f"speaker_{speaker_id or 0}{extension}"
+
+
+def decode_mp3(path, ffmpeg_exe):
+    """Decode an MP3 sample to ((channels, sample_width, sample_rate), frames) with ffmpeg"""
+    command = [ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-i", path,
+               "-f", "s16le", "-ac", "1", "-ar", str(DECODE_SAMPLE_RATE), "pipe:1"]
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            timeout=DECODE_TIMEOUT, creationflags=creationflags)
+    if result.returncode != 0 or not result.stdout:
+        message = result.stderr.decode("utf-8", "replace").strip()
+        raise ValueError(f"ffmpeg could not decode {os.path.basename(path)}: {message[-300:]}")
+    return (1, 2, DECODE_SAMPLE_RATE), result.stdout
+
+
+class PreviewCache:
+    """Finds, fetches and renders voice previews, and keeps recently played ones decoded in memory"""
+
+    def __init__(self, samples_dir, catalog, memory_entries=DEFAULT_MEMORY_PREVIEWS, ffmpeg_exe=None):
+        self.samples_dir = samples_dir
+        self.catalog = catalog
+        self.memory_entries = memory_entries
+        self.ffmpeg_exe = ffmpeg_exe  # decodes MP3 samples; without it they are not kept in memory
+        self.memory = OrderedDict()  # (path, mtime) -> PcmClip, least recently used first
+        self.lock = threading.Lock()
+        self.downloads = None  # DownloadQueue, created by the first fetch
+        self.decoder = None  # single decoding thread, created by the first background decode
+        self.decoding = set()  # paths queued for a background decode
+
+    def preview_dir(self, language_code, voice_id, quality):
+        return os.path.join(self.samples_dir, language_family(language_code), language_code, voice_id, quality, "samples")
+
+    def sample_url(self, language_code, voice_id, speaker_id=None):
+        voice_info = self.catalog.voice_info(language_code, voice_id) or {}
+        url = voice_info.get("sample_url")
+        return url.replace(speaker_sample_name(), speaker_sample_name(speaker_id)) if url else None
+
+    def fetched_path(self, url):
+        """Where a sample fetched from url is stored: the same layout as the shipped samples"""
+        relative = url.split("?", 1)[0].split(SAMPLE_URL_MARKER, 1)[-1]
+        directory, name = os.path.split(relative)
+        return os.path.join(self.samples_dir, *directory.split("/"), "samples", name)
+
+    def rendered_path(self, language_code, voice_id, quality, speaker_id=None):
+        return os.path.join(self.preview_dir(language_code, voice_id, quality), speaker_sample_name(speaker_id, ".wav"))
+
+    def find(self, language_code, voice_id, quality, speaker_id=None):
+        """Path of a local preview for the voice, or None if it has to be fetched or rendered
+
+        Samples of the selected quality come first, then the sample the site
+        has for the voice (usually of another quality), then a rendered preview.
+        """
+        candidates = [os.path.join(self.preview_dir(language_code, voice_id, quality), speaker_sample_name(speaker_id))]
+        url = self.sample_url(language_code, voice_id, speaker_id)
+        if url:
+            candidates.append(self.fetched_path(url))
+        candidates.append(self.rendered_path(language_code, voice_id, quality, speaker_id))
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def decodable(self, path):
+        return path.endswith(".wav") or (path.endswith(".mp3") and bool(self.ffmpeg_exe))
+
+    def cached_clip(self, path):
+        """The decoded clip of a preview if it is in memory, without decoding anything"""
+        try:
+            key = (path, os.path.getmtime(path))
+        except OSError:
+            return None
+        with self.lock:
+            clip = self.memory.get(key)
+            if clip is not None:
+                self.memory.move_to_end(key)
+            return clip
+
+    def clip(self, path):
+        """Decoded clip of a preview, from memory when it was played or decoded recently"""
+        clip = self.cached_clip(path)
+        if clip is not None:
+            return clip
+        key = (path, os.path.getmtime(path))
+        params, frames = decode_mp3(path, self.ffmpeg_exe) if path.endswith(".mp3") else read_wav(path)
+        clip = PcmClip(params)
+        clip.append(frames)
+        clip.finish()
+        with self.lock:
+            self.memory[key] = clip
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+        return clip
+
+    def decode_in_background(self, path):
+        """Decode a preview into memory on the decoding thread, so playing it later is instant"""
+        if not self.decodable(path) or self.cached_clip(path) is not None:
+            return
+        with self.lock:
+            if path in self.decoding:
+                return
+            self.decoding.add(path)
+            if self.decoder is None:
+                self.decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview-decode")
+        self.decoder.submit(self._decode, path)
+
+    def _decode(self, path):
+        try:
+            self.clip(path)
+        except (OSError, EOFError, ValueError, subprocess.SubprocessError) as e:
+            print(f"Log: Could not decode preview {path}: {e}")
+        finally:
+            with self.lock:
+                self.decoding.discard(path)
+
+    def fetch(self, language_code, voice_ids, speaker_id=None):
+        """Download the missing site samples of voices in the background; returns the queued DownloadItems"""
+        if self.downloads is None:
+            self.downloads = DownloadQueue(PREFETCH_CONCURRENCY)
+        items = []
+        for voice_id in voice_ids:
+            url = self.sample_url(language_code, voice_id, speaker_id)
+            if not url:
+                continue
+            path = self.fetched_path(url)
+            if not os.path.exists(path):
+                items.append(self.downloads.enqueue(path, [(url, path, {})], f"Sample of {voice_id}"))
+        return items
+
+    def render(self, engine, model_path, language_code, voice_id, quality, speaker_id=None):
+        """Render a preview with an installed model; returns the engine's Future of the WAV path"""
+        path = self.rendered_path(language_code, voice_id, quality, speaker_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return engine.submit(model_path, preview_text(language_code), path, speaker_id)
+
+    def shutdown(self):
+        if self.downloads is not None:
+            self.downloads.shutdown()
+        if self.decoder is not None:
+            self.decoder.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,88 @@
+"""Segment maps: which bytes of a rendered clip hold which sentence.
+
+A map is kept next to every render (as <wav>.segments.json on disk). When the
+text is edited and rendered again, plan() finds the sentences that are
+unchanged, so only the edited and new ones go to Piper and the rest of the
+audio is copied from the previous render.
+"""
+import os
+import json
+import hashlib
+
+from piper_text import normalize_text
+
+SEGMENTS_SUFFIX = ".segments.json"
+SEGMENTS_VERSION = 1
+
+
+def render_settings(model_hash, speaker_id=None, silence_ms=0):
+    """Everything besides the text that changes how a render sounds"""
+    return {"model": model_hash, "speaker": speaker_id, "silence_ms": silence_ms}
+
+
+def sentence_key(sentence):
+    return hashlib.sha1(normalize_text(sentence).encode("utf-8")).hexdigest()
+
+
+class SegmentMap:
+    """Byte ranges of the sentences in a clip's PCM data, plus the settings they were rendered with
+
+    settings holds everything besides the text that changes the audio (model
+    hash, speaker, pause length); audio is only reused when they match.
+    """
+
+    def __init__(self, settings, params, segments=None):
+        self.settings = settings
+        self.params = tuple(params) if params else None  # (channels, sample_width, sample_rate)
+        self.segments = segments or []  # {"key", "text", "offset", "size"} in text order
+
+    def add(self, sentence, offset, size):
+        self.segments.append({"key": sentence_key(sentence), "text": sentence, "offset": offset, "size": size})
+
+    @property
+    def data_size(self):
+        if not self.segments:
+            return 0
+        last = self.segments[-1]
+        return last["offset"] + last["size"]
+
+    def plan(self, sentences, settings):
+        """For each sentence, the segment of this map holding its audio, or None if it must be rendered
+
+        Sentences are matched by their normalized text wherever they appear,
+        so moved and duplicated sentences are reused as well.
+        """
+        if settings != self.settings:
+            return [None] * len(sentences)
+        by_key = {}
+        for segment in self.segments:
+            by_key.setdefault(segment["key"], segment)
+        return [by_key.get(sentence_key(sentence)) for sentence in sentences]
+
+    def to_json(self):
+        return {"version": SEGMENTS_VERSION, "settings": self.settings,
+                "params": list(self.params) if self.params else None, "segments": self.segments}
+
+    def save(self, wav_path):
+        """Write the map next to the WAV holding its audio"""
+        path = wav_path + SEGMENTS_SUFFIX
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, wav_path, data_size=None):
+        """Read the map saved next to a WAV, or return None if it is missing or does not fit data_size bytes"""
+        try:
+            with open(wav_path + SEGMENTS_SUFFIX, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SEGMENTS_VERSION:
+                return None
+            segment_map = cls(data["settings"], data["params"], data["segments"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if data_size is not None and segment_map.data_size != data_size:
+            return None  # the WAV was rewritten without its map
+        return segment_map
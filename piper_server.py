@@ -0,0 +1,416 @@
+"""Headless HTTP synthesis server backed by warm Piper workers.
+
+Usage:
+    python piper_server.py --port 5002 --workers 8
+    python piper_ui.py serve --port 5002 --warm en_US/amy/medium
+
+Endpoints:
+    POST /synthesize  JSON {"text", "language", "voice", "quality", "speaker_id", "format"}
+    GET  /synthesize?text=...&language=en_US&voice=amy
+    GET  /voices
+    GET  /health
+    GET  /metrics     Prometheus text; /metrics?format=json for JSON
+
+format "wav" (the default) returns one audio/wav body. format "pcm" streams
+raw 16-bit PCM sentence by sentence with chunked transfer encoding; the
+sample format is given in the X-Sample-Rate, X-Channels and X-Sample-Width
+headers. Requests for the same voice that arrive within --batch-window-ms
+are written to one Piper process together, identical requests in flight
+share one render, and requests beyond --max-pending are refused with 503
+so the latency of accepted ones stays bounded.
+"""
+import io
+import os
+import sys
+import json
+import uuid
+import wave
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from urllib.parse import urlsplit, parse_qsl
+
+from piper_paths import MODELS_DIR, CACHE_DIR, find_piper_exe
+from piper_catalog import VoiceCatalog
+from piper_pool import DEFAULT_MEMORY_BUDGET
+from piper_engine import ENGINES, create_engine
+from piper_cache import SynthesisCache
+from piper_text import normalize_text, split_sentences
+from piper_metrics import METRICS
+
+DEFAULT_PORT = 5002
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_BATCH_WINDOW_MS = 5
+DEFAULT_MAX_PENDING = 256  # renders queued or running before new requests get 503
+DEFAULT_REQUEST_TIMEOUT = 60  # seconds
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MAX_TEXT_CHARS = 20000
+ENDPOINTS = ("/synthesize", "/voices", "/health", "/metrics")
+
+STATUS_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def wav_to_pcm(data):
+    """Split WAV bytes into ((channels, sample_width, sample_rate), frames)"""
+    with wave.open(io.BytesIO(data), "rb") as wav_file:
+        params = (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+        return params, wav_file.readframes(wav_file.getnframes())
+
+
+class SynthesisServer:
+    def __init__(self, pool, catalog, work_dir, cache=None, max_pending=DEFAULT_MAX_PENDING,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.pool = pool
+        self.catalog = catalog
+        self.work_dir = work_dir
+        self.cache = cache
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.inflight = {}  # (model, normalized text, speaker) -> asyncio future of WAV bytes
+        self.requests_served = 0
+
+    # Synthesis
+
+    async def synthesize(self, model_path, text, speaker_id=None):
+        """WAV bytes for text, sharing the render with identical requests already in flight"""
+        key = (model_path, normalize_text(text), speaker_id)
+        future = self.inflight.get(key)
+        if future is None:
+            if len(self.inflight) >= self.max_pending:
+                raise HttpError(503, "Server busy, try again shortly", {"Retry-After": "1"})
+            future = asyncio.ensure_future(self._render(model_path, text, speaker_id))
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HttpError(504, "Synthesis timed out")
+
+    async def _render(self, model_path, text, speaker_id):
+        loop = asyncio.get_running_loop()
+        cache_key = None
+        if self.cache is not None:
+            params = {"speaker_id": speaker_id} if speaker_id is not None else {}
+            cache_key, data = await loop.run_in_executor(None, self._cached, model_path, text, params)
+            if data is not None:
+                return data
+
+        output_file = os.path.join(self.work_dir, uuid.uuid4().hex + ".wav")
+        await asyncio.wrap_future(self.pool.submit(model_path, text, output_file, speaker_id))
+        return await loop.run_in_executor(None, self._collect, output_file, cache_key)
+
+    def _cached(self, model_path, text, params):
+        key = self.cache.key_for(model_path, text, params)
+        path = self.cache.get(key)
+        if path is None:
+            return key, None
+        with open(path, "rb") as f:
+            return key, f.read()
+
+    def _collect(self, output_file, cache_key):
+        try:
+            if cache_key is not None:
+                self.cache.put(cache_key, output_file)
+            with open(output_file, "rb") as f:
+                return f.read()
+        finally:
+            try:
+                os.remove(output_file)
+            except OSError:
+                pass
+
+    def resolve_request(self, params):
+        """Validate request parameters and return (model_path, text, speaker_id)"""
+        text = str(params.get("text") or "").strip()
+        if not text:
+            raise HttpError(400, "Missing text")
+        if len(text) > MAX_TEXT_CHARS:
+            raise HttpError(413, f"Text longer than {MAX_TEXT_CHARS} characters")
+        language_code = params.get("language")
+        voice_id = params.get("voice")
+        if not language_code or not voice_id:
+            raise HttpError(400, "Missing language or voice")
+        with METRICS.span("model_resolution"):
+            quality, model_path = self.catalog.resolve(language_code, voice_id, params.get("quality"))
+            downloaded = model_path is not None and os.path.exists(model_path)
+        if model_path is None:
+            raise HttpError(404, f"Unknown voice {language_code}/{voice_id}")
+        if not downloaded:
+            raise HttpError(404, f"Voice {language_code}/{voice_id} ({quality}) is not downloaded")
+        speaker_id = params.get("speaker_id")
+        if speaker_id not in (None, ""):
+            try:
+                speaker_id = int(speaker_id)
+            except (TypeError, ValueError):
+                raise HttpError(400, "speaker_id must be an integer")
+        else:
+            speaker_id = None
+        return model_path, text, speaker_id
+
+    # HTTP
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_error(writer, HttpError(413, "Request header too large"))
+                    break
+                keep_alive = await self.handle_request(head, reader, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, head, reader, writer):
+        """Serve one request; returns False when the connection should be closed"""
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            await self.send_error(writer, HttpError(400, "Malformed request line"))
+            return False
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        started = time.perf_counter()
+        endpoint = urlsplit(target).path
+        if endpoint not in ENDPOINTS:
+            endpoint = "other"  # keep the metric labels bounded
+        status = 200
+
+        try:
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise HttpError(413, "Request body too large")
+            body = await reader.readexactly(length) if length else b""
+
+            url = urlsplit(target)
+            params = dict(parse_qsl(url.query))
+            if body:
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    raise HttpError(400, "Body must be a JSON object")
+                params.update(data)
+
+            if url.path == "/health":
+                await self.send_json(writer, self.health(), keep_alive)
+            elif url.path == "/voices":
+                await self.send_json(writer, self.voices(), keep_alive)
+            elif url.path == "/metrics":
+                if params.get("format") == "json":
+                    await self.send_json(writer, METRICS.to_json(), keep_alive)
+                else:
+                    await self.send(writer, 200, METRICS.to_prometheus().encode("utf-8"),
+                                    "text/plain; version=0.0.4; charset=utf-8", keep_alive)
+            elif url.path == "/synthesize":
+                if method not in ("GET", "POST"):
+                    raise HttpError(405, "Use GET or POST")
+                if params.get("format", "wav") == "pcm":
+                    await self.stream_pcm(writer, params, keep_alive)
+                else:
+                    model_path, text, speaker_id = self.resolve_request(params)
+                    data = await self.synthesize(model_path, text, speaker_id)
+                    await self.send(writer, 200, data, "audio/wav", keep_alive)
+                self.requests_served += 1
+            else:
+                raise HttpError(404, f"No such endpoint: {url.path}")
+        except HttpError as e:
+            status = e.status
+            await self.send_error(writer, e, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            status = 499  # client went away
+            return False
+        except Exception as e:
+            print(f"Log: Request failed: {e}")
+            status = 500
+            await self.send_error(writer, HttpError(500, str(e)), keep_alive)
+        finally:
+            METRICS.increment("http_requests_total", endpoint=endpoint, status=status)
+            if endpoint == "/synthesize":
+                METRICS.record_stage("request", time.perf_counter() - started, status=status)
+        return keep_alive
+
+    async def stream_pcm(self, writer, params, keep_alive):
+        """Render the sentences in parallel and send their PCM in order as soon as each is ready"""
+        model_path, text, speaker_id = self.resolve_request(params)
+        renders = [asyncio.ensure_future(self.synthesize(model_path, sentence, speaker_id))
+                   for sentence in split_sentences(text)]
+        headers_sent = False
+        try:
+            pcm_params, frames = wav_to_pcm(await renders[0])
+            channels, sample_width, sample_rate = pcm_params
+            writer.write(self.response_head(200, "application/octet-stream", None, keep_alive, {
+                "Transfer-Encoding": "chunked",
+                "X-Sample-Rate": str(sample_rate),
+                "X-Channels": str(channels),
+                "X-Sample-Width": str(sample_width),
+            }))
+            headers_sent = True
+            for index in range(len(renders)):
+                if index:
+                    frames = wav_to_pcm(await renders[index])[1]
+                writer.write(b"%x\r\n%s\r\n" % (len(frames), frames))
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except Exception as e:
+            if headers_sent:
+                # The status line is already out; dropping the connection is the only way to signal the failure
+                print(f"Log: PCM stream aborted: {e}")
+                raise ConnectionError("PCM stream aborted")
+            raise
+        finally:
+            for render in renders:
+                render.cancel()
+
+    def health(self):
+        return {
+            "status": "ok",
+            "workers": self.pool.worker_count(),
+            "memory": self.pool.memory_in_use(),
+            "pending": len(self.inflight),
+            "served": self.requests_served,
+            "cache": self.cache.stats_text() if self.cache is not None else None,
+        }
+
+    def voices(self):
+        return [
+            {
+                "language": language_code,
+                "name": display_name,
+                "voices": [
+                    {"id": voice_id, "name": voice_name,
+                     "qualities": self.catalog.qualities(language_code, voice_id),
+                     "downloaded": self.catalog.downloaded_qualities(language_code, voice_id)}
+                    for voice_id, voice_name in self.catalog.voices(language_code)
+                ],
+            }
+            for language_code, display_name in self.catalog.languages()
+        ]
+
+    @staticmethod
+    def response_head(status, content_type, length, keep_alive, extra_headers=None):
+        headers = {"Content-Type": content_type, "Connection": "keep-alive" if keep_alive else "close"}
+        if length is not None:
+            headers["Content-Length"] = str(length)
+        headers.update(extra_headers or {})
+        lines = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send(self, writer, status, body, content_type, keep_alive=True, extra_headers=None):
+        writer.write(self.response_head(status, content_type, len(body), keep_alive, extra_headers) + body)
+        await writer.drain()
+
+    async def send_json(self, writer, data, keep_alive=True, status=200, extra_headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await self.send(writer, status, body, "application/json; charset=utf-8", keep_alive, extra_headers)
+
+    async def send_error(self, writer, error, keep_alive=False):
+        await self.send_json(writer, {"error": str(error)}, keep_alive, error.status, error.headers)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="piper_server", description="Serve Piper synthesis over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Warm Piper processes in total")
+    parser.add_argument("--workers-per-voice", type=int, help="Warm processes a single voice may use (default: --workers)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Requests written to one Piper process at once")
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="How long a worker waits for more requests of its voice")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="Renders in flight before new requests are refused with 503")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT, help="Seconds per request")
+    parser.add_argument("--warm", action="append", default=[], metavar="LANG/VOICE[/QUALITY]",
+                        help="Start workers for a voice before the first request (repeatable)")
+    parser.add_argument("--memory-budget-mb", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="Memory budget for warm Piper processes")
+    parser.add_argument("--piper", help="Path to the piper executable")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Piper processes or in-process ONNX Runtime")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Directory with downloaded models")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the synthesis cache")
+    parser.add_argument("--metrics-file", help="Write stage timings here on exit (.prom for Prometheus text, else JSON)")
+    return parser
+
+
+async def serve(server, host, port):
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    print(f"Log: Serving Piper synthesis on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    catalog = VoiceCatalog(models_dir=args.models_dir)
+    work_dir = tempfile.mkdtemp(prefix="piper-server-")
+    workers = max(1, args.workers)
+    try:
+        pool = create_engine(
+            args.engine,
+            find_piper_exe(args.piper),
+            work_dir,
+            workers_per_model=max(1, args.workers_per_voice or workers),
+            max_workers=workers,
+            memory_budget=args.memory_budget_mb * 1024 * 1024,
+            batch_size=args.batch_size,
+            batch_window=args.batch_window_ms / 1000,
+        )
+    except RuntimeError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    cache = None if args.no_cache else SynthesisCache(os.path.join(CACHE_DIR, "synthesis"))
+    server = SynthesisServer(pool, catalog, work_dir, cache, args.max_pending, args.timeout)
+
+    for voice in args.warm:
+        language_code, voice_id, *quality = voice.split("/")
+        _, model_path = catalog.resolve(language_code, voice_id, quality[0] if quality else None)
+        if model_path and os.path.exists(model_path):
+            pool.warm_up(model_path)
+        else:
+            print(f"Log: Cannot warm up {voice}: model not downloaded")
+
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Log: Server stopped")
+    finally:
+        pool.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if args.metrics_file:
+            METRICS.write(args.metrics_file)
+            print(f"Log: Metrics written to {args.metrics_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Indexed store of generated audio with size and age based retention.
+
+Usage:
+    python piper_store.py --list --search "chapter one"
+    python piper_ui.py store --prune --max-size-mb 2048 --max-age-days 30
+    python piper_ui.py store --import output
+
+Renders are kept as <store>/<shard>/<id>.wav, 256 shards deep, and indexed
+in <store>/index.sqlite by text hash, voice, quality, speaker, duration,
+size and creation time. Lookups and history pages go through the indexes,
+so they stay fast with hundreds of thousands of renders, and nothing ever
+lists the directories.
+"""
+import os
+import sys
+import time
+import uuid
+import wave
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import threading
+
+from piper_text import normalize_text
+from piper_cache import copy_file
+from piper_audio import write_wav, PEAKS_SUFFIX
+from piper_metrics import METRICS
+
+INDEX_FILE = "index.sqlite"
+EXCERPT_CHARS = 200  # text kept in the index for the history list and its search
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_HISTORY_LIMIT = 200
+PRUNE_BATCH = 500  # oldest renders deleted per step while over the size limit
+
+COLUMNS = ["id", "path", "text_hash", "excerpt", "language", "voice", "quality", "speaker",
+           "duration", "size", "created", "settings_key"]
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def wav_duration(path):
+    with wave.open(path, "rb") as wav_file:
+        return wav_file.getnframes() / float(wav_file.getframerate() or 1)
+
+
+class StoreEntry:
+    """One indexed render; path is absolute"""
+
+    def __init__(self, row, root):
+        for name, value in zip(COLUMNS, row):
+            setattr(self, name, value)
+        self.path = os.path.join(root, self.path)
+
+    def created_text(self):
+        return datetime.datetime.fromtimestamp(self.created).strftime("%Y-%m-%d %H:%M")
+
+
+class OutputStore:
+    """Sharded render files plus a SQLite index, trimmed to a size and age limit"""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, INDEX_FILE), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS renders ("
+            "id TEXT PRIMARY KEY, path TEXT NOT NULL, text_hash TEXT NOT NULL, excerpt TEXT NOT NULL, "
+            "language TEXT, voice TEXT, quality TEXT, speaker INTEGER, "
+            "duration REAL NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, settings_key TEXT)"
+        )
+        if "settings_key" not in [row[1] for row in self.db.execute("PRAGMA table_info(renders)")]:
+            self.db.execute("ALTER TABLE renders ADD COLUMN settings_key TEXT")  # stores from before the column
+        self.db.execute("CREATE INDEX IF NOT EXISTS renders_lookup ON renders (text_hash, voice, quality, speaker, created)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS renders_created ON renders (created)")
+        self.db.commit()
+        # Kept up to date by add/delete so retention and the status line never scan the table again
+        self.total_count, self.total_bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM renders").fetchone()
+
+    def _entry(self, row):
+        return StoreEntry(row, self.root) if row else None
+
+    def path_for(self, entry_id):
+        return os.path.join(self.root, entry_id[:2], entry_id + ".wav")
+
+    def find(self, text, voice, quality=None, speaker=None, settings_key=None):
+        """Latest render of text with this voice, through the lookup index
+
+        With a settings_key, only a render made with the same settings is returned.
+        """
+        query = (f"SELECT {', '.join(COLUMNS)} FROM renders WHERE text_hash = ? AND voice IS ? AND quality IS ? "
+                 "AND speaker IS ?")
+        args = [text_hash(text), voice, quality, speaker]
+        if settings_key is not None:
+            query += " AND settings_key = ?"
+            args.append(settings_key)
+        with self.lock:
+            row = self.db.execute(query + " ORDER BY created DESC LIMIT 1", args).fetchone()
+        return self._entry(row)
+
+    def get(self, entry_id):
+        with self.lock:
+            row = self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM renders WHERE id = ?", (entry_id,)).fetchone()
+        return self._entry(row)
+
+    def add(self, text, source=None, frames=None, params=None, language=None, voice=None, quality=None,
+            speaker=None, created=None, settings_key=None):
+        """Store a render given as a WAV file (copied) or as PCM frames
+
+        settings_key identifies everything else that shapes the audio (model
+        hash, speaker, pauses). A render of the same text, voice and settings
+        already in the store is moved to the top of the history instead of
+        being stored twice; renders without a settings_key are always added.
+        """
+        existing = self.find(text, voice, quality, speaker, settings_key) if settings_key else None
+        if existing is not None and os.path.exists(existing.path):
+            with self.lock:
+                self.db.execute("UPDATE renders SET created = ? WHERE id = ?", (created or time.time(), existing.id))
+                self.db.commit()
+            return self.get(existing.id)
+
+        entry_id = uuid.uuid4().hex
+        path = self.path_for(entry_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with METRICS.span("file_write"):
+            if source is not None:
+                copy_file(source, path)
+            else:
+                write_wav(path, frames, params)
+        size = os.path.getsize(path)
+        row = (entry_id, os.path.relpath(path, self.root), text_hash(text), normalize_text(text)[:EXCERPT_CHARS],
+               language, voice, quality, speaker, wav_duration(path), size, created or time.time(), settings_key)
+        with self.lock:
+            self.db.execute(f"INSERT INTO renders ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", row)
+            self.db.commit()
+            self.total_count += 1
+            self.total_bytes += size
+        return self._entry(row)
+
+    def history(self, search=None, limit=DEFAULT_HISTORY_LIMIT, before=None):
+        """Newest renders first; before (a created time) pages further back through the created index"""
+        query = f"SELECT {', '.join(COLUMNS)} FROM renders"
+        conditions, args = [], []
+        if before is not None:
+            conditions.append("created < ?")
+            args.append(before)
+        if search:
+            conditions.append("(excerpt LIKE ? OR voice LIKE ?)")
+            args += [f"%{search}%"] * 2
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created DESC LIMIT ?"
+        with self.lock:
+            rows = self.db.execute(query, args + [limit]).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def count(self):
+        return self.total_count
+
+    def delete(self, entry_ids):
+        """Remove renders and their files"""
+        removed = 0
+        with self.lock:
+            for entry_id in entry_ids:
+                row = self.db.execute("SELECT path, size FROM renders WHERE id = ?", (entry_id,)).fetchone()
+                if row is None:
+                    continue
+                path = os.path.join(self.root, row[0])
+                for removed_path in (path, path + PEAKS_SUFFIX):
+                    try:
+                        os.remove(removed_path)
+                    except OSError:
+                        pass
+                self.db.execute("DELETE FROM renders WHERE id = ?", (entry_id,))
+                self.total_count -= 1
+                self.total_bytes -= row[1]
+                removed += 1
+            self.db.commit()
+        return removed
+
+    def prune(self, max_bytes=None, max_age_days=None):
+        """Delete renders older than the age limit, then the oldest ones until the store fits the size limit"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        removed = 0
+        if max_age_days:
+            cutoff = time.time() - max_age_days * 86400
+            while True:
+                with self.lock:
+                    ids = [row[0] for row in self.db.execute(
+                        "SELECT id FROM renders WHERE created < ? ORDER BY created LIMIT ?", (cutoff, PRUNE_BATCH))]
+                if not ids:
+                    break
+                removed += self.delete(ids)
+        while max_bytes and self.total_bytes > max_bytes:
+            with self.lock:
+                oldest = self.db.execute("SELECT id, size FROM renders ORDER BY created LIMIT ?",
+                                         (PRUNE_BATCH,)).fetchall()
+            if not oldest:
+                break
+            # Only as many of the batch as needed to get under the limit
+            excess = self.total_bytes - max_bytes
+            selected = []
+            for entry_id, size in oldest:
+                if excess <= 0:
+                    break
+                selected.append(entry_id)
+                excess -= size
+            removed += self.delete(selected)
+        if removed:
+            print(f"Log: Output store pruned {removed} renders, {self.total_bytes / (1024 * 1024):.1f} MB left")
+        return removed
+
+    def import_directory(self, directory):
+        """Move the WAVs of a flat output folder (voice_words_timestamp.wav) into the store"""
+        imported = 0
+        for entry in os.scandir(directory):
+            if not entry.is_file() or not entry.name.lower().endswith(".wav"):
+                continue
+            name = os.path.splitext(entry.name)[0]
+            try:
+                self.add(name, source=entry.path, voice=name.split("_", 1)[0], created=entry.stat().st_mtime)
+            except (OSError, EOFError, wave.Error) as e:
+                print(f"Log: Skipping {entry.name}: {e}")
+                continue
+            os.remove(entry.path)
+            imported += 1
+        return imported
+
+    def stats_text(self):
+        return f"History: {self.count()} renders ({self.total_bytes / (1024 * 1024):.1f} MB)"
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def build_parser():
+    from piper_paths import OUTPUT_DIR
+    parser = argparse.ArgumentParser(prog="piper_store", description="List, prune and import generated audio")
+    parser.add_argument("--store", default=os.path.join(OUTPUT_DIR, "store"), help="Store directory")
+    parser.add_argument("--list", action="store_true", help="Print the newest renders")
+    parser.add_argument("--search", help="Only renders whose text or voice contains this")
+    parser.add_argument("--limit", type=int, default=50, help="Renders listed")
+    parser.add_argument("--prune", action="store_true", help="Apply the size and age limits now")
+    parser.add_argument("--max-size-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Size limit")
+    parser.add_argument("--max-age-days", type=int, default=DEFAULT_MAX_AGE_DAYS, help="Age limit, 0 for none")
+    parser.add_argument("--import", dest="import_dir", help="Move the WAVs of a flat output folder into the store")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = OutputStore(args.store, args.max_size_mb * 1024 * 1024, args.max_age_days)
+    try:
+        if args.import_dir:
+            print(f"Log: Imported {store.import_directory(args.import_dir)} files from {args.import_dir}")
+        if args.prune:
+            store.prune()
+        if args.list or args.search:
+            for entry in store.history(args.search, args.limit):
+                print(f"{entry.created_text()}  {entry.voice or '-':20} {entry.duration:7.1f} s  "
+                      f"{entry.excerpt[:60]}  {entry.path}")
+        print(store.stats_text())
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
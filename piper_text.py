@@ -0,0 +1,51 @@
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Normalize text so that trivially different inputs synthesize identically"""
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+# Sentence ends: terminal punctuation (including CJK) followed by whitespace, or a blank line
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+|(?<=[。！？])\s*|\n\s*\n")
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 400
+
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """Split text into synthesis chunks at sentence and paragraph boundaries
+
+    Very short sentences are merged with the following one so Piper is not
+    started for a lone "Yes." and overly long ones are broken at whitespace.
+    """
+    chunks = []
+    pending = ""
+    for piece in _SENTENCE_END_RE.split(text):
+        piece = normalize_text(piece)
+        if not piece:
+            continue
+        pending = f"{pending} {piece}" if pending else piece
+        if len(pending) >= min_chars:
+            chunks.extend(_break_long(pending, max_chars))
+            pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) < max_chars:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+def _break_long(sentence, max_chars):
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield sentence[:cut].strip()
+        sentence = sentence[cut:].strip()
+    if sentence:
+        yield sentence
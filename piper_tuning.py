@@ -0,0 +1,478 @@
+"""Per-host tuning of parallel workers, threads per worker and CPU affinity.
+
+Usage:
+    python piper_tuning.py [--engine piper|onnx] [--quality medium] [--affinity none,core,numa]
+    python piper_ui.py tune --workers 1,2,4 --threads 1,2 --repeats 3
+    python piper_ui.py tune --fake
+    python piper_ui.py tune --show
+
+For every voice quality the tuner renders a short corpus with each
+combination of parallel workers and intra-op threads per worker, optionally
+pinning workers to cores or NUMA nodes, and keeps the combination with the
+highest throughput (seconds of audio per second). The winners are saved to
+configs/tuning/<host>.json, and create_engine() loads that profile at
+startup: PiperWorkerPool and OnnxEngine then size, thread and pin the
+workers of each model by its quality.
+
+The piper executable has no thread option, so its threads are set through
+OMP_NUM_THREADS and, with core affinity, by pinning it to that many cores.
+"""
+import os
+import re
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import statistics
+from concurrent.futures import wait
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from piper_paths import CONFIG_DIR, MODELS_DIR, find_piper_exe
+from piper_catalog import QUALITIES
+
+TUNING_DIR = os.path.join(CONFIG_DIR, "tuning")
+PROFILE_FORMAT_VERSION = 1
+AFFINITY_MODES = ["none", "core", "numa"]
+DEFAULT_TIER = "default"  # settings for models whose quality cannot be told from the file name
+DEFAULT_REPEATS = 2  # passes over the corpus per configuration
+TIE_MARGIN = 0.03  # configurations this close to the best count as equal; the smallest one wins
+NUMA_NODE_PATTERN = "/sys/devices/system/node/node[0-9]*/cpulist"
+AFFINITY_ERRORS = (OSError, ValueError) + ((psutil.Error,) if psutil is not None else ())
+
+
+def host_name():
+    return re.sub(r"[^\w.-]+", "_", platform.node()) or "localhost"
+
+
+def host_profile_path(host=None):
+    return os.path.join(TUNING_DIR, f"{host or host_name()}.json")
+
+
+def model_quality(model_path):
+    """Quality from a Piper model file name such as en_US-amy-medium.onnx, or None"""
+    name = os.path.basename(model_path)
+    if name.endswith(".onnx"):
+        name = name[:-len(".onnx")]
+    quality = name.rsplit("-", 1)[-1]
+    return quality if quality in QUALITIES else None
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(text):
+    """CPU numbers of a kernel cpulist such as "0-3,8-11" """
+    cpus = []
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_nodes():
+    """CPUs of each NUMA node this process may run on; one node with every CPU where nodes are not exposed"""
+    allowed = set(available_cpus())
+    nodes = []
+    for path in sorted(glob.glob(NUMA_NODE_PATTERN)):
+        try:
+            with open(path, "r", encoding="ascii") as f:
+                cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in allowed]
+        except (OSError, ValueError):
+            continue
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [sorted(allowed)]
+
+
+def pin_process(pid, cpus):
+    """Restrict a process to cpus; returns False where the platform offers no way to do it
+
+    On Linux pid 0 is the calling thread, which is how OnnxEngine pins its worker threads.
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(pid, cpus)
+            return True
+        if psutil is not None and pid:
+            psutil.Process(pid).cpu_affinity(list(cpus))
+            return True
+    except AFFINITY_ERRORS as e:
+        print(f"Log: Could not pin process {pid} to CPUs {cpus}: {e}")
+    return False
+
+
+def thread_environment(threads):
+    """Environment for a Piper process limited to threads intra-op threads"""
+    env = dict(os.environ)
+    env["OMP_NUM_THREADS"] = str(threads)
+    return env
+
+
+class CpuAllocator:
+    """Hands out CPU sets to workers: runs of consecutive cores ("core") or whole NUMA nodes ("numa")"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.cpus = available_cpus()
+        self.nodes = numa_nodes() if mode == "numa" else None
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def allocate(self, threads=1):
+        """CPUs for the next worker, or None when workers are not pinned"""
+        if self.mode not in ("core", "numa"):
+            return None
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot += 1
+        if self.mode == "numa":
+            return self.nodes[slot % len(self.nodes)]
+        threads = min(max(1, threads), len(self.cpus))
+        start = slot * threads % len(self.cpus)
+        return [self.cpus[(start + offset) % len(self.cpus)] for offset in range(threads)]
+
+
+class TierSettings:
+    """Workers, threads per worker and affinity for the models of one quality"""
+
+    def __init__(self, workers=1, threads=1, affinity="none"):
+        self.workers = max(1, int(workers))
+        self.threads = max(1, int(threads))
+        self.affinity = affinity if affinity in AFFINITY_MODES else "none"
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get("workers", 1), data.get("threads", 1), data.get("affinity", "none"))
+
+    def to_json(self):
+        return {"workers": self.workers, "threads": self.threads, "affinity": self.affinity}
+
+    def __repr__(self):
+        return f"{self.workers} worker(s) x {self.threads} thread(s), affinity {self.affinity}"
+
+
+class TuningProfile:
+    """Tuned settings of one engine on this host, by voice quality"""
+
+    def __init__(self, tiers, engine=None, created=None, results=None):
+        self.tiers = tiers  # quality (or DEFAULT_TIER) -> TierSettings
+        self.engine = engine
+        self.created = created
+        self.results = results or []  # every configuration measured, for reference
+        self.allocators = {}  # affinity mode -> CpuAllocator shared by the workers of all tiers
+        self.lock = threading.Lock()
+
+    def settings_for(self, model_path):
+        """TierSettings for a model by its quality, or None if the profile has none that apply"""
+        return self.tiers.get(model_quality(model_path)) or self.tiers.get(DEFAULT_TIER)
+
+    def max_workers(self):
+        return max(settings.workers for settings in self.tiers.values())
+
+    def allocate_cpus(self, settings):
+        """CPUs for a new worker of a tier, or None when the tier is not pinned"""
+        if settings is None or settings.affinity == "none":
+            return None
+        with self.lock:
+            allocator = self.allocators.get(settings.affinity)
+            if allocator is None:
+                allocator = self.allocators[settings.affinity] = CpuAllocator(settings.affinity)
+        return allocator.allocate(settings.threads)
+
+    def to_json(self):
+        return {"created": self.created, "tiers": {name: settings.to_json() for name, settings in self.tiers.items()},
+                "results": self.results}
+
+    @classmethod
+    def from_json(cls, engine, data):
+        tiers = {name: TierSettings.from_json(settings) for name, settings in data.get("tiers", {}).items()}
+        return cls(tiers, engine, data.get("created"), data.get("results")) if tiers else None
+
+
+def read_profile_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get("format") == PROFILE_FORMAT_VERSION else None
+
+
+def load_profile(engine, path=None):
+    """This host's tuning profile for an engine ("piper" or "onnx"), or None if it was never tuned
+
+    A profile written on a machine with a different CPU count is ignored, so a
+    copied configs folder cannot oversubscribe smaller hardware.
+    """
+    path = path or host_profile_path()
+    data = read_profile_file(path)
+    if data is None or engine not in data.get("engines", {}):
+        return None
+    if data.get("cpu_count") != os.cpu_count():
+        print(f"Log: Ignoring tuning profile {path}: tuned for {data.get('cpu_count')} CPUs, "
+              f"this machine has {os.cpu_count()}")
+        return None
+    try:
+        profile = TuningProfile.from_json(engine, data["engines"][engine])
+    except (AttributeError, TypeError, ValueError) as e:
+        print(f"Log: Ignoring tuning profile {path}: {e}")
+        return None
+    if profile is not None:
+        print(f"Log: Using tuning profile {path} for the {engine} engine")
+    return profile
+
+
+def save_profile(profile, path=None):
+    """Write a profile into this host's profile file, keeping the other engine's section"""
+    path = path or host_profile_path()
+    data = read_profile_file(path) or {}
+    data.update(format=PROFILE_FORMAT_VERSION, host=platform.node(), platform=platform.platform(),
+                cpu_count=os.cpu_count(), numa_nodes=len(numa_nodes()))
+    data.setdefault("engines", {})[profile.engine] = profile.to_json()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def count_list(text):
+    return sorted({int(value) for value in text.split(",") if value.strip()})
+
+
+def default_counts(cpu_count):
+    """1, 2, 4, ... up to and including the CPU count"""
+    counts = [1]
+    while counts[-1] * 2 <= cpu_count:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpu_count:
+        counts.append(cpu_count)
+    return counts
+
+
+def config_grid(cpu_count, workers=None, threads=None, affinity_modes=("none",)):
+    """(workers, threads, affinity) to measure; the default grid never uses more threads than CPUs"""
+    grid = []
+    for worker_count in workers or default_counts(cpu_count):
+        for thread_count in threads or default_counts(cpu_count):
+            if not (workers and threads) and worker_count * thread_count > cpu_count and thread_count > 1:
+                continue
+            for affinity in affinity_modes:
+                grid.append((worker_count, thread_count, affinity))
+    return grid
+
+
+def build_engine(engine, piper_exe, work_dir, settings, memory_budget):
+    """An engine running every model with one TierSettings"""
+    profile = TuningProfile({DEFAULT_TIER: settings}, engine)
+    if engine == "forkserver":
+        from piper_forkserver import ForkServerEngine
+        return ForkServerEngine(workers_per_model=settings.workers, max_workers=settings.workers, tuning=profile)
+    if engine == "onnx":
+        from piper_engine import OnnxEngine
+        return OnnxEngine(max_workers=settings.workers, tuning=profile)
+    from piper_pool import PiperWorkerPool
+    return PiperWorkerPool(piper_exe, work_dir, workers_per_model=settings.workers, max_workers=settings.workers,
+                           memory_budget=memory_budget, tuning=profile)
+
+
+def measure(engine_name, piper_exe, model_path, settings, corpus, repeats, work_dir, memory_budget):
+    """Throughput and latency of one configuration rendering the corpus repeats times at once"""
+    from piper_benchmark import wav_duration
+
+    engine = build_engine(engine_name, piper_exe, work_dir, settings, memory_budget)
+    finished = {}
+
+    def output_file(name):
+        return os.path.join(work_dir, f"tune_{name}.wav")
+
+    try:
+        # One request per worker first, so every worker has loaded the model before timing starts
+        warm = [engine.submit(model_path, corpus[0], output_file(f"warm_{index}"), parallelism=settings.workers)
+                for index in range(settings.workers)]
+        wait(warm)
+        for future in warm:
+            future.result()
+
+        started = time.perf_counter()
+        futures = []
+        for index, text in enumerate(corpus * repeats):
+            future = engine.submit(model_path, text, output_file(index), parallelism=settings.workers)
+            future.add_done_callback(lambda f: finished.setdefault(f, time.perf_counter()))
+            futures.append(future)
+        paths = [future.result() for future in futures]
+        wall = time.perf_counter() - started
+        workers_used = engine.worker_count()
+    finally:
+        engine.shutdown()
+    audio = sum(wav_duration(path) for path in paths)
+    latencies = [finished.get(future, started + wall) - started for future in futures]
+    return {
+        **settings.to_json(),
+        "workers_used": workers_used,
+        "throughput": round(audio / wall, 3) if wall else None,
+        "wall_seconds": round(wall, 3),
+        "audio_seconds": round(audio, 3),
+        "median_latency_ms": round(statistics.median(latencies) * 1000, 1),
+    }
+
+
+def pick_best(rows):
+    """The configuration with the highest throughput; near ties go to the one using fewer CPUs"""
+    rows = [row for row in rows if not row.get("error") and row.get("throughput")]
+    if not rows:
+        return None
+    best = max(row["throughput"] for row in rows)
+    close = [row for row in rows if row["throughput"] >= best * (1 - TIE_MARGIN)]
+    return min(close, key=lambda row: (row["workers"] * row["threads"], row["workers"], -row["throughput"]))
+
+
+def tune(engine, piper_exe, models, grid, corpus, repeats, memory_budget):
+    """Measure the grid for one model of each quality; returns a TuningProfile of the winners"""
+    work_dir = tempfile.mkdtemp(prefix="piper_tuning_")
+    tiers, results = {}, []
+    try:
+        for quality, model_path in models:
+            rows = []
+            for workers, threads, affinity in grid:
+                settings = TierSettings(workers, threads, affinity)
+                print(f"Log: Tuning {quality} ({os.path.basename(model_path)}): {settings}")
+                try:
+                    row = measure(engine, piper_exe, model_path, settings, corpus, repeats, work_dir, memory_budget)
+                except Exception as e:
+                    row = dict(settings.to_json(), error=str(e))
+                rows.append(dict(row, quality=quality, model=os.path.basename(model_path)))
+            results.extend(rows)
+            best = pick_best(rows)
+            if best is not None:
+                tiers[quality] = TierSettings(best["workers"], best["threads"], best["affinity"])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if not tiers:
+        return None
+    tiers[DEFAULT_TIER] = tiers.get("medium") or next(iter(tiers.values()))
+    return TuningProfile(tiers, engine, datetime.datetime.now().isoformat(timespec="seconds"), results)
+
+
+def print_results(results, profile):
+    print(f"{'quality':8} {'workers':>7} {'threads':>7} {'affinity':>8} {'audio s/s':>10} {'latency':>9}")
+    for row in results:
+        if row.get("error"):
+            print(f"{row['quality']:8} {row['workers']:>7} {row['threads']:>7} {row['affinity']:>8}  error: {row['error']}")
+            continue
+        chosen = profile.tiers.get(row["quality"])
+        marker = " *" if chosen and chosen.to_json() == {key: row[key] for key in ("workers", "threads", "affinity")} else ""
+        print(f"{row['quality']:8} {row['workers']:>7} {row['threads']:>7} {row['affinity']:>8} "
+              f"{row['throughput']:>10.2f} {row['median_latency_ms']:>7.0f}ms{marker}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="piper_tuning",
+                                     description="Find the fastest workers/threads/affinity split for this host")
+    parser.add_argument("--engine", choices=["piper", "onnx", "forkserver"], default="piper", help="Engine to tune")
+    parser.add_argument("--piper", help="Path to the piper executable")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Directory with downloaded models")
+    parser.add_argument("--language", help="Prefer models of this language, e.g. en_US")
+    parser.add_argument("--quality", choices=QUALITIES, action="append", help="Only tune these qualities")
+    parser.add_argument("--workers", type=count_list, help="Worker counts to try, e.g. 1,2,4 (default: powers of two)")
+    parser.add_argument("--threads", type=count_list, help="Threads per worker to try, e.g. 1,2")
+    parser.add_argument("--affinity", default="none", help=f"Comma separated affinity modes to try: {', '.join(AFFINITY_MODES)}")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Passes over the corpus per configuration")
+    parser.add_argument("--memory-budget-mb", type=int, default=8192, help="Memory budget for Piper workers while tuning")
+    parser.add_argument("--fake", action="store_true", help="Tune the orchestration with piper_fake.py and stand-in models (never saved)")
+    parser.add_argument("--profile", help="Profile file (default: configs/tuning/<host>.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Measure and print, but do not save the profile")
+    parser.add_argument("--show", action="store_true", help="Print the saved profile and exit")
+    return parser
+
+
+def main(argv=None):
+    from piper_benchmark import BENCHMARK_CORPUS, FAKE_PIPER, find_models, create_fake_models
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    profile_path = args.profile or host_profile_path()
+    if args.show:
+        data = read_profile_file(profile_path)
+        if data is None:
+            print(f"No tuning profile at {profile_path}")
+            return 1
+        for engine, section in data.get("engines", {}).items():
+            print(f"{engine} (tuned {section.get('created')}, {data.get('cpu_count')} CPUs):")
+            for name, settings in section.get("tiers", {}).items():
+                print(f"  {name:8} {TierSettings.from_json(settings)}")
+        return 0
+
+    affinity_modes = [mode.strip() for mode in args.affinity.split(",") if mode.strip()]
+    unknown = [mode for mode in affinity_modes if mode not in AFFINITY_MODES]
+    if unknown:
+        parser.error(f"unknown affinity mode {unknown[0]!r}, expected {', '.join(AFFINITY_MODES)}")
+    if any(mode != "none" for mode in affinity_modes) and not hasattr(os, "sched_setaffinity") and psutil is None:
+        print("Log: CPU affinity needs Linux or psutil here; pinned configurations will run unpinned")
+
+    fake_dir = None
+    if args.fake:
+        fake_dir = tempfile.mkdtemp(prefix="piper_fake_models_")
+        found = create_fake_models(fake_dir)
+        piper_exe = FAKE_PIPER
+        args.engine = "piper"
+        # Timings of the stand-in say nothing about real Piper, so they must not size real workers
+        args.dry_run = True
+    else:
+        found = find_models(args.models_dir, quality=None)
+        piper_exe = find_piper_exe(args.piper)
+        if args.engine == "piper" and not os.path.exists(piper_exe):
+            print(f"Error: Piper executable not found at {piper_exe}")
+            return 2
+
+    # One model per quality, from the preferred language where there is one
+    models = {}
+    for labels, model_path in sorted(found, key=lambda item: item[0]["language"] != args.language):
+        if labels["quality"] in QUALITIES and (not args.quality or labels["quality"] in args.quality):
+            models.setdefault(labels["quality"], model_path)
+    if not models:
+        print("Error: No installed models match; download some or try --fake")
+        return 2
+
+    # Fork-server sessions always run one thread each (see piper_forkserver.py)
+    threads = [1] if args.engine == "forkserver" else args.threads
+    grid = config_grid(os.cpu_count() or 1, args.workers, threads, affinity_modes)
+    print(f"Log: Tuning {len(grid)} configuration(s) for {', '.join(models)} with the {args.engine} engine")
+    try:
+        profile = tune(args.engine, piper_exe, [(quality, models[quality]) for quality in QUALITIES if quality in models],
+                       grid, BENCHMARK_CORPUS, max(1, args.repeats), args.memory_budget_mb * 1024 * 1024)
+    finally:
+        if fake_dir:
+            shutil.rmtree(fake_dir, ignore_errors=True)
+    if profile is None:
+        print("Error: Every configuration failed")
+        return 1
+
+    print_results(profile.results, profile)
+    for quality in QUALITIES:
+        if quality in profile.tiers:
+            print(f"Log: Best for {quality}: {profile.tiers[quality]}")
+    if not args.dry_run:
+        print(f"Log: Profile written to {save_profile(profile, profile_path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
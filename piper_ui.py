@@ -1,109 +1,814 @@
 import sys
 import os
 import subprocess
-import json
-import requests
 import threading
 import tempfile
 import time
+import sqlite3
 import datetime
 import webbrowser
+
+# --profile-startup measures from here, before Qt and the app modules are imported
+STARTUP_BEGAN = time.perf_counter()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QTextEdit, QPushButton, 
                             QComboBox, QFileDialog, QSlider, QGroupBox,
                             QProgressBar, QMessageBox, QFrame, QStyle, QSizePolicy, 
-                            QToolButton, QScrollArea, QSpacerItem)
-from PyQt5.QtCore import Qt, QProcess, pyqtSignal, QObject, QUrl, QSize, QThread, QTimer
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from PyQt5.QtGui import QFont, QIcon, QColor, QPalette, QPixmap
+                            QToolButton, QScrollArea, QSpacerItem, QCheckBox, QSpinBox,
+                            QMenu, QListWidget, QListWidgetItem, QShortcut, QDialog, QLineEdit,
+                            QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QUrl, QSize, QThread, QTimer, QFileSystemWatcher
+from PyQt5.QtGui import QFont, QIcon, QColor, QPalette, QPixmap, QPainter, QPen, QKeySequence
+from piper_engine import create_engine
+from piper_cache import SynthesisCache
+from piper_download import DownloadQueue
+from piper_export import ExportQueue, EXPORT_FORMATS, FORMAT_DISPLAY_NAMES, available_formats
+from piper_inventory import ModelInventory
+from piper_text import split_sentences
+from piper_audio import read_wav, silence, PeakPyramid, peaks_available, load_peaks, PcmClip, PcmRingBuffer
+from piper_segments import SegmentMap, render_settings
+from piper_samples import PreviewCache
+from piper_store import OutputStore
+from piper_jobs import Job, JobScheduler, PRIORITIES
+from piper_document import DEFAULT_SENTENCE_SILENCE_MS, DEFAULT_DOCUMENT_WORKERS
+from piper_metrics import METRICS, format_stage_summary
+
+# Application paths live in piper_paths.py so headless tools can share them
+from piper_paths import (BASE_DIR, MODELS_DIR, CONFIG_DIR, OUTPUT_DIR, SAMPLES_DIR, CACHE_DIR,
+                         PIPER_EXE, ICON_PATH, ensure_directories, find_piper_exe, find_ffmpeg_exe)
+from piper_catalog import (QUALITIES, QUALITY_DISPLAY_NAMES, VoiceCatalog, resolve_voice_quality,
+                           download_files, iter_voice_models, model_speakers)
+
+# Synthesis engine: "piper" processes, "onnx" in-process, or "auto" (piper when installed, see piper_engine.py)
+SYNTHESIS_ENGINE = os.environ.get("PIPER_ENGINE", "auto")
+
+# Warm Piper processes kept per model (see piper_pool.py)
+PIPER_WORKERS_PER_MODEL = 1
+PIPER_IDLE_TIMEOUT = 300  # seconds
+PIPER_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024  # bytes
+
+# Long texts are split into sentences rendered by this many Piper processes at once
+LONG_DOCUMENT_WORKERS = DEFAULT_DOCUMENT_WORKERS
+
+# Models downloaded at the same time (see piper_download.py)
+MAX_CONCURRENT_DOWNLOADS = 4
+
+# Files exported or transcoded at the same time (see piper_export.py)
+MAX_CONCURRENT_EXPORTS = max(1, (os.cpu_count() or 2) // 2)
+
+# Renders started at the same time (see piper_jobs.py); each one already spreads its sentences over the worker pool
+MAX_CONCURRENT_SYNTHESIS_JOBS = 1
+
+# Delay before rescanning model directories the file watcher reported, so bursts of events coalesce
+INVENTORY_RESCAN_DELAY_MS = 300
+
+# Delay after a language change before its voice samples are fetched, so scrolling through languages fetches nothing
+SAMPLE_PREFETCH_DELAY_MS = 1500
+
+# Marker appended to voices and qualities that are already downloaded
+DOWNLOADED_MARKER = " ✓"
+
+# Stage timings are written here every METRICS_EXPORT_INTERVAL_MS and on exit (.prom for Prometheus text, else JSON)
+METRICS_FILE = os.environ.get("PIPER_METRICS_FILE")
+METRICS_EXPORT_INTERVAL_MS = 10000
+METRICS_OVERLAY_INTERVAL_MS = 1000  # refresh of the F12 debug overlay
+
+# Functions listed by --profile-startup, slowest first
+STARTUP_PROFILE_FUNCTIONS = 25
+
+# Size limit of the synthesis cache (see piper_cache.py)
+SYNTHESIS_CACHE_SIZE = 1024 * 1024 * 1024  # bytes
+
+# Every generation is kept in an indexed store below OUTPUT_DIR, trimmed to this size and age
+OUTPUT_STORE_DIR = os.path.join(OUTPUT_DIR, "store")
+OUTPUT_STORE_SIZE = 5 * 1024 * 1024 * 1024  # bytes
+OUTPUT_STORE_MAX_AGE_DAYS = 90
+HISTORY_PAGE_SIZE = 200
+HISTORY_SEARCH_DELAY_MS = 250
+
+# Voice catalog; models.json is only read (or its binary index loaded) on first use
+CATALOG = VoiceCatalog(models_dir=MODELS_DIR)
+
+# Look of the whole window, applied once to the QApplication. Rules are scoped to the
+# central widget so dialogs keep the platform style; widgets are picked by object name.
+APP_STYLESHEET = """
+QMainWindow {
+    background-color: #121420;
+}
+#central QFrame#topBar {
+    background-color: rgba(25, 28, 37, 0.9);
+    border-radius: 10px;
+    border: 1px solid rgba(60, 63, 84, 0.6);
+}
+#central QFrame#leftPanel, #central QFrame#rightPanel {
+    background-color: rgba(30, 33, 45, 0.8);
+    border-radius: 10px;
+    border: 1px solid rgba(60, 63, 84, 0.6);
+}
+#central QLabel {
+    color: #FFFFFF;
+}
+#central QLabel#appTitle {
+    font-size: 24px;
+    font-weight: 600;
+    letter-spacing: 1px;
+}
+#central QLabel#voiceLabel {
+    margin-top: 10px;
+}
+#central QLabel#qualityLabel, #central QLabel#speakerLabel {
+    margin-top: 5px;
+}
+#central QLabel#modelLabel {
+    margin-top: 15px;
+}
+#central QLabel#modelPathLabel {
+    color: #8E95A9;
+}
+#central QLabel#durationLabel {
+    color: #8E95A9;
+    min-width: 60px;
+}
+#central QLabel#statusLabel {
+    color: #8E95A9;
+    font-size: 13px;
+    padding: 5px;
+}
+#central QLabel#metricsOverlay {
+    background-color: rgba(10, 12, 18, 0.88);
+    color: #9FE0A8;
+    font-family: Consolas, 'DejaVu Sans Mono', monospace;
+    font-size: 12px;
+    border: 1px solid rgba(60, 63, 84, 0.8);
+    border-radius: 6px;
+    padding: 8px;
+}
+#central QGroupBox {
+    font-size: 16px;
+    font-weight: bold;
+    color: #FFFFFF;
+}
+#central QGroupBox#controlsGroup {
+    margin-top: 20px;
+}
+#central QGroupBox::title {
+    subcontrol-origin: margin;
+    subcontrol-position: top center;
+    padding: 0 5px;
+}
+#central QComboBox {
+    background-color: rgba(40, 43, 56, 0.8);
+    color: white;
+    padding: 5px;
+    border-radius: 6px;
+    border: 1px solid rgba(60, 63, 84, 0.8);
+}
+#central QComboBox:hover {
+    background-color: rgba(50, 53, 68, 0.8);
+    border: 1px solid rgba(80, 83, 104, 0.8);
+}
+#central QComboBox::drop-down {
+    border: none;
+    width: 20px;
+}
+#central QComboBox#voiceCombo {
+    padding: 8px;
+    font-size: 14px;
+}
+#central QComboBox#voiceCombo::drop-down {
+    width: 30px;
+}
+#central QComboBox#voiceCombo QAbstractItemView {
+    background-color: rgba(30, 33, 45, 0.9);
+    border: 1px solid rgba(60, 63, 84, 0.8);
+    selection-background-color: rgba(78, 84, 200, 0.6);
+    selection-color: white;
+}
+#central QPushButton, #central QToolButton#prefetchButton {
+    background-color: rgba(40, 43, 56, 0.8);
+    color: white;
+    border: 1px solid rgba(60, 63, 84, 0.8);
+    border-radius: 6px;
+    padding: 4px 14px;
+    font-size: 13px;
+    font-weight: 500;
+}
+#central QPushButton:hover, #central QToolButton#prefetchButton:hover {
+    background-color: rgba(50, 53, 68, 0.8);
+    border: 1px solid rgba(80, 83, 104, 0.8);
+}
+#central QPushButton:pressed {
+    background-color: rgba(35, 38, 50, 0.8);
+}
+#central QPushButton:disabled {
+    background-color: rgba(35, 38, 50, 0.5);
+    color: #5D6379;
+    border: 1px solid rgba(45, 48, 65, 0.8);
+}
+#central QToolButton#prefetchButton {
+    padding: 4px 10px;
+    font-weight: normal;
+}
+#central QToolButton#prefetchButton::menu-indicator {
+    image: none;
+}
+#central QPushButton#sampleButton {
+    padding: 4px;
+}
+#central QPushButton#browseButton {
+    padding: 4px;
+    font-size: 12px;
+    font-weight: normal;
+}
+#central QPushButton#rewindButton {
+    font-size: 16px;
+    font-weight: normal;
+    padding: 2px;
+    min-width: 30px;
+    max-width: 30px;
+    max-height: 28px;
+}
+#central QPushButton#generateButton, #central QPushButton#moreInfoButton {
+    background-color: rgba(108, 99, 255, 0.9);
+    border: none;
+    padding: 4px 10px;
+    font-size: 14px;
+}
+#central QPushButton#moreInfoButton {
+    background-color: rgba(108, 99, 255, 0.7);
+    font-size: 13px;
+    max-width: 120px;
+}
+#central QPushButton#generateButton:hover, #central QPushButton#moreInfoButton:hover {
+    background-color: rgba(126, 118, 255, 0.9);
+    border: none;
+}
+#central QPushButton#generateButton:pressed, #central QPushButton#moreInfoButton:pressed {
+    background-color: rgba(90, 82, 235, 0.9);
+}
+#central QPushButton#generateButton:disabled {
+    background-color: rgba(35, 38, 50, 0.5);
+    color: #5D6379;
+}
+#central QListWidget#jobsList {
+    background-color: rgba(25, 28, 37, 0.8);
+    color: #8E95A9;
+    border: 1px solid rgba(60, 63, 84, 0.6);
+    border-radius: 6px;
+    font-size: 12px;
+}
+#central QTextEdit {
+    background-color: rgba(40, 43, 56, 0.8);
+    color: white;
+    border: 1px solid rgba(60, 63, 84, 0.8);
+    border-radius: 8px;
+    padding: 10px;
+    font-size: 14px;
+}
+#central QTextEdit:focus {
+    border: 1px solid rgba(80, 83, 104, 0.8);
+}
+#central QWidget#waveform {
+    background-color: rgba(25, 28, 37, 0.8);
+    color: #8E95A9;
+    border-radius: 6px;
+    border: 1px solid rgba(60, 63, 84, 0.6);
+    padding: 10px;
+}
+#central QCheckBox {
+    color: #8E95A9;
+    font-size: 13px;
+    margin-left: 8px;
+}
+#central QSpinBox {
+    background-color: rgba(40, 43, 56, 0.8);
+    color: white;
+    border: 1px solid rgba(60, 63, 84, 0.8);
+    border-radius: 6px;
+    padding: 2px 4px;
+    font-size: 13px;
+}
+#central QProgressBar {
+    border: 1px solid rgba(60, 63, 84, 0.8);
+    border-radius: 6px;
+    background-color: rgba(25, 28, 37, 0.8);
+    color: white;
+    text-align: center;
+    height: 18px;
+}
+#central QProgressBar::chunk {
+    background-color: rgba(108, 99, 255, 0.9);
+    border-radius: 6px;
+}
+QStatusBar {
+    background-color: rgba(25, 28, 37, 0.95);
+    color: #8E95A9;
+}
+QStatusBar QLabel#cacheStats {
+    color: #8E95A9;
+    font-size: 12px;
+    padding: 0 8px;
+}
+"""
+
+
+class StartupProfile:
+    """Wall-clock phases of application start, printed by --profile-startup and kept in METRICS"""
+    
+    def __init__(self, began):
+        self.last = self.began = began
+        self.phases = []  # (phase, seconds)
+    
+    def mark(self, phase):
+        """Close the phase that ran since the previous mark"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        METRICS.record_stage("startup", now - self.last, phase=phase)
+        self.last = now
+    
+    def report(self, profiler=None):
+        total = self.last - self.began
+        lines = ["Startup profile (since piper_ui started importing):"]
+        for phase, seconds in self.phases:
+            lines.append(f"  {phase:24} {seconds * 1000:8.1f} ms {seconds * 100 / max(total, 1e-9):5.1f}%")
+        lines.append(f"  {'total':24} {total * 1000:8.1f} ms")
+        if profiler is not None:
+            import io
+            import pstats
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(STARTUP_PROFILE_FUNCTIONS)
+            lines.append(stream.getvalue())
+        return "\n".join(lines)
 
-# Define application paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODELS_DIR = os.path.join(BASE_DIR, "models")
-CONFIG_DIR = os.path.join(BASE_DIR, "configs")
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-SAMPLES_DIR = os.path.join(BASE_DIR, "samples")
-PIPER_EXE = os.path.join(BASE_DIR, "piper_win", "piper.exe")
-ICON_PATH = os.path.join(BASE_DIR, "assets", "icon.ico")
-MODELS_JSON_PATH = os.path.join(BASE_DIR, "models.json")
 
-# Ensure directories exist
-for directory in [MODELS_DIR, CONFIG_DIR, OUTPUT_DIR, SAMPLES_DIR]:
-    os.makedirs(directory, exist_ok=True)
+STARTUP = StartupProfile(STARTUP_BEGAN)
 
-# Qualities available for voices
-QUALITIES = ["x_low", "low", "medium", "high"]
 
-# Model repository information with all English voices and qualities
-MODEL_REPOSITORY = {}
-if os.path.exists(MODELS_JSON_PATH):
-    try:
-        with open(MODELS_JSON_PATH, "r", encoding="utf-8") as f:
-            MODEL_REPOSITORY = json.load(f)
-        print("Model repository loaded from models.json.")
-    except json.JSONDecodeError as e:
-        print(f"Error decoding models.json: {e}")
-    except Exception as e:
-        print(f"An error occurred while loading models.json: {e}")
-else:
-    print("models.json not found, using an empty model repository.")
+class DownloadManager(QObject):
+    """Qt front end of piper_download.DownloadQueue; item_updated is delivered on the GUI thread"""
+    item_updated = pyqtSignal(str)  # model path of the item that changed
+    
+    def __init__(self, max_concurrent=MAX_CONCURRENT_DOWNLOADS):
+        super().__init__()
+        self.queue = DownloadQueue(max_concurrent, on_update=lambda item: self.item_updated.emit(item.key))
+    
+    def enqueue(self, model_path, files, description):
+        """Queue a model download; a model already downloading returns its existing item"""
+        return self.queue.enqueue(model_path, files, description)
+    
+    def item(self, model_path):
+        return self.queue.items.get(model_path)
+    
+    def cancel(self, model_path):
+        self.queue.cancel(model_path)
+    
+    def cancel_all(self):
+        self.queue.cancel_all()
+    
+    def shutdown(self):
+        self.queue.shutdown()
+
+class ExportManager(QObject):
+    """Qt front end of piper_export.ExportQueue; item_updated is delivered on the GUI thread"""
+    item_updated = pyqtSignal(str)  # destination of the item that changed
+    
+    def __init__(self, ffmpeg_exe=None, max_concurrent=MAX_CONCURRENT_EXPORTS):
+        super().__init__()
+        self.queue = ExportQueue(max_concurrent, ffmpeg_exe, on_update=lambda item: self.item_updated.emit(item.key),
+                                 no_link_dirs=[CACHE_DIR, OUTPUT_STORE_DIR])
+    
+    def enqueue(self, source, destination, export_format):
+        return self.queue.enqueue(source, destination, export_format)
+    
+    def enqueue_files(self, paths, output_dir, export_format):
+        return self.queue.enqueue_files(paths, output_dir, export_format)
+    
+    def item(self, key):
+        return self.queue.items.get(key)
+    
+    def shutdown(self):
+        self.queue.shutdown()
 
+class SynthesisSignals(QObject):
+    """Carries worker pool results from pool threads back to the GUI thread"""
+    chunk_finished = pyqtSignal(int, int, object)  # stream id, chunk index, (params, frames)
+    chunk_error = pyqtSignal(int, str)  # stream id, message
+    preview_finished = pyqtSignal(str, str)  # preview WAV path, error message or ""
+    model_hashed = pyqtSignal(int)  # id of the synthesis job whose model was hashed
+    cache_opened = pyqtSignal(object)  # SynthesisCache, or None if it could not be opened
 
-class DownloadWorker(QObject):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal(str)
+class PcmPlayer(QObject):
+    """Plays a PcmClip through QAudioOutput, starting while the clip is still being synthesized
+    
+    A timer moves audio from the clip into a bounded ring buffer and from there into
+    the device, so playback starts with the first samples and later chunks follow
+    without a gap. States and positions mirror QMediaPlayer's; QtMultimedia itself is
+    only imported when audio is first played.
+    """
+    state_changed = pyqtSignal(int)  # one of the states below
+    position_changed = pyqtSignal(int)  # milliseconds
     error = pyqtSignal(str)
-    status_update = pyqtSignal(str)  # New signal for status updates
+    audio_started = pyqtSignal()  # first samples of a play() reached the device
+    
+    # Same values as QMediaPlayer.State
+    StoppedState = 0
+    PlayingState = 1
+    PausedState = 2
     
-    def __init__(self, url, save_path, description=""):
+    FEED_INTERVAL_MS = 5
+    RING_BUFFER_MS = 500
+    DEVICE_BUFFER_MS = 50
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.clip = None
+        self.output = None
+        self.device = None
+        self.ring = None
+        self.clip_offset = 0  # next byte of the clip to play or to move into the ring buffer
+        self.start_offset = 0  # byte of the clip the device started from
+        self.current_state = self.StoppedState
+        self.play_requested_at = None  # perf_counter of a play() whose audio has not reached the device yet
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.FEED_INTERVAL_MS)
+        self.timer.timeout.connect(self.feed)
+    
+    def state(self):
+        return self.current_state
+    
+    def set_clip(self, clip):
+        self.stop()
+        self.clip = clip
+    
+    def play(self):
+        if self.clip is None or not self.clip.size or self.current_state == self.PlayingState:
+            return
+        if self.current_state == self.PausedState and self.output is not None:
+            self.output.resume()
+            self.timer.start()
+            self.set_state(self.PlayingState)
+            return
+        if self.clip.complete and self.clip_offset >= self.clip.size:
+            self.clip_offset = 0
+        self.play_requested_at = time.perf_counter()
+        self.open_output(self.clip_offset)
+    
+    def pause(self):
+        if self.current_state == self.PlayingState:
+            self.output.suspend()
+            self.timer.stop()
+            self.set_state(self.PausedState)
+    
+    def stop(self):
+        self.close_output()
+        self.play_requested_at = None
+        self.clip_offset = 0
+        self.set_state(self.StoppedState)
+        self.position_changed.emit(0)
+    
+    def position(self):
+        if self.clip is None:
+            return 0
+        if self.output is None:
+            return self.clip.milliseconds(self.clip_offset)
+        return self.clip.milliseconds(self.start_offset) + self.output.processedUSecs() // 1000
+    
+    def set_position(self, position_ms):
+        if self.clip is None:
+            return
+        offset = self.clip.byte_offset(position_ms)
+        if self.current_state == self.PlayingState:
+            self.open_output(offset)
+        else:
+            self.close_output()
+            self.clip_offset = offset
+            self.set_state(self.StoppedState)
+        self.position_changed.emit(self.position())
+    
+    def data_available(self):
+        """Called when the clip grew; hands the new samples to the device without waiting for the timer"""
+        if self.current_state == self.PlayingState:
+            self.feed()
+    
+    def audio_format(self):
+        from PyQt5.QtMultimedia import QAudioFormat
+        channels, sample_width, sample_rate = self.clip.params
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(sample_rate)
+        audio_format.setChannelCount(channels)
+        audio_format.setSampleSize(sample_width * 8)
+        audio_format.setCodec("audio/pcm")
+        audio_format.setByteOrder(QAudioFormat.LittleEndian)
+        audio_format.setSampleType(QAudioFormat.SignedInt)
+        return audio_format
+    
+    def open_output(self, offset):
+        from PyQt5.QtMultimedia import QAudioOutput, QAudioDeviceInfo, QAudio
+        self.close_output()
+        audio_format = self.audio_format()
+        device_info = QAudioDeviceInfo.defaultOutputDevice()
+        if device_info.isNull() or not device_info.isFormatSupported(audio_format):
+            self.error.emit("No audio output device supports this audio format")
+            return
+        
+        frame_size = self.clip.frame_size
+        bytes_per_ms = frame_size * self.clip.params[2] / 1000
+        ring_size = int(bytes_per_ms * self.RING_BUFFER_MS)
+        self.ring = PcmRingBuffer(ring_size - ring_size % frame_size)
+        self.clip_offset = self.start_offset = offset
+        self.output = QAudioOutput(device_info, audio_format, self)
+        self.output.setBufferSize(int(bytes_per_ms * self.DEVICE_BUFFER_MS))
+        self.device = self.output.start()
+        if self.device is None or self.output.error() != QAudio.NoError:
+            self.close_output()
+            self.error.emit("Could not open the audio output device")
+            return
+        self.set_state(self.PlayingState)
+        self.feed()
+        self.timer.start()
+    
+    def close_output(self):
+        self.timer.stop()
+        if self.output is not None:
+            self.clip_offset = self.clip.byte_offset(self.position())  # resume where the device stopped
+            self.output.stop()
+            self.output.deleteLater()
+        self.output = None
+        self.device = None
+        self.ring = None
+    
+    def feed(self):
+        """Top up the ring buffer from the clip, then the device from the ring buffer"""
+        if self.output is None:
+            return
+        while self.ring.free() and self.clip_offset < self.clip.size:
+            self.clip_offset += self.ring.write(self.clip.read(self.clip_offset, self.ring.free()))
+        
+        free = self.output.bytesFree()
+        free -= free % self.clip.frame_size
+        if free and len(self.ring):
+            self.device.write(self.ring.read(free))
+            if self.play_requested_at is not None:
+                METRICS.record_stage("playback_start", time.perf_counter() - self.play_requested_at)
+                self.play_requested_at = None
+                self.audio_started.emit()
+        self.position_changed.emit(self.position())
+        
+        if self.clip.complete and self.clip_offset >= self.clip.size and not len(self.ring):
+            from PyQt5.QtMultimedia import QAudio
+            if self.output.state() == QAudio.IdleState:
+                self.stop()
+    
+    def set_state(self, state):
+        if state != self.current_state:
+            self.current_state = state
+            self.state_changed.emit(state)
+
+class WaveformWidget(QWidget):
+    """Draws a PeakPyramid with zoom, pan and a playback cursor; shows its text while there is no audio"""
+    seek_requested = pyqtSignal(int)  # position in milliseconds
+    
+    ZOOM_STEP = 0.8  # share of the visible range kept per wheel step
+    MIN_VISIBLE_FRAMES = 64
+    PADDING = 10
+    
+    def __init__(self, text=""):
         super().__init__()
-        self.url = url
-        self.save_path = save_path
-        self.description = description
-        self.is_cancelled = False
+        self.setAttribute(Qt.WA_StyledBackground, True)
+        self.caption = text
+        self.pyramid = None
+        self.view_start = 0
+        self.view_end = None  # None follows the end of the audio, also while it is still growing
+        self.position_ms = None
+    
+    def setText(self, text):
+        self.caption = text
+        self.update()
+    
+    def text(self):
+        return self.caption
+    
+    def set_pyramid(self, pyramid):
+        """Show pyramid (None for just the text); keeps the zoom while the same pyramid grows"""
+        if pyramid is not self.pyramid:
+            self.pyramid = pyramid
+            self.view_start = 0
+            self.view_end = None
+            self.position_ms = None
+        self.update()
+    
+    def set_position(self, position_ms):
+        self.position_ms = position_ms
+        if self.pyramid is not None:
+            self.update()
+    
+    def waveform_rect(self):
+        return self.rect().adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+    
+    def visible_range(self):
+        end = self.pyramid.sample_count if self.view_end is None else self.view_end
+        return self.view_start, max(end, self.view_start + 1)
+    
+    def frame_at(self, x):
+        rect = self.waveform_rect()
+        start, end = self.visible_range()
+        offset = min(max(x - rect.left(), 0), rect.width())
+        return int(start + (end - start) * offset / max(1, rect.width()))
+    
+    def wheelEvent(self, event):
+        """Wheel zooms around the mouse pointer, Shift+wheel scrolls"""
+        if self.pyramid is None or not self.pyramid.sample_count:
+            return super().wheelEvent(event)
+        steps = event.angleDelta().y() / 120
+        total = self.pyramid.sample_count
+        start, end = self.visible_range()
+        if event.modifiers() & Qt.ShiftModifier:
+            shift = int(-steps * (end - start) / 10)
+            shift = max(-start, min(shift, total - end))
+            start, end = start + shift, end + shift
+        else:
+            anchor = self.frame_at(event.pos().x())
+            span = int(min(max((end - start) * self.ZOOM_STEP ** steps, self.MIN_VISIBLE_FRAMES), total))
+            ratio = (anchor - start) / (end - start)
+            start = int(min(max(anchor - span * ratio, 0), total - span))
+            end = start + span
+        self.view_start = start
+        self.view_end = None if start == 0 and end >= total else end
+        self.update()
+        event.accept()
+    
+    def mouseDoubleClickEvent(self, event):
+        self.view_start = 0
+        self.view_end = None
+        self.update()
+    
+    def mousePressEvent(self, event):
+        if self.pyramid is not None and self.pyramid.sample_rate and event.button() == Qt.LeftButton:
+            self.seek_requested.emit(int(self.frame_at(event.pos().x()) * 1000 / self.pyramid.sample_rate))
+        super().mousePressEvent(event)
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        painter = QPainter(self)
+        painter.setPen(QPen(QColor("#8E95A9")))
+        if self.pyramid is None or not self.pyramid.sample_count:
+            painter.drawText(self.rect(), Qt.AlignCenter, self.caption)
+            return
         
-    def run(self):
-        try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
-            
-            # Download with progress tracking
-            response = requests.get(self.url, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 1024  # 1 Kibibyte
-            downloaded = 0
-            
-            with open(self.save_path, 'wb') as file:
-                for data in response.iter_content(block_size):
-                    if self.is_cancelled:
-                        file.close()
-                        os.remove(self.save_path)
-                        self.error.emit("Download cancelled")
-                        return
-                    
-                    file.write(data)
-                    downloaded += len(data)
-                    if total_size > 0:
-                        progress = int((downloaded / total_size) * 100)
-                        self.progress.emit(progress)
-                        if progress % 10 == 0:  # Update status every 10% progress
-                            self.status_update.emit(f"Downloading {self.description} - {progress}%")
-            
-            self.finished.emit(self.save_path)
-        except Exception as e:
-            self.error.emit(str(e))
+        rect = self.waveform_rect()
+        middle, scale = rect.center().y(), rect.height() / 2 / 32768.0
+        start, end = self.visible_range()
+        mins, maxs = self.pyramid.peaks(start, end, rect.width())
+        if len(mins):
+            # Peaks cover start..sample_count, which is less than the view while zoomed past the end
+            covered = rect.width() * (min(end, self.pyramid.sample_count) - start) / (end - start)
+            painter.setPen(QPen(QColor("#5B8DEF")))
+            for column in range(len(mins)):
+                x = rect.left() + int(column * covered / len(mins))
+                painter.drawLine(x, int(middle - maxs[column] * scale), x, int(middle - mins[column] * scale))
+        
+        if self.position_ms is not None:
+            frame = self.position_ms * self.pyramid.sample_rate / 1000
+            if start <= frame <= end:
+                x = rect.left() + int((frame - start) * rect.width() / (end - start))
+                painter.setPen(QPen(QColor("#E0E3EC")))
+                painter.drawLine(x, rect.top(), x, rect.bottom())
+
+class MetricsOverlay(QLabel):
+    """Debug overlay with per-stage latencies and the latest spans, toggled with F12"""
+    RECENT_LINES = 8
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setObjectName("metricsOverlay")
+        self.setAttribute(Qt.WA_TransparentForMouseEvents, True)
+        self.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.timer = QTimer(self)
+        self.timer.setInterval(METRICS_OVERLAY_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+    
+    def toggle(self):
+        if self.isVisible():
+            self.timer.stop()
+            self.hide()
+            return
+        self.refresh()
+        self.show()
+        self.raise_()
+        self.timer.start()
+    
+    def refresh(self):
+        lines = ["Stage timings (F12 to hide)", format_stage_summary(METRICS.stage_summary()) or "No spans yet", "",
+                 "Recent spans"]
+        for started, stage, seconds, labels in METRICS.recent_spans()[-self.RECENT_LINES:]:
+            details = " ".join(f"{key}={value}" for key, value in labels.items())
+            lines.append(f"{time.strftime('%H:%M:%S', time.localtime(started))} {stage:20} "
+                         f"{seconds * 1000:9.1f} ms {details}")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 12, 12)
+
+
+class HistoryDialog(QDialog):
+    """Past generations, read page by page from the output store's index"""
+    entry_activated = pyqtSignal(object)  # StoreEntry to load into the player
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.last_created = None  # created time of the last row shown, where the next page starts
+        self.setWindowTitle("History")
+        self.resize(760, 480)
+        
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search text or voice")
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(HISTORY_SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.reload)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Created", "Voice", "Length", "Text"])
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.itemDoubleClicked.connect(self.open_selected)
+        
+        self.summary_label = QLabel()
+        self.more_btn = QPushButton("Load More")
+        self.more_btn.clicked.connect(self.load_page)
+        open_btn = QPushButton("Open")
+        open_btn.clicked.connect(self.open_selected)
+        delete_btn = QPushButton("Delete")
+        delete_btn.clicked.connect(self.delete_selected)
+        
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.summary_label)
+        buttons_layout.addStretch()
+        for button in (self.more_btn, open_btn, delete_btn):
+            buttons_layout.addWidget(button)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons_layout)
+        self.reload()
+    
+    def reload(self):
+        self.table.setRowCount(0)
+        self.last_created = None
+        self.load_page()
+    
+    def load_page(self):
+        """Append the next HISTORY_PAGE_SIZE renders, continuing after the last row shown"""
+        entries = self.store.history(self.search_edit.text().strip(), HISTORY_PAGE_SIZE, self.last_created)
+        for entry in entries:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            voice = entry.voice or ""
+            if entry.speaker is not None:
+                voice += f" #{entry.speaker}"
+            for column, text in enumerate([entry.created_text(), voice, f"{entry.duration:.1f} s", entry.excerpt]):
+                item = QTableWidgetItem(text)
+                item.setData(Qt.UserRole, entry)
+                self.table.setItem(row, column, item)
+        if entries:
+            self.last_created = entries[-1].created
+        self.more_btn.setEnabled(len(entries) == HISTORY_PAGE_SIZE)
+        self.summary_label.setText(self.store.stats_text())
+    
+    def selected_entries(self):
+        rows = sorted({index.row() for index in self.table.selectedIndexes()})
+        return [self.table.item(row, 0).data(Qt.UserRole) for row in rows]
+    
+    def open_selected(self, *args):
+        entries = self.selected_entries()
+        if entries:
+            self.entry_activated.emit(entries[0])
+    
+    def delete_selected(self):
+        entries = self.selected_entries()
+        if not entries:
+            return
+        self.store.delete([entry.id for entry in entries])
+        for row in sorted({index.row() for index in self.table.selectedIndexes()}, reverse=True):
+            self.table.removeRow(row)
+        self.summary_label.setText(self.store.stats_text())
 
-    def cancel(self):
-        self.is_cancelled = True
 
 class SUZAVoiceStudio(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("SUZA Voice Studio")
         self.setMinimumSize(1100, 700)
-        self.setStyleSheet(self.load_stylesheet())
+        # One stylesheet for the whole application, parsed once instead of once per widget
+        app = QApplication.instance()
+        if app is not None and not app.styleSheet():
+            app.setStyleSheet(APP_STYLESHEET)
         
         # Set the app icon using the .ico file
         if os.path.exists(ICON_PATH):
@@ -114,175 +819,150 @@ class SUZAVoiceStudio(QMainWindow):
         # Initialize variables
         self.model_path = ""
         self.output_file = os.path.join(OUTPUT_DIR, "output.wav")
-        self.process = QProcess()
-        self.player = QMediaPlayer()
-        self.download_threads = []
+        self.download_manager = DownloadManager()
+        self.download_manager.item_updated.connect(self.download_item_updated)
+        self.download_jobs = {}  # model path -> Job of its download
+        # Renders and downloads are queued as jobs and started by priority without blocking the window
+        self.jobs = JobScheduler({"synthesis": MAX_CONCURRENT_SYNTHESIS_JOBS, "download": MAX_CONCURRENT_DOWNLOADS},
+                                 on_update=self.job_updated)
+        self.job_list_items = {}  # job id -> QListWidgetItem
+        self.jobs_list = None  # created with the first job
+        self.current_job = None  # the synthesis job whose audio is being rendered
+        self.stream_futures = []
+        self.ffmpeg_exe = find_ffmpeg_exe()
+        self.export_manager = ExportManager(self.ffmpeg_exe)
+        self.export_manager.item_updated.connect(self.export_item_updated)
+        self.export_batch = []  # ExportItems of the last Save As or Export Files request
         self.models_dir = MODELS_DIR
-        self.piper_exe = PIPER_EXE
-        
-        # Check if piper.exe exists
-        if not os.path.exists(self.piper_exe):
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"piper.exe not found at {self.piper_exe}. Please make sure it's in the same directory as this script."
-            )
-            sys.exit(1)
+        self.piper_exe = find_piper_exe(PIPER_EXE)
+        
+        # Installed models, scanned by finish_startup() once the window is up and kept current by a file watcher
+        self.inventory = ModelInventory(self.models_dir)
+        CATALOG.inventory = self.inventory
+        self.dirty_model_dirs = set()
+        self.inventory_timer = QTimer(self)
+        self.inventory_timer.setSingleShot(True)
+        self.inventory_timer.setInterval(INVENTORY_RESCAN_DELAY_MS)
+        self.inventory_timer.timeout.connect(self.rescan_model_directories)
+        self.models_watcher = QFileSystemWatcher(self)
+        self.models_watcher.directoryChanged.connect(self.model_directory_changed)
+        
+        # Warm Piper processes reused across Generate clicks, or ONNX Runtime; created by finish_startup()
+        self.worker_pool = None
+        self.synthesis_signals = SynthesisSignals()
+        self.synthesis_signals.chunk_finished.connect(self.stream_chunk_finished)
+        self.synthesis_signals.chunk_error.connect(self.stream_chunk_failed)
+        self.synthesis_signals.model_hashed.connect(self.model_hashed)
+        self.synthesis_signals.cache_opened.connect(self.synthesis_cache_opened)
+        self.hashing_job = None  # (job, spec) of the render waiting for its model to be hashed
+        
+        # Generated audio stays in memory (see PcmPlayer); long texts are rendered sentence by sentence
+        self.clip = None
+        self.clip_pyramid = None
+        self.stream_id = 0
+        self.stream_chunks = []
+        self.stream_queued = 0
+        self.stream_silence_ms = 0
+        self.stream_autoplay = False
+        self.stream_sentences = []
+        self.stream_settings = None
+        self.stream_layout = []  # (offset, size) of each sentence appended to the clip
+        
+        # Sentences of the current clip, so an edited text only re-renders what changed
+        self.segment_map = None
+        self.export_segment_map = None  # (ExportItem, SegmentMap) of a WAV being saved
+        
+        # Previously synthesized WAVs, served without running Piper again; opening the cache lists every
+        # cached file, so finish_startup does it on a thread and renders until then go without it
+        self.synthesis_cache = None
+        self.pending_cache_key = None
+        
+        # Every generation is indexed in the output store, opened by finish_startup
+        self.output_store = None
+        self.history_dialog = None
+        self.pending_render = None  # text, voice, speaker and settings key of the request being generated
+        
+        # Start of the request being generated, for the request and time-to-first-audio timings
+        self.request_started = None
+        self.first_audio_pending = None
+        if METRICS_FILE:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.setInterval(METRICS_EXPORT_INTERVAL_MS)
+            self.metrics_timer.timeout.connect(self.write_metrics)
+            self.metrics_timer.start()
         
         # Set up the UI
         self.init_ui()
+        STARTUP.mark("build window")
         
         # Populate model selection
         self.populate_model_selection()
+        STARTUP.mark("fill voice lists")
         
-    def load_stylesheet(self):
-        # Improved QSS for readability and modern look
-        return """
-        QMainWindow {
-            background: #121215;
-        }
-        QWidget {
-            color: #e0e0e0;
-            font-family: 'Segoe UI', 'Roboto', Arial, sans-serif;
-            font-size: 15px;
-        }
-        QGroupBox {
-            background: rgba(30,30,40,0.7);
-            border-radius: 12px;
-            border: 1px solid rgba(80,80,120,0.18);
-            margin-top: 18px;
-            padding: 18px;
-        }
-        QGroupBox::title {
-            subcontrol-origin: margin;
-            subcontrol-position: top center;
-            padding: 0 5px;
-            color: #FFFFFF;
-            font-weight: bold;
-            font-size: 15px;
-        }
-        QLabel {
-            color: #e0e0e0;
-        }
-        QLabel#LogoLabel {
-            font-size: 32px;
-            font-weight: bold;
-            color: #fff;
-            letter-spacing: 2px;
-            padding: 0 0 0 10px;
-        }
-        QLabel#AppNameLabel {
-            font-size: 22px;
-            color: #a0a0ff;
-            font-weight: 600;
-            letter-spacing: 1.5px;
-        }
-        QComboBox, QSlider, QLineEdit, QTextEdit {
-            background: rgba(30,30,40,0.95);
-            border-radius: 8px;
-            border: 1px solid rgba(108, 99, 255, 0.6);
-            color: #fff;
-            padding: 4px 8px;
-        }
-        QComboBox:hover, QLineEdit:hover, QTextEdit:hover {
-            border: 1px solid rgba(126, 118, 255, 0.8);
-        }
-        QComboBox:focus, QLineEdit:focus, QTextEdit:focus {
-            border: 1px solid rgba(126, 118, 255, 1.0);
-        }
-        QComboBox QAbstractItemView {
-            background: #23234a;
-            color: #fff;
-            selection-background-color: rgba(108, 99, 255, 0.7);
-            selection-color: #fff;
-            border: 1px solid rgba(108, 99, 255, 0.4);
-            border-radius: 4px;
-        }
-        QTextEdit {
-            min-height: 160px;
-            font-size: 16px;
-            padding: 18px;
-        }
-        QPushButton, QToolButton {
-            background: rgba(35, 35, 50, 0.95);
-            border-radius: 8px;
-            border: 1px solid rgba(108, 99, 255, 0.6);
-            color: #fff;
-            font-weight: 500;
-            padding: 8px 16px;
-            margin: 4px;
-        }
-        QPushButton:hover, QToolButton:hover {
-            background: rgba(45, 45, 65, 0.95);
-            border: 1px solid rgba(126, 118, 255, 0.8);
-        }
-        QPushButton:pressed, QToolButton:pressed {
-            background: rgba(30, 30, 45, 0.95);
-        }
-        QPushButton:disabled, QToolButton:disabled {
-            background: rgba(30, 30, 45, 0.5);
-            border: 1px solid rgba(80, 80, 100, 0.3);
-            color: #666;
-        }
-        QPushButton#GenerateButton {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 rgba(108, 99, 255, 0.7), stop:1 rgba(58, 28, 113, 0.7));
-            color: #fff;
-            font-size: 16px;
-            font-weight: bold;
-            border: none;
-            padding: 10px 20px;
-        }
-        QPushButton#GenerateButton:hover {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 rgba(126, 118, 255, 0.8), stop:1 rgba(68, 38, 133, 0.8));
-        }
-        QPushButton#GenerateButton:pressed {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 rgba(98, 89, 235, 0.9), stop:1 rgba(48, 18, 103, 0.9));
-        }
-        QSlider::groove:horizontal {
-            border: 1px solid rgba(60, 63, 84, 0.8);
-            height: 6px;
-            background: rgba(40, 43, 56, 0.8);
-            border-radius: 3px;
-        }
-        QSlider::handle:horizontal {
-            background: rgba(108, 99, 255, 0.8);
-            border: 1px solid rgba(108, 99, 255, 0.4);
-            width: 14px;
-            margin: -4px 0;
-            border-radius: 7px;
-        }
-        QSlider::handle:horizontal:hover {
-            background: rgba(126, 118, 255, 0.9);
-        }
-        QProgressBar {
-            background: rgba(35, 35, 50, 0.8);
-            border-radius: 4px;
-            text-align: center;
-            color: #fff;
-            font-size: 12px;
-        }
-        QProgressBar::chunk {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                                        stop:0 rgba(108, 99, 255, 0.7), 
-                                        stop:1 rgba(126, 118, 255, 0.7));
-            border-radius: 4px;
-        }
-        QFrame#topBar {
-            background-color: rgba(25, 28, 37, 0.95);
-            border-radius: 10px;
-            border: 1px solid rgba(60, 63, 84, 0.6);
-        }
-        QFrame#leftPanel, QFrame#rightPanel {
-            background-color: rgba(30, 33, 45, 0.85);
-            border-radius: 10px;
-            border: 1px solid rgba(60, 63, 84, 0.6);
-        }
-        """
+        # Everything the first frame does not need runs once the event loop is up
+        self.startup_finished = False
+        QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """Work deferred until the window is on screen: directories, model scan, engine, slow imports"""
+        if self.startup_finished:
+            return
+        ensure_directories()
+        threading.Thread(target=self.open_synthesis_cache, daemon=True).start()
+        self.inventory.scan()
+        self.watch_model_directories()
+        self.refresh_download_markers()
+        self.update_sample_button_state()
+        self.update_speakers()
+        STARTUP.mark("scan models")
+        
+        try:
+            self.worker_pool = create_engine(
+                SYNTHESIS_ENGINE,
+                self.piper_exe,
+                OUTPUT_DIR,
+                workers_per_model=PIPER_WORKERS_PER_MODEL,
+                idle_timeout=PIPER_IDLE_TIMEOUT,
+                memory_budget=PIPER_MEMORY_BUDGET,
+            )
+        except RuntimeError as e:
+            # Voices can still be browsed and downloaded without an engine
+            self.worker_pool = None
+            QMessageBox.warning(self, "Speech engine unavailable", f"{e}\n\nSpeech generation is disabled.")
+        STARTUP.mark("start engine")
         
+        try:
+            self.output_store = OutputStore(OUTPUT_STORE_DIR, OUTPUT_STORE_SIZE, OUTPUT_STORE_MAX_AGE_DAYS)
+            threading.Thread(target=self.output_store.prune, daemon=True).start()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Log: Output store unavailable: {e}")
+        STARTUP.mark("open output store")
+        
+        # numpy (waveform peaks) is imported on a background thread before the first Generate needs it
+        threading.Thread(target=peaks_available, daemon=True).start()
+        self.startup_finished = True
+    
+    def make_button(self, text, slot, object_name=None, enabled=True, tooltip=None):
+        button = QPushButton(text)
+        if object_name:
+            button.setObjectName(object_name)
+        if tooltip:
+            button.setToolTip(tooltip)
+        button.setEnabled(enabled)
+        button.clicked.connect(slot)
+        return button
+    
+    def make_label(self, text, object_name=None):
+        label = QLabel(text)
+        if object_name:
+            label.setObjectName(object_name)
+        return label
+    
     def init_ui(self):
-        """Initialize the user interface"""
+        """Initialize the user interface; its look comes from APP_STYLESHEET via object names"""
         # Main widget and layout
         main_widget = QWidget()
+        main_widget.setObjectName("central")
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(20, 20, 20, 20)
         main_layout.setSpacing(15)
@@ -290,50 +970,14 @@ class SUZAVoiceStudio(QMainWindow):
         # Top bar - Logo and App Name
         top_bar = QFrame()
         top_bar.setObjectName("topBar")
-        top_bar.setStyleSheet("""
-            #topBar {
-                background-color: rgba(25, 28, 37, 0.9);
-                border-radius: 10px;
-                border: 1px solid rgba(60, 63, 84, 0.6);
-            }
-        """)
         top_bar.setMinimumHeight(60)
         top_bar.setMaximumHeight(60)
         top_bar_layout = QHBoxLayout(top_bar)
         
-        # App title
-        app_title = QLabel("SUZA Voice Studio")
-        app_title.setStyleSheet("""
-            font-size: 24px; 
-            font-weight: 600; 
-            color: #FFFFFF;
-            letter-spacing: 1px;
-        """)
-        
-        # Add "See More Info" button
-        more_info_btn = QPushButton("See More Info")
+        # App title and "See More Info" button
+        more_info_btn = self.make_button("See More Info", self.open_more_info, "moreInfoButton")
         more_info_btn.setCursor(Qt.PointingHandCursor)
-        more_info_btn.setStyleSheet("""
-            QPushButton {
-                background-color: rgba(108, 99, 255, 0.7);
-                color: white;
-                border: none;
-                border-radius: 6px;
-                padding: 4px 10px;
-                font-size: 13px;
-                font-weight: 500;
-                max-width: 120px;
-            }
-            QPushButton:hover {
-                background-color: rgba(126, 118, 255, 0.9);
-            }
-            QPushButton:pressed {
-                background-color: rgba(90, 82, 235, 0.9);
-            }
-        """)
-        more_info_btn.clicked.connect(self.open_more_info)
-        
-        top_bar_layout.addWidget(app_title)
+        top_bar_layout.addWidget(self.make_label("SUZA Voice Studio", "appTitle"))
         top_bar_layout.addStretch()
         top_bar_layout.addWidget(more_info_btn)
         
@@ -344,478 +988,159 @@ class SUZAVoiceStudio(QMainWindow):
         # Left panel for voice selection
         left_panel = QFrame()
         left_panel.setObjectName("leftPanel")
-        left_panel.setStyleSheet("""
-            #leftPanel {
-                background-color: rgba(30, 33, 45, 0.8);
-                border-radius: 10px;
-                border: 1px solid rgba(60, 63, 84, 0.6);
-            }
-        """)
         left_panel.setMinimumWidth(300)
         left_panel.setMaximumWidth(340)
-        left_panel_layout = QVBoxLayout(left_panel)
-        left_panel_layout.setContentsMargins(15, 15, 15, 15)
+        self.left_panel_layout = QVBoxLayout(left_panel)
+        self.left_panel_layout.setContentsMargins(15, 15, 15, 15)
         
         # Voice control panel
         voice_group = QGroupBox("Voice Selection")
-        voice_group.setStyleSheet("""
-            QGroupBox {
-                font-size: 16px;
-                font-weight: bold;
-                color: #FFFFFF;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                subcontrol-position: top center;
-                padding: 0 5px;
-            }
-        """)
         voice_layout = QVBoxLayout(voice_group)
         voice_layout.setSpacing(10)
         
-        # Language selection
-        language_layout = QVBoxLayout()
-        language_label = QLabel("Language:")
-        language_label.setStyleSheet("color: #FFFFFF;")
+        # Language, voice and quality selection; the languages come straight from the catalog
         self.language_combo = QComboBox()
-        self.language_combo.addItem("English Great Britain", "en_GB")
-        self.language_combo.addItem("English United States", "en_US")
-        self.language_combo.addItem("Bahasa Indonesia Indonesia", "id_ID")
-        self.language_combo.addItem("Català Spain", "ca_ES")
-        self.language_combo.addItem("Cymraeg Great Britain", "cy_GB")
-        self.language_combo.addItem("Dansk Denmark", "da_DK")
-        self.language_combo.addItem("Deutsch Germany", "de_DE")
-        self.language_combo.addItem("Español Argentina", "es_AR")
-        self.language_combo.addItem("Español Mexico", "es_MX")
-        self.language_combo.addItem("Español Spain", "es_ES")
-        self.language_combo.addItem("Français France", "fr_FR")
-        self.language_combo.addItem("Italiano Italy", "it_IT")
-        self.language_combo.addItem("Kiswahili Democratic Republic of the Congo", "sw_CD")
-        self.language_combo.addItem("Latviešu Latvia", "lv_LV")
-        self.language_combo.addItem("Lëtzebuergesch Luxembourg", "lb_LU")
-        self.language_combo.addItem("Magyar Hungary", "hu_HU")
-        self.language_combo.addItem("Nederlands Belgium", "nl_BE")
-        self.language_combo.addItem("Nederlands Netherlands", "nl_NL")
-        self.language_combo.addItem("Norsk Norway", "no_NO")
-        self.language_combo.addItem("Polski Poland", "pl_PL")
-        self.language_combo.addItem("Português Brazil", "pt_BR")
-        self.language_combo.addItem("Português Portugal", "pt_PT")
-        self.language_combo.addItem("Română Romania", "ro_RO")
-        self.language_combo.addItem("Slovenčina Slovakia", "sk_SK")
-        self.language_combo.addItem("Slovenščina Slovenia", "sl_SI")
-        self.language_combo.addItem("srpski Serbia", "sr_RS")
-        self.language_combo.addItem("Suomi Finland", "fi_FI")
-        self.language_combo.addItem("Svenska Sweden", "sv_SE")
-        self.language_combo.addItem("Tiếng Việt Vietnam", "vi_VN")
-        self.language_combo.addItem("Türkçe Turkey", "tr_TR")
-        self.language_combo.addItem("íslenska Iceland", "is_IS")
-        self.language_combo.addItem("Čeština Czech Republic", "cs_CZ")
-        self.language_combo.addItem("Ελληνικά Greece", "el_GR")
-        self.language_combo.addItem("Русский Russia", "ru_RU")
-        self.language_combo.addItem("украї́нська мо́ва Ukraine", "uk_UA")
-        self.language_combo.addItem("қазақша Kazakhstan", "kk_KZ")
-        self.language_combo.addItem("עברית Israel", "he_IL")
-        self.language_combo.addItem("العربية Jordan", "ar_JO")
-        self.language_combo.addItem("فارسی Iran", "fa_IR")
-        self.language_combo.addItem("नेपाली Nepal", "ne_NP")
-        self.language_combo.addItem("हिन्दी India", "hi_IN")
-        self.language_combo.addItem("తెలుగు India", "te_IN")
-        self.language_combo.addItem("മലയാളം India", "ml_IN")
-        self.language_combo.addItem("ქართული ენა Georgia", "ka_GE")
-        self.language_combo.addItem("简体中文 China", "zh_CN")
+        for language_code, display_name in CATALOG.languages():
+            self.language_combo.addItem(display_name, language_code)
         self.language_combo.currentIndexChanged.connect(self.update_voice_selection)
-        self.language_combo.setStyleSheet("""
-            QComboBox {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                padding: 5px;
-                border-radius: 6px;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-            }
-            QComboBox:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 20px;
-            }
-        """)
-        language_layout.addWidget(language_label)
-        language_layout.addWidget(self.language_combo)
-        
-        # Voice selection
-        voice_list_label = QLabel("Voice:")
-        voice_list_label.setStyleSheet("color: #FFFFFF; margin-top: 10px;")
+        
         self.voice_combo = QComboBox()
+        self.voice_combo.setObjectName("voiceCombo")
         self.voice_combo.setMinimumHeight(30)
-        self.voice_combo.setStyleSheet("""
-            QComboBox {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                padding: 8px;
-                border-radius: 6px;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                font-size: 14px;
-            }
-            QComboBox:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 30px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: rgba(30, 33, 45, 0.9);
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                selection-background-color: rgba(78, 84, 200, 0.6);
-                selection-color: white;
-            }
-        """)
         self.voice_combo.currentIndexChanged.connect(self.update_available_qualities)
         
-        # Quality selection (now appears after voice selection)
-        quality_layout = QVBoxLayout()
-        quality_label = QLabel("Quality:")
-        quality_label.setStyleSheet("color: #FFFFFF; margin-top: 5px;")
         self.quality_combo = QComboBox()
-        self.quality_combo.setStyleSheet("""
-            QComboBox {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                padding: 5px;
-                border-radius: 6px;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-            }
-            QComboBox:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 20px;
-            }
-        """)
-        quality_layout.addWidget(quality_label)
-        quality_layout.addWidget(self.quality_combo)
+        
+        # Speakers of multi-speaker models, read from the model config; hidden for single-speaker models
+        self.speaker_combo = QComboBox()
+        self.speaker_combo.setToolTip("Speaker of a multi-speaker voice")
+        
+        for text, object_name, combo in [("Language:", None, self.language_combo),
+                                         ("Voice:", "voiceLabel", self.voice_combo),
+                                         ("Quality:", "qualityLabel", self.quality_combo),
+                                         ("Speaker:", "speakerLabel", self.speaker_combo)]:
+            label = self.make_label(text, object_name)
+            voice_layout.addWidget(label)
+            voice_layout.addWidget(combo)
+        self.speaker_label = label
+        self.speaker_label.setVisible(False)
+        self.speaker_combo.setVisible(False)
         
         # Sample voice button
-        self.sample_button = QPushButton("▶ Play Sample")
+        self.sample_button = self.make_button("▶ Play Sample", self.sample_button_clicked, "sampleButton", enabled=False)
         self.sample_button.setMinimumHeight(32)
         self.sample_button.setMaximumHeight(32)
-        self.sample_button.clicked.connect(self.sample_button_clicked)
-        self.sample_button.setEnabled(False)
-        self.sample_button.setStyleSheet("""
-            QPushButton {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 6px;
-                padding: 4px;
-                font-weight: 500;
-                font-size: 13px;
-            }
-            QPushButton:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QPushButton:pressed {
-                background-color: rgba(35, 38, 50, 0.8);
-            }
-            QPushButton:disabled {
-                background-color: rgba(35, 38, 50, 0.5);
-                color: #5D6379;
-                border: 1px solid rgba(45, 48, 65, 0.8);
-            }
-        """)
+        voice_layout.addWidget(self.sample_button)
         
         # Custom model selection
-        model_label = QLabel("Or select custom model file:")
-        model_label.setStyleSheet("color: #FFFFFF; margin-top: 15px;")
-        self.model_path_label = QLabel("No model selected")
+        self.model_path_label = self.make_label("No model selected", "modelPathLabel")
         self.model_path_label.setWordWrap(True)
-        self.model_path_label.setStyleSheet("color: #8E95A9;")
-        model_browse_button = QPushButton("Browse...")
-        model_browse_button.clicked.connect(self.browse_model)
+        model_browse_button = self.make_button("Browse...", self.browse_model, "browseButton")
         model_browse_button.setMaximumHeight(28)
-        model_browse_button.setStyleSheet("""
-            QPushButton {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 6px;
-                padding: 4px;
-                font-size: 12px;
-            }
-            QPushButton:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QPushButton:pressed {
-                background-color: rgba(35, 38, 50, 0.8);
-            }
-        """)
-        
         model_browse_layout = QHBoxLayout()
         model_browse_layout.addWidget(self.model_path_label)
         model_browse_layout.addWidget(model_browse_button)
-        
-        # Add components to voice layout
-        voice_layout.addLayout(language_layout)
-        voice_layout.addWidget(voice_list_label)
-        voice_layout.addWidget(self.voice_combo)
-        voice_layout.addLayout(quality_layout)
-        voice_layout.addWidget(self.sample_button)
-        voice_layout.addWidget(model_label)
+        voice_layout.addWidget(self.make_label("Or select custom model file:", "modelLabel"))
         voice_layout.addLayout(model_browse_layout)
         
         # Add to left panel
-        left_panel_layout.addWidget(voice_group)
-        left_panel_layout.addStretch()
+        self.left_panel_layout.addWidget(voice_group)
+        
+        # Prefetch menu, filled when first opened; the download list appears with the first download
+        self.prefetch_button = QToolButton()
+        self.prefetch_button.setObjectName("prefetchButton")
+        self.prefetch_button.setText("⬇ Prefetch voices")
+        self.prefetch_button.setPopupMode(QToolButton.InstantPopup)
+        self.prefetch_button.setToolButtonStyle(Qt.ToolButtonTextOnly)
+        prefetch_menu = QMenu(self.prefetch_button)
+        prefetch_menu.aboutToShow.connect(self.fill_prefetch_menu)
+        self.prefetch_button.setMenu(prefetch_menu)
+        self.left_panel_layout.addWidget(self.prefetch_button)
+        self.left_panel_layout.addStretch()
         
         # Right panel for text input and controls
         right_panel = QFrame()
         right_panel.setObjectName("rightPanel")
-        right_panel.setStyleSheet("""
-            #rightPanel {
-                background-color: rgba(30, 33, 45, 0.8);
-                border-radius: 10px;
-                border: 1px solid rgba(60, 63, 84, 0.6);
-            }
-        """)
         right_panel_layout = QVBoxLayout(right_panel)
         right_panel_layout.setContentsMargins(15, 15, 15, 15)
         
         # Text input section
         text_group = QGroupBox("Text Input")
-        text_group.setStyleSheet("""
-            QGroupBox {
-                font-size: 16px;
-                font-weight: bold;
-                color: #FFFFFF;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                subcontrol-position: top center;
-                padding: 0 5px;
-            }
-        """)
         text_layout = QVBoxLayout(text_group)
-        
-        text_label = QLabel("Enter text to synthesize:")
-        text_label.setStyleSheet("color: #FFFFFF;")
         self.text_edit = QTextEdit()
         self.text_edit.setPlaceholderText("Type or paste text here...")
         self.text_edit.setMinimumHeight(200)
-        self.text_edit.setStyleSheet("""
-            QTextEdit {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 8px;
-                padding: 10px;
-                font-size: 14px;
-            }
-            QTextEdit:focus {
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-        """)
-        
-        text_layout.addWidget(text_label)
+        text_layout.addWidget(self.make_label("Enter text to synthesize:"))
         text_layout.addWidget(self.text_edit)
         
-        # Waveform display (placeholder)
-        self.waveform = QLabel("[waveform]")
-        self.waveform.setAlignment(Qt.AlignCenter)
+        # Waveform of the generated speech; wheel zooms, Shift+wheel scrolls, click seeks
+        self.waveform = WaveformWidget("[waveform]")
+        self.waveform.setObjectName("waveform")
         self.waveform.setMinimumHeight(60)
-        self.waveform.setStyleSheet("""
-            background-color: rgba(25, 28, 37, 0.8);
-            color: #8E95A9;
-            border-radius: 6px;
-            border: 1px solid rgba(60, 63, 84, 0.6);
-            padding: 10px;
-        """)
         text_layout.addWidget(self.waveform)
         
         # Controls section
         controls_group = QGroupBox("Controls")
-        controls_group.setStyleSheet("""
-            QGroupBox {
-                font-size: 16px;
-                font-weight: bold;
-                color: #FFFFFF;
-                margin-top: 20px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                subcontrol-position: top center;
-                padding: 0 5px;
-            }
-        """)
+        controls_group.setObjectName("controlsGroup")
         controls_layout = QVBoxLayout(controls_group)
         
         # Audio player controls
         audio_controls_layout = QHBoxLayout()
-        
-        self.rewind_btn = QPushButton("⏮")
-        self.rewind_btn.setStyleSheet("""
-            QPushButton {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 6px;
-                font-size: 16px;
-                padding: 2px;
-                min-width: 30px;
-                max-width: 30px;
-                max-height: 28px;
-            }
-            QPushButton:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QPushButton:pressed {
-                background-color: rgba(35, 38, 50, 0.8);
-            }
-            QPushButton:disabled {
-                background-color: rgba(35, 38, 50, 0.5);
-                color: #5D6379;
-                border: 1px solid rgba(45, 48, 65, 0.8);
-            }
-        """)
-        self.rewind_btn.clicked.connect(self.rewind_audio)
-        self.rewind_btn.setEnabled(False)
-        
-        self.duration_label = QLabel("00:00")
-        self.duration_label.setStyleSheet("color: #8E95A9; min-width: 60px; text-align: center;")
-        
+        self.rewind_btn = self.make_button("⏮", self.rewind_audio, "rewindButton", enabled=False)
+        self.duration_label = self.make_label("00:00", "durationLabel")
         audio_controls_layout.addWidget(self.rewind_btn)
         audio_controls_layout.addWidget(self.duration_label)
         audio_controls_layout.addStretch()
         
-        # Action buttons
+        # Action buttons: (attribute, text, slot, object name, enabled, tooltip)
         buttons_layout = QHBoxLayout()
-        
-        # Use a purple/indigo accent color from the image
-        accent_color = "rgba(108, 99, 255, 0.9)"
-        hover_color = "rgba(126, 118, 255, 0.9)"
-        pressed_color = "rgba(90, 82, 235, 0.9)"
-        
-        self.generate_btn = QPushButton("Generate Speech")
-        self.generate_btn.clicked.connect(self.generate_speech)
-        self.generate_btn.setMaximumHeight(36)
+        for attribute, text, slot, object_name, enabled, tooltip in [
+            ("generate_btn", "Generate Speech", self.generate_speech, "generateButton", True, None),
+            ("play_btn", "Play", self.play_audio, None, False, None),
+            ("save_btn", "Save As...", self.save_audio, None, False, None),
+            ("export_btn", "Export Files...", self.export_files, None, True,
+             "Copy or transcode several generated WAV files at once"),
+            ("history_btn", "History...", self.show_history, None, True, "Find and replay earlier generations"),
+        ]:
+            button = self.make_button(text, slot, object_name, enabled, tooltip)
+            button.setMaximumHeight(36)
+            setattr(self, attribute, button)
+            buttons_layout.addWidget(button)
         self.generate_btn.setMinimumWidth(120)
-        self.generate_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {accent_color};
-                color: white;
-                border: none;
-                border-radius: 6px;
-                padding: 4px 10px;
-                font-size: 14px;
-                font-weight: 500;
-            }}
-            QPushButton:hover {{
-                background-color: {hover_color};
-            }}
-            QPushButton:pressed {{
-                background-color: {pressed_color};
-            }}
-            QPushButton:disabled {{
-                background-color: rgba(35, 38, 50, 0.5);
-                color: #5D6379;
-            }}
-        """)
-        
-        self.play_btn = QPushButton("Play")
-        self.play_btn.clicked.connect(self.play_audio)
-        self.play_btn.setEnabled(False)
-        self.play_btn.setMaximumHeight(36)
-        self.play_btn.setStyleSheet("""
-            QPushButton {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 6px;
-                padding: 4px 14px;
-                font-size: 13px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QPushButton:pressed {
-                background-color: rgba(35, 38, 50, 0.8);
-            }
-            QPushButton:disabled {
-                background-color: rgba(35, 38, 50, 0.5);
-                color: #5D6379;
-                border: 1px solid rgba(45, 48, 65, 0.8);
-            }
-        """)
-        
-        self.save_btn = QPushButton("Save As...")
-        self.save_btn.clicked.connect(self.save_audio)
-        self.save_btn.setEnabled(False)
-        self.save_btn.setMaximumHeight(36)
-        self.save_btn.setStyleSheet("""
-            QPushButton {
-                background-color: rgba(40, 43, 56, 0.8);
-                color: white;
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 6px;
-                padding: 4px 14px;
-                font-size: 13px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                background-color: rgba(50, 53, 68, 0.8);
-                border: 1px solid rgba(80, 83, 104, 0.8);
-            }
-            QPushButton:pressed {
-                background-color: rgba(35, 38, 50, 0.8);
-            }
-            QPushButton:disabled {
-                background-color: rgba(35, 38, 50, 0.5);
-                color: #5D6379;
-                border: 1px solid rgba(45, 48, 65, 0.8);
-            }
-        """)
-        
-        buttons_layout.addWidget(self.generate_btn)
-        buttons_layout.addWidget(self.play_btn)
-        buttons_layout.addWidget(self.save_btn)
+        
+        # Export format for Save As and Export Files; formats other than WAV need ffmpeg
+        self.format_combo = QComboBox()
+        for export_format in available_formats(self.ffmpeg_exe):
+            self.format_combo.addItem(FORMAT_DISPLAY_NAMES[export_format], export_format)
+        self.format_combo.setToolTip("Export format" if self.ffmpeg_exe else "Install ffmpeg to export FLAC, Opus and MP3")
+        self.format_combo.setMaximumHeight(36)
+        buttons_layout.insertWidget(3, self.format_combo)
+        
+        self.stream_checkbox = QCheckBox("Play while generating")
+        self.stream_checkbox.setToolTip("Start playback with the first rendered sentence; long texts are rendered sentence by sentence")
+        self.stream_checkbox.setChecked(True)
+        buttons_layout.addWidget(self.stream_checkbox)
+        
+        self.silence_spin = QSpinBox()
+        self.silence_spin.setRange(0, 2000)
+        self.silence_spin.setSingleStep(50)
+        self.silence_spin.setValue(DEFAULT_SENTENCE_SILENCE_MS)
+        self.silence_spin.setSuffix(" ms pause")
+        self.silence_spin.setToolTip("Silence inserted between sentences of long texts")
+        buttons_layout.addWidget(self.silence_spin)
+        
+        self.incremental_checkbox = QCheckBox("Re-render edits only")
+        self.incremental_checkbox.setToolTip("Keep the audio of unchanged sentences from the last generation "
+                                             "and synthesize only the edited and new ones")
+        self.incremental_checkbox.setChecked(True)
+        buttons_layout.addWidget(self.incremental_checkbox)
         buttons_layout.addStretch()
         
         # Progress section
         progress_layout = QVBoxLayout()
-        
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                border: 1px solid rgba(60, 63, 84, 0.8);
-                border-radius: 6px;
-                background-color: rgba(25, 28, 37, 0.8);
-                color: white;
-                text-align: center;
-                height: 18px;
-            }
-            QProgressBar::chunk {
-                background-color: rgba(108, 99, 255, 0.9);
-                border-radius: 6px;
-            }
-        """)
-        
-        self.status_label = QLabel("Ready")
-        self.status_label.setStyleSheet("""
-            color: #8E95A9;
-            font-size: 13px;
-            padding: 5px;
-        """)
-        
+        self.status_label = self.make_label("Ready", "statusLabel")
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addWidget(self.status_label)
         
@@ -840,64 +1165,156 @@ class SUZAVoiceStudio(QMainWindow):
         main_widget.setLayout(main_layout)
         self.setCentralWidget(main_widget)
         
-        # Initialize the sample player
-        self.sample_player = QMediaPlayer()
-        
-        # Connect media player signals
-        self.player = QMediaPlayer()
-        self.player.stateChanged.connect(self.handle_player_state_change)
-        
-        # Apply overall window styling
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #121420;
-            }
-        """)
-
+        # Status bar with synthesis cache counters
+        self.cache_stats_label = self.make_label("Cache: loading...", "cacheStats")
+        self.statusBar().addPermanentWidget(self.cache_stats_label)
+        
+        # Voice previews: MP3 samples go through QMediaPlayer, created on the first one played (see
+        # get_sample_player); previews rendered from installed models play from memory through a PcmPlayer
+        self.sample_player = None
+        self.preview_player = PcmPlayer(self)
+        self.preview_player.state_changed.connect(self.handle_sample_playback_state)
+        self.preview_player.error.connect(self.handle_sample_error)
+        self.preview_cache = PreviewCache(SAMPLES_DIR, CATALOG, ffmpeg_exe=self.ffmpeg_exe)
+        self.synthesis_signals.preview_finished.connect(self.preview_rendered)
+        self.pending_preview = None  # path of the preview being rendered for the sample button
+        
+        # Samples of the selected language are fetched in the background, once the language stays selected
+        self.sample_prefetch_timer = QTimer(self)
+        self.sample_prefetch_timer.setSingleShot(True)
+        self.sample_prefetch_timer.setInterval(SAMPLE_PREFETCH_DELAY_MS)
+        self.sample_prefetch_timer.timeout.connect(self.prefetch_samples)
+        self.language_combo.currentIndexChanged.connect(self.sample_prefetch_timer.start)
+        
+        # Player for generated speech, fed straight from memory
+        self.player = PcmPlayer(self)
+        self.player.state_changed.connect(self.handle_player_state_change)
+        self.player.position_changed.connect(self.player_position_changed)
+        self.player.error.connect(lambda message: self.status_label.setText(f"Player Error: {message}"))
+        self.player.audio_started.connect(self.record_first_audio)
+        self.waveform.seek_requested.connect(self.seek_audio)
+        
+        # Debug overlay with stage timings, built the first time F12 is pressed
+        self.metrics_overlay = None
+        QShortcut(QKeySequence(Qt.Key_F12), self, self.toggle_metrics_overlay)
+    
+    def fill_prefetch_menu(self):
+        """Build the prefetch menu the first time it opens"""
+        menu = self.prefetch_button.menu()
+        if not menu.isEmpty():
+            return
+        menu.addAction("All voices of this language",
+                       lambda: self.prefetch_voices(self.language_combo.currentData()))
+        menu.addAction("All voices of this language, every quality",
+                       lambda: self.prefetch_voices(self.language_combo.currentData(), all_qualities=True))
+        menu.addSeparator()
+        for quality_id in QUALITIES:
+            menu.addAction(f"All {QUALITY_DISPLAY_NAMES[quality_id]} quality voices",
+                           lambda quality_id=quality_id: self.prefetch_voices(quality=quality_id))
+        menu.addSeparator()
+        menu.addAction("Cancel all downloads", lambda: self.jobs.cancel_all("download"))
+    
+    def jobs_panel(self):
+        """The job list below the prefetch button, created when the first job is queued"""
+        if self.jobs_list is None:
+            self.jobs_list = QListWidget()
+            self.jobs_list.setObjectName("jobsList")
+            self.jobs_list.setMaximumHeight(160)
+            self.jobs_list.setContextMenuPolicy(Qt.CustomContextMenu)
+            self.jobs_list.customContextMenuRequested.connect(self.show_job_menu)
+            self.jobs_list.itemDoubleClicked.connect(self.open_job_item)
+            index = self.left_panel_layout.indexOf(self.prefetch_button) + 1
+            self.left_panel_layout.insertWidget(index, self.jobs_list)
+        return self.jobs_list
+    
+    def job_updated(self, job):
+        """Show a job's state in the job list, newest job on top"""
+        if job is self.current_job:
+            # The progress bar follows the sentences of the render being heard
+            self.progress_bar.setValue(job.progress)
+            self.progress_bar.setVisible(job.active)
+            if not job.active:
+                self.current_job = None
+        list_item = self.job_list_items.get(job.id)
+        if list_item is None:
+            list_item = QListWidgetItem()
+            list_item.setData(Qt.UserRole, job.id)
+            self.job_list_items[job.id] = list_item
+            self.jobs_panel().insertItem(0, list_item)
+        list_item.setText(job.summary())
+        if job.active:
+            return
+        self.remove_forgotten_jobs()
+        if job.state == "failed":
+            print(f"Log: Job {job.description} failed: {job.error}")
+            self.status_label.setText(f"Error: {job.description}: {job.error}")
+    
+    def show_job_menu(self, pos):
+        """Context menu of the job list: open, cancel or reprioritize a job"""
+        list_item = self.jobs_list.itemAt(pos)
+        job = self.jobs.get(list_item.data(Qt.UserRole)) if list_item is not None else None
+        menu = QMenu(self)
+        if job is not None:
+            if job.kind == "synthesis" and job.state == "done" and job.result is not None:
+                menu.addAction("Open", lambda: self.open_job(job))
+            if job.active:
+                menu.addAction("Cancel", lambda: self.jobs.cancel(job.id))
+            if job.state == "queued":
+                priority_menu = menu.addMenu("Priority")
+                for priority in PRIORITIES:
+                    action = priority_menu.addAction(
+                        priority.capitalize(), lambda checked, priority=priority: self.jobs.set_priority(job.id, priority))
+                    action.setCheckable(True)
+                    action.setChecked(priority == job.priority)
+            menu.addSeparator()
+        menu.addAction("Cancel all jobs", lambda: self.jobs.cancel_all())
+        menu.addAction("Clear finished", self.clear_finished_jobs)
+        menu.exec_(self.jobs_list.viewport().mapToGlobal(pos))
+    
+    def open_job_item(self, list_item):
+        job = self.jobs.get(list_item.data(Qt.UserRole))
+        if job is not None and job.kind == "synthesis" and job.state == "done" and job.result is not None:
+            self.open_job(job)
+    
+    def open_job(self, job):
+        """Load the audio of a finished render, kept in the history store"""
+        if not os.path.exists(job.result.path):
+            self.status_label.setText(f"Error: {job.description} is no longer in the history")
+            return
+        self.open_history_entry(job.result)
+    
+    def clear_finished_jobs(self):
+        self.jobs.clear_finished()
+        self.remove_forgotten_jobs()
+    
+    def remove_forgotten_jobs(self):
+        """Drop the rows of finished jobs the scheduler no longer keeps"""
+        for job_id in [job_id for job_id in self.job_list_items if self.jobs.get(job_id) is None]:
+            self.jobs_list.takeItem(self.jobs_list.row(self.job_list_items.pop(job_id)))
+    
+    def toggle_metrics_overlay(self):
+        if self.metrics_overlay is None:
+            self.metrics_overlay = MetricsOverlay(self.centralWidget())
+        self.metrics_overlay.toggle()
+    
+    def get_sample_player(self):
+        """QMediaPlayer for voice samples; creating it loads the multimedia backend, so it waits for the first sample"""
+        if self.sample_player is None:
+            from PyQt5.QtMultimedia import QMediaPlayer
+            self.sample_player = QMediaPlayer()
+            self.sample_player.stateChanged.connect(self.handle_sample_playback_state)
+            self.sample_player.error.connect(
+                lambda: self.handle_sample_error(f"Error playing sample: {self.sample_player.errorString()}"))
+        return self.sample_player
+    
     def handle_player_state_change(self, state):
-        if state == QMediaPlayer.PlayingState:
+        if state == PcmPlayer.PlayingState:
             self.play_btn.setText("Pause")
-            self.play_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: rgba(40, 43, 56, 0.8);
-                    color: white;
-                    border: 1px solid rgba(60, 63, 84, 0.8);
-                    border-radius: 6px;
-                    padding: 4px 14px;
-                    font-size: 13px;
-                    font-weight: 500;
-                }
-                QPushButton:hover {
-                    background-color: rgba(50, 53, 68, 0.8);
-                    border: 1px solid rgba(80, 83, 104, 0.8);
-                }
-                QPushButton:pressed {
-                    background-color: rgba(35, 38, 50, 0.8);
-                }
-            """)
             self.rewind_btn.setEnabled(True)
         else:
             self.play_btn.setText("Play")
-            self.play_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: rgba(40, 43, 56, 0.8);
-                    color: white;
-                    border: 1px solid rgba(60, 63, 84, 0.8);
-                    border-radius: 6px;
-                    padding: 4px 14px;
-                    font-size: 13px;
-                    font-weight: 500;
-                }
-                QPushButton:hover {
-                    background-color: rgba(50, 53, 68, 0.8);
-                    border: 1px solid rgba(80, 83, 104, 0.8);
-                }
-                QPushButton:pressed {
-                    background-color: rgba(35, 38, 50, 0.8);
-                }
-            """)
             # Keep rewind enabled even when paused
-            if state == QMediaPlayer.StoppedState:
+            if state == PcmPlayer.StoppedState:
                 self.rewind_btn.setEnabled(False)
     
     def populate_model_selection(self):
@@ -909,15 +1326,15 @@ class SUZAVoiceStudio(QMainWindow):
         # Connect combo boxes
         self.voice_combo.currentIndexChanged.connect(self.update_sample_button_state)
         self.quality_combo.currentIndexChanged.connect(self.update_sample_button_state)
+        self.quality_combo.currentIndexChanged.connect(self.update_speakers)
         
     def update_voice_selection(self):
         """Update the voice dropdown based on the selected language"""
         self.voice_combo.clear()
         language_code = self.language_combo.currentData()
         
-        if language_code in MODEL_REPOSITORY:
-            for voice_id, voice_info in MODEL_REPOSITORY[language_code].items():
-                self.voice_combo.addItem(voice_info["name"], voice_id)
+        for voice_id, voice_name in CATALOG.voices(language_code):
+            self.voice_combo.addItem(self.voice_display_name(language_code, voice_id, voice_name), voice_id)
         
         # Update sample button state
         self.update_sample_button_state()
@@ -935,45 +1352,98 @@ class SUZAVoiceStudio(QMainWindow):
         if not voice_id:
             return
             
-        if language_code in MODEL_REPOSITORY and voice_id in MODEL_REPOSITORY[language_code]:
-            voice_info = MODEL_REPOSITORY[language_code][voice_id]
-            
-            if "qualities" in voice_info:
-                # Get available qualities
-                available_qualities = list(voice_info["qualities"].keys())
-                
-                # Add quality options with user-friendly display names
-                for quality_id in QUALITIES:
-                    if quality_id in available_qualities:
-                        if quality_id == "x_low":
-                            display_name = "Extra Low"
-                        elif quality_id == "low":
-                            display_name = "Low"
-                        elif quality_id == "medium":
-                            display_name = "Medium"
-                        elif quality_id == "high":
-                            display_name = "High"
-                        else:
-                            display_name = quality_id.capitalize()
-                        
-                        self.quality_combo.addItem(display_name, quality_id)
-                
-                # Set appropriate default quality
-                if "medium" in available_qualities:
-                    self.quality_combo.setCurrentText("Medium")
-                elif "high" in available_qualities:
-                    self.quality_combo.setCurrentText("High")
-                elif "low" in available_qualities:
-                    self.quality_combo.setCurrentText("Low")
-                elif "x_low" in available_qualities:
-                    self.quality_combo.setCurrentText("Extra Low")
-                elif available_qualities:
-                    # If none of the standard qualities are available, use the first one
-                    first_quality = available_qualities[0]
-                    self.quality_combo.setCurrentText(first_quality.capitalize())
-                
+        # Add quality options with user-friendly display names
+        for quality_id in CATALOG.qualities(language_code, voice_id):
+            self.quality_combo.addItem(self.quality_display_name(language_code, voice_id, quality_id), quality_id)
+        
+        # Set appropriate default quality
+        default_index = self.quality_combo.findData(CATALOG.default_quality(language_code, voice_id))
+        if default_index >= 0:
+            self.quality_combo.setCurrentIndex(default_index)
+        
         # Clear any custom model when voice changes
         self.clear_custom_model_on_dropdown_change()
+        self.update_speakers()
+    
+    def current_model_path(self):
+        """The custom model if one was picked, otherwise the model of the selected voice and quality"""
+        if self.model_path:
+            return self.model_path
+        voice_id = self.voice_combo.currentData()
+        if not voice_id:
+            return None
+        return CATALOG.resolve(self.language_combo.currentData(), voice_id, self.quality_combo.currentData())[1]
+    
+    def update_speakers(self):
+        """Offer the speakers of the current model, keeping the selected one when the model has it"""
+        model_path = self.current_model_path()
+        speakers = model_speakers(model_path) if model_path else []
+        selected = self.speaker_combo.currentData()
+        self.speaker_combo.blockSignals(True)
+        self.speaker_combo.clear()
+        for name, speaker_id in speakers:
+            label = name if name == str(speaker_id) else f"{name} ({speaker_id})"
+            self.speaker_combo.addItem(label, speaker_id)
+        index = self.speaker_combo.findData(selected)
+        self.speaker_combo.setCurrentIndex(max(index, 0))
+        self.speaker_combo.blockSignals(False)
+        self.speaker_label.setVisible(bool(speakers))
+        self.speaker_combo.setVisible(bool(speakers))
+    
+    def selected_speaker(self):
+        """Speaker id to render with, or None for single-speaker models"""
+        return self.speaker_combo.currentData() if self.speaker_combo.count() else None
+    
+    def voice_display_name(self, language_code, voice_id, voice_name):
+        if CATALOG.downloaded_qualities(language_code, voice_id):
+            return voice_name + DOWNLOADED_MARKER
+        return voice_name
+    
+    def quality_display_name(self, language_code, voice_id, quality_id):
+        display_name = QUALITY_DISPLAY_NAMES.get(quality_id, quality_id.capitalize())
+        if CATALOG.is_downloaded(language_code, voice_id, quality_id):
+            return display_name + DOWNLOADED_MARKER
+        return display_name
+    
+    def refresh_download_markers(self):
+        """Update the downloaded markers in the voice and quality dropdowns without changing the selection"""
+        language_code = self.language_combo.currentData()
+        for index in range(self.voice_combo.count()):
+            voice_id = self.voice_combo.itemData(index)
+            self.voice_combo.setItemText(index, self.voice_display_name(
+                language_code, voice_id, CATALOG.voice_name(language_code, voice_id)))
+        voice_id = self.voice_combo.currentData()
+        for index in range(self.quality_combo.count()):
+            self.quality_combo.setItemText(index, self.quality_display_name(
+                language_code, voice_id, self.quality_combo.itemData(index)))
+    
+    def watch_model_directories(self, below=None):
+        """Watch the models directory and every language/voice directory below it, as found by the inventory scans
+        
+        below limits this to the directories under the given ones, such as those just rescanned.
+        """
+        watched = set(self.models_watcher.directories())
+        if below is None:
+            found = self.inventory.directories()
+        else:
+            found = [path for directory in below for path in self.inventory.directories(directory)]
+        new_directories = [path for path in found if path not in watched]
+        if new_directories:
+            self.models_watcher.addPaths(new_directories)
+    
+    def model_directory_changed(self, path):
+        self.dirty_model_dirs.add(path)
+        self.inventory_timer.start()
+    
+    def rescan_model_directories(self):
+        """Rescan only the directories the watcher reported since the last rescan"""
+        dirty, self.dirty_model_dirs = self.dirty_model_dirs, set()
+        for path in dirty:
+            self.inventory.scan(path)
+        self.watch_model_directories(dirty)
+        self.refresh_download_markers()
+        self.update_speakers()
+        print(f"Log: Rescanned {len(dirty)} model directories")
     
     def clear_custom_model_on_dropdown_change(self):
         """Clear the custom model path when dropdown selections change"""
@@ -1002,149 +1472,116 @@ class SUZAVoiceStudio(QMainWindow):
         if file_path:
             self.model_path = file_path
             self.waveform.setText(os.path.basename(file_path))
+            self.update_speakers()
     
     def get_model_path_for_voice(self, language_code, voice_id):
         """Get the local path for a voice model"""
-        if language_code in MODEL_REPOSITORY and voice_id in MODEL_REPOSITORY[language_code]:
-            voice_info = MODEL_REPOSITORY[language_code][voice_id]
-            
-            # Get current quality selection
-            quality = self.quality_combo.currentData()
-            
-            # Check if this voice has the selected quality
-            if "qualities" in voice_info and quality in voice_info["qualities"]:
-            # Remove query string from filename
-                url = voice_info["qualities"][quality]["url"]
-            filename = os.path.basename(url.split('?', 1)[0])
-            return os.path.join(self.models_dir, language_code, voice_id, filename)
+        # Get current quality selection
+        quality = self.quality_combo.currentData()
+        resolved_quality, model_path = CATALOG.resolve(language_code, voice_id, quality)
+        
+        if model_path is None:
+            self.status_label.setText(f"Error: Could not find model for {voice_id}")
+            return None
+        
+        if resolved_quality != quality:
+            # Update UI to show the selected quality
+            quality_index = self.quality_combo.findData(resolved_quality)
+            if quality_index >= 0:
+                self.quality_combo.setCurrentIndex(quality_index)
             
-            # Quality not available, try to find any available quality
-            if "qualities" in voice_info and voice_info["qualities"]:
-                # Use the first available quality as fallback
-                first_quality = list(voice_info["qualities"].keys())[0]
-                url = voice_info["qualities"][first_quality]["url"]
-                filename = os.path.basename(url.split('?', 1)[0])
-                
-                # Update UI to show the selected quality
-                quality_index = self.quality_combo.findData(first_quality)
-                if quality_index >= 0:
-                    self.quality_combo.setCurrentIndex(quality_index)
-                
-                self.status_label.setText(f"Selected quality not available for {voice_id}, using {first_quality} instead")
-                return os.path.join(self.models_dir, language_code, voice_id, filename)
-        
-        self.status_label.setText(f"Error: Could not find model for {voice_id}")
-        return None
+            self.status_label.setText(f"Selected quality not available for {voice_id}, using {resolved_quality} instead")
+        
+        return model_path
     
     def check_model_downloaded(self, language_code, voice_id):
-        """Check if a model has been downloaded"""
-        model_path = self.get_model_path_for_voice(language_code, voice_id)
-        if model_path:
-            return os.path.exists(model_path)
-        return False
+        """Check if the model for the selected (or fallback) quality has been downloaded"""
+        quality, quality_info = resolve_voice_quality(CATALOG.repository, language_code, voice_id,
+                                                      self.quality_combo.currentData())
+        if quality_info is None:
+            return False
+        return CATALOG.is_downloaded(language_code, voice_id, quality)
     
-    def download_model(self, language_code, voice_id):
-        """Download a model if it's not already downloaded"""
-        if language_code not in MODEL_REPOSITORY or voice_id not in MODEL_REPOSITORY[language_code]:
+    def download_model(self, language_code, voice_id, priority="normal"):
+        """Queue the download of a model that is not on disk yet; returns its job, or None if the voice cannot be downloaded"""
+        voice_info = CATALOG.voice_info(language_code, voice_id)
+        if voice_info is None:
             self.status_label.setText(f"Error: Model {voice_id} not found in repository")
-            return False
+            return None
         
-        voice_info = MODEL_REPOSITORY[language_code][voice_id]
-        
-        # Get selected quality
-        quality = self.quality_combo.currentData()
-        
-        # Check if quality exists for this voice, otherwise use fallback
-        if "qualities" not in voice_info or quality not in voice_info["qualities"]:
-            # Use first available quality as fallback
-            quality = list(voice_info["qualities"].keys())[0]
-            quality_name = quality.capitalize()
-            self.status_label.setText(f"Selected quality not available, using {quality_name} quality instead")
-        
-        model_url = voice_info["qualities"][quality]["url"]
-        config_url = voice_info["qualities"][quality]["config_url"]
+        # Get selected quality, falling back to another one if it is not available
+        quality, quality_info = resolve_voice_quality(CATALOG.repository, language_code, voice_id,
+                                                      self.quality_combo.currentData())
+        if quality_info is None:
+            self.status_label.setText(f"Error: Model {voice_id} has no downloadable qualities")
+            return None
         
         # Get the model path (will handle fallback qualities if needed)
         model_path = self.get_model_path_for_voice(language_code, voice_id)
-        config_path = model_path + ".json"
-        
-        # Show download notification
-        QMessageBox.information(
-            self,
-            "Model Download",
-            f"The model '{voice_info['name']}' needs to be downloaded. This may take a few minutes depending on your internet connection."
-        )
         
-        # Set up progress display
-        self.progress_bar.setValue(0)
-        self.progress_bar.setVisible(True)
-        self.status_label.setText(f"Downloading {voice_info['name']}...")
-        self.generate_btn.setEnabled(False)
-        
-        # Download model file
-        self.download_worker = DownloadWorker(model_url, model_path, voice_info["name"])
-        self.download_thread = threading.Thread(target=self.download_worker.run)
-        
-        # Connect signals
-        self.download_worker.progress.connect(self.update_download_progress)
-        self.download_worker.finished.connect(lambda: self.download_config(config_url, config_path, voice_info['name']))
-        self.download_worker.error.connect(self.handle_download_error)
-        
-        # Start download
-        self.download_thread.start()
-        self.download_threads.append(self.download_thread)
-        
-        return True
+        self.status_label.setText(f"Queued download of {voice_info['name']}")
+        return self.queue_download(model_path, download_files(quality_info, model_path),
+                                   f"{voice_info['name']} ({QUALITY_DISPLAY_NAMES.get(quality, quality)})", priority)
     
-    def download_config(self, config_url, config_path, voice_name):
-        """Download the config file for a model"""
-        self.status_label.setText(f"Downloading configuration for {voice_name}...")
-        
-        try:
-            response = requests.get(config_url)
-            response.raise_for_status()
-            
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(config_path), exist_ok=True)
-            
-            with open(config_path, 'wb') as file:
-                file.write(response.content)
-            
-            self.download_complete(voice_name)
-        except Exception as e:
-            self.handle_download_error(str(e))
+    def queue_download(self, model_path, files, description, priority="normal"):
+        """Queue a model download as a job; a model already queued or downloading returns its job"""
+        job = self.download_jobs.get(model_path)
+        if job is not None and job.active:
+            if PRIORITIES.index(priority) < PRIORITIES.index(job.priority):
+                self.jobs.set_priority(job.id, priority)
+            return job
+        job = Job("download", description,
+                  lambda job: self.download_manager.enqueue(model_path, files, description),
+                  priority=priority, cancel=lambda job: self.download_manager.cancel(model_path))
+        self.download_jobs[model_path] = job
+        return self.jobs.submit(job)
     
-    def update_download_progress(self, progress):
-        """Update the progress bar during download"""
-        self.progress_bar.setValue(progress)
+    def prefetch_voices(self, language_code=None, quality=None, all_qualities=False):
+        """Queue every matching model from the repository that is not on disk yet, behind the user's own jobs"""
+        queued = 0
+        for language, voice_id, voice_quality, quality_info, model_path in iter_voice_models(
+                CATALOG.repository, self.models_dir, language_code, quality,
+                exact_quality=quality is not None, all_qualities=all_qualities):
+            if self.inventory.is_installed(model_path):
+                continue
+            voice_name = CATALOG.voice_name(language, voice_id)
+            self.queue_download(
+                model_path,
+                download_files(quality_info, model_path),
+                f"{language} {voice_name} ({QUALITY_DISPLAY_NAMES.get(voice_quality, voice_quality)})",
+                "low",
+            )
+            queued += 1
+        self.status_label.setText(f"Queued {queued} models for download" if queued else "All selected models are already downloaded")
+        print(f"Log: Prefetch queued {queued} models")
     
-    def download_complete(self, voice_name):
-        """Handle completion of model download"""
-        print(f"Log: Download complete for {voice_name}")
-        self.progress_bar.setVisible(False)
-        self.status_label.setText(f"Model {voice_name} downloaded successfully")
-        self.generate_btn.setEnabled(True)
+    def download_item_updated(self, model_path):
+        """Report a download queue change to the model's job"""
+        item = self.download_manager.item(model_path)
+        if item is None:
+            return
         
-        # Proceed with speech generation
-        print(f"Log: Triggering generate_speech after download of {voice_name}")
-        self.generate_speech()
-    
-    def handle_download_error(self, error_message):
-        """Handle errors during model download"""
-        print(f"Log: Download error: {error_message}")
-        self.progress_bar.setVisible(False)
-        self.status_label.setText(f"Error downloading model: {error_message}")
-        self.generate_btn.setEnabled(True)
+        if item.status == "done":
+            self.inventory.refresh(model_path)
+            self.refresh_download_markers()
         
-        QMessageBox.critical(
-            self,
-            "Download Error",
-            f"Failed to download model: {error_message}"
-        )
+        job = self.download_jobs.get(model_path)
+        if job is None or not job.active:
+            return
+        if item.status == "downloading":
+            self.jobs.progress(job, item.percent)
+        elif item.status == "done":
+            print(f"Log: Download complete for {item.description}")
+            self.jobs.finish(job)
+        elif item.status == "failed":
+            self.jobs.finish(job, item.error or "Download failed")
+        elif item.status == "cancelled":
+            self.jobs.cancel(job.id)
     
     def generate_speech(self):
-        """Generate speech using the Piper TTS engine"""
+        """Queue a render of the text with the selected voice; it starts as soon as the renders ahead of it finish"""
         print("Log: generate_speech called")
+        request_started = time.perf_counter()
         # Get the text to synthesize
         text_to_synthesize = self.text_edit.toPlainText().strip()
         if not text_to_synthesize:
@@ -1153,6 +1590,11 @@ class SUZAVoiceStudio(QMainWindow):
             return
         print(f"Log: Text to synthesize: '{text_to_synthesize[:50]}...'")
         
+        self.finish_startup()
+        if self.worker_pool is None:
+            self.status_label.setText("Error: No speech engine available (install Piper or onnxruntime)")
+            return
+        
         # Generate a unique filename based on voice and text
         language_code = self.language_combo.currentData()
         voice_id = self.voice_combo.currentData()
@@ -1170,10 +1612,11 @@ class SUZAVoiceStudio(QMainWindow):
         # Format: voice_textexcerpt_timestamp.wav
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{voice_id}_{text_part}_{timestamp}.wav"
-        self.output_file = os.path.join(OUTPUT_DIR, filename)
         
         # Get the model path
+        resolve_started = time.perf_counter()
         current_model_path = self.model_path # Use a local variable for clarity in this function
+        download_job = None
         if not current_model_path:
             print("Log: No custom model path set, using selected voice.")
             
@@ -1184,167 +1627,507 @@ class SUZAVoiceStudio(QMainWindow):
             print(f"Log: Selected language: {language_code}, voice: {voice_id}")
             
             if not self.check_model_downloaded(language_code, voice_id):
-                print(f"Log: Model for {language_code}/{voice_id} not downloaded. Starting download.")
-                self.download_model(language_code, voice_id)
-                return 
+                # The render waits in the queue for the download, which goes ahead of prefetched models
+                print(f"Log: Model for {language_code}/{voice_id} not downloaded. Queueing download.")
+                download_job = self.download_model(language_code, voice_id, priority="high")
+                if download_job is None:
+                    return
             
             current_model_path = self.get_model_path_for_voice(language_code, voice_id)
             print(f"Log: Using downloaded model: {current_model_path}")
         else:
             print(f"Log: Using custom model path: {current_model_path}")
         
-        if not current_model_path or not os.path.exists(current_model_path):
+        if not current_model_path or (download_job is None and not os.path.exists(current_model_path)):
             self.status_label.setText(f"Error: Model file not found at {current_model_path}")
             print(f"Log: Error - Model file not found at {current_model_path}")
             return
-        
-        self.status_label.setText("Generating speech...")
-        self.generate_btn.setEnabled(False)
-        print("Log: UI updated - 'Generating speech...', button disabled.")
-        
-        # No longer creating a temporary file for text input.
-        # self.temp_path will not be used with stdin approach.
-        if hasattr(self, 'temp_path') and self.temp_path:
-             # Clean up any old temp file if it exists from previous runs/logic
+        METRICS.record_stage("model_resolution", time.perf_counter() - resolve_started)
+        
+        # Everything the render needs is taken from the window now, so later changes do not affect queued jobs
+        spec = {
+            "text": text_to_synthesize,
+            "model_path": current_model_path,
+            "output_file": os.path.join(OUTPUT_DIR, filename),
+            "stream": self.stream_checkbox.isChecked(),
+            "incremental": self.incremental_checkbox.isChecked(),
+            "silence_ms": self.silence_spin.value(),
+            "speaker_id": self.selected_speaker(),
+            "render": {
+                "text": text_to_synthesize,
+                "language": None if self.model_path else language_code,
+                "voice": os.path.basename(current_model_path) if self.model_path else voice_id,
+                "quality": None if self.model_path else self.quality_combo.currentData(),
+                "speaker": self.selected_speaker(),
+            },
+        }
+        excerpt = text_to_synthesize if len(text_to_synthesize) <= 40 else text_to_synthesize[:40] + "..."
+        job = self.jobs.submit(Job("synthesis", f'"{excerpt}"', lambda job: self.run_synthesis_job(job, spec),
+                                   cancel=self.cancel_synthesis_job, depends_on=download_job))
+        if job.state == "queued":
+            self.status_label.setText(f"Queued {job.description} ({self.jobs.queued_count('synthesis')} waiting)")
+    
+    def run_synthesis_job(self, job, spec, hashed=False):
+        """Start a queued render once the scheduler gives it a slot; the job ends in finish_synthesis_job"""
+        text_to_synthesize = spec["text"]
+        current_model_path = spec["model_path"]
+        if not os.path.exists(current_model_path):
+            raise FileNotFoundError(f"Model file not found at {current_model_path}")
+        if not hashed and self.synthesis_cache and not self.synthesis_cache.hashes_known(current_model_path):
+            # The cache key needs the model's SHA-256, which reads the whole model the first time;
+            # that happens on a thread and the render continues in model_hashed
+            self.hashing_job = (job, spec)
+            self.status_label.setText(f"Preparing {os.path.basename(current_model_path)}...")
+            threading.Thread(target=self.hash_model, args=(job.id, current_model_path), daemon=True).start()
+            return
+        self.current_job = job
+        self.output_file = spec["output_file"]
+        # Timed from the start of the job, so time spent queued behind other renders is not counted
+        self.request_started = time.perf_counter()
+        self.pending_render = dict(spec["render"])
+        # Playback starts by itself only with streaming on and nothing queued behind this render;
+        # otherwise the wait would include the user
+        autoplay = spec["stream"] and not self.jobs.queued_count("synthesis")
+        self.first_audio_pending = self.request_started if autoplay else None
+        
+        with METRICS.span("text_prep"):
+            # Long texts are rendered sentence by sentence, in parallel, so playback can start early
+            incremental = spec["incremental"]
+            sentences = split_sentences(text_to_synthesize) if spec["stream"] or incremental else []
+            if len(sentences) <= 1:
+                sentences = [text_to_synthesize]
+            
+            # Serve repeated requests straight from the synthesis cache
+            synthesis_params = {}
+            if len(sentences) > 1:
+                synthesis_params["sentence_silence_ms"] = spec["silence_ms"]
+            speaker_id = spec["speaker_id"]
+            if speaker_id is not None:
+                synthesis_params["speaker_id"] = speaker_id
             try:
-                if os.path.exists(self.temp_path):
-                    os.remove(self.temp_path)
-                    print(f"Log: Cleaned up old temp file: {self.temp_path}")
-                self.temp_path = None
-            except Exception as e_clean:
-                print(f"Log: Error cleaning up old temp file {self.temp_path}: {e_clean}")
-
-        # Parameters are removed, use fixed defaults
-        command_args = [
-            "--model", current_model_path,
-            "--output_file", os.path.abspath(self.output_file)
-        ]
+                if self.synthesis_cache is None:
+                    raise OSError("the synthesis cache is still opening")
+                self.pending_cache_key = self.synthesis_cache.key_for(current_model_path, text_to_synthesize, synthesis_params)
+                settings = render_settings(self.synthesis_cache.model_hash(current_model_path), speaker_id,
+                                           synthesis_params.get("sentence_silence_ms", 0))
+            except OSError as e:
+                print(f"Log: Could not compute cache key: {e}")
+                self.pending_cache_key = None
+                settings = None
+            # The history only reuses an earlier render made with the same model, speaker and pauses
+            self.pending_render["settings_key"] = self.pending_cache_key
+            
+            # Sentences unchanged since the last generation are copied from its audio
+            reused = [None] * len(sentences)
+            if incremental and settings and self.segment_map and self.clip is not None and self.clip.complete:
+                for index, segment in enumerate(self.segment_map.plan(sentences, settings)):
+                    if segment:
+                        reused[index] = (self.segment_map.params, self.clip.read(segment["offset"], segment["size"]))
+        reused_count = sum(1 for chunk in reused if chunk)
+        if reused_count:
+            print(f"Log: Reusing {reused_count} of {len(sentences)} sentences from the last generation")
+        else:
+            cached_file = self.synthesis_cache.get(self.pending_cache_key) if self.pending_cache_key else None
+            self.update_cache_stats()
+            if cached_file:
+                print(f"Log: Cache hit for {self.pending_cache_key}, skipping synthesis")
+                self.pending_cache_key = None
+                self.play_cached_audio(cached_file, autoplay)
+                self.finish_synthesis_job(self.store_render(cached_file))
+                return
         
-        print(f"Log: Starting QProcess with: {self.piper_exe} {' '.join(command_args)} (text via stdin)")
+        self.status_label.setText(f"Generating speech... {job.description}")
+        self.waveform.set_pyramid(None)
         
-        piper_dir = os.path.dirname(self.piper_exe)
-        self.process.setWorkingDirectory(piper_dir)
-        print(f"Log: Set QProcess working directory to: {piper_dir}")
-
-        # Connect process signals for monitoring
-        self.process.finished.connect(self.process_finished)
+        self.start_streaming_synthesis(current_model_path, sentences, settings, reused, speaker_id,
+                                       spec["silence_ms"], autoplay)
+    
+    def hash_model(self, job_id, model_path):
+        """Hash a model for the synthesis cache (runs on its own thread)"""
+        try:
+            self.synthesis_cache.hash_model(model_path)
+        except OSError as e:
+            print(f"Log: Could not hash {model_path}: {e}")  # the render goes ahead without the cache
+        self.synthesis_signals.model_hashed.emit(job_id)
+    
+    def model_hashed(self, job_id):
+        """Continue the render that was waiting for its model's hash, unless it was cancelled meanwhile"""
+        if self.hashing_job is None or self.hashing_job[0].id != job_id:
+            return
+        (job, spec), self.hashing_job = self.hashing_job, None
+        if job.state != "running":
+            return
+        try:
+            self.run_synthesis_job(job, spec, hashed=True)
+        except Exception as e:
+            print(f"Log: Job {job.description} failed to start: {e}")
+            self.jobs.finish(job, str(e))
+    
+    def finish_synthesis_job(self, entry=None, error=None):
+        """End the running render's job; entry is its generation in the history store"""
+        if self.current_job is not None:
+            self.jobs.finish(self.current_job, error, result=entry)
+    
+    def cancel_synthesis_job(self, job):
+        """Stop the render in progress, keeping the sentences that already arrived"""
+        self.stream_id += 1  # ignore the sentences still being rendered
+        for future in self.stream_futures:
+            future.cancel()
+        self.stream_futures = []
+        self.stream_chunks = []
+        self.pending_cache_key = None
+        self.pending_render = None
+        self.first_audio_pending = None
+        if self.request_started is not None:
+            METRICS.record_stage("request", time.perf_counter() - self.request_started, outcome="cancelled")
+            self.request_started = None
+        if self.clip is not None and not self.clip.complete:
+            self.clip_finished()
+        print(f"Log: Cancelled render {job.description}")
+        self.status_label.setText(f"Cancelled {job.description}")
 
-        self.process.start(
-            self.piper_exe,
-            command_args
-        )
+    def start_streaming_synthesis(self, model_path, sentences, settings=None, reused=None, speaker_id=None,
+                                  silence_ms=None, autoplay=None):
+        """Render sentences in parallel into an in-memory clip that plays as soon as the first one is ready
         
-        if not self.process.waitForStarted(5000):
-            error_string = self.process.errorString()
-            self.status_label.setText(f"Error starting Piper: {error_string}")
-            print(f"Log: Failed to start QProcess. Error: {error_string}")
-            self.generate_btn.setEnabled(True)
+        reused holds (params, frames) for sentences whose audio is kept from the last clip, None for the rest.
+        """
+        self.stream_id += 1
+        stream_id = self.stream_id
+        reused = reused or [None] * len(sentences)
+        self.stream_chunks = [None] * len(sentences)
+        self.stream_queued = 0
+        self.stream_silence_ms = self.silence_spin.value() if silence_ms is None else silence_ms
+        self.stream_autoplay = self.stream_checkbox.isChecked() if autoplay is None else autoplay
+        self.stream_futures = []
+        self.stream_sentences = sentences
+        self.stream_settings = settings
+        self.stream_layout = []
+        self.segment_map = None
+        self.set_clip(PcmClip())
+        self.play_btn.setEnabled(False)
+        self.save_btn.setEnabled(False)
+        to_render = [index for index, chunk in enumerate(reused) if chunk is None]
+        print(f"Log: Rendering {len(to_render)} of {len(sentences)} sentence(s) through the worker pool")
+        METRICS.increment("sentences_total", len(sentences) - len(to_render), result="reused")
+        METRICS.increment("sentences_total", len(to_render), result="rendered")
+        
+        parallelism = LONG_DOCUMENT_WORKERS if len(to_render) > 1 else None
+        for index in to_render:
+            sentence = sentences[index]
+            try:
+                future = self.worker_pool.submit_pcm(model_path, sentence, speaker_id, parallelism=parallelism)
+            except Exception as e:
+                self.stream_chunk_failed(stream_id, f"Error starting Piper: {e}")
+                return
+            self.stream_futures.append(future)
+            future.add_done_callback(lambda f, i=index: self.emit_chunk_result(stream_id, i, f))
+        for index, chunk in enumerate(reused):
+            if chunk is not None and stream_id == self.stream_id:
+                self.stream_chunk_finished(stream_id, index, chunk)
+    
+    def emit_chunk_result(self, stream_id, index, future):
+        """Forward one rendered sentence to the GUI thread (runs on a pool thread)"""
+        if future.cancelled():
+            return  # its render was cancelled
+        error = future.exception()
+        if error is not None:
+            self.synthesis_signals.chunk_error.emit(stream_id, str(error))
+        else:
+            self.synthesis_signals.chunk_finished.emit(stream_id, index, future.result())
+    
+    def stream_chunk_finished(self, stream_id, index, result):
+        """Append finished sentences to the clip in text order"""
+        if stream_id != self.stream_id:
             return
+        self.stream_chunks[index] = result
         
-        print("Log: QProcess started successfully.")
-        
-        # Write text to piper.exe's stdin
-        print("Log: Writing text to process stdin...")
-        self.process.write(text_to_synthesize.encode('utf-8'))
-        # Close the write channel (stdin) to signal end of input
-        self.process.closeWriteChannel()
-        print("Log: Closed QProcess write channel (stdin) after writing text.")
-
-    def process_finished(self, exit_code, exit_status):
-        print(f"Log: process_finished called. Exit code: {exit_code}, Exit status: {exit_status}")
-        
-        # No temporary file to clean up with stdin approach for text input
-        # The self.temp_path logic was removed from generate_speech for this path.
-
-        self.generate_btn.setEnabled(True)
-        print("Log: Generate button re-enabled.")
+        first_new = self.stream_queued
+        try:
+            while self.stream_queued < len(self.stream_chunks) and self.stream_chunks[self.stream_queued]:
+                params, frames = self.stream_chunks[self.stream_queued]
+                if self.stream_queued and self.stream_silence_ms:
+                    self.append_audio(silence(params, self.stream_silence_ms), params)
+                self.stream_layout.append((self.clip.size, len(frames)))
+                self.append_audio(frames, params)
+                self.stream_queued += 1
+        except ValueError as e:
+            self.stream_chunk_failed(stream_id, f"Could not join sentences: {e}")
+            return
         
-        if exit_code == 0:
-            # Check if the output file was actually created and is not empty
-            output_file_exists = os.path.exists(self.output_file)
-            output_file_size = os.path.getsize(self.output_file) if output_file_exists else 0
-            
-            print(f"Log: Piper process finished successfully. Checking output file: {self.output_file}")
-            print(f"Log: Output file exists: {output_file_exists}, Size: {output_file_size} bytes")
-
-            if output_file_exists and output_file_size > 0:
-                self.status_label.setText("Speech generated successfully")
+        if self.stream_queued > first_new:
+            self.player.data_available()
+            self.waveform.set_pyramid(self.clip_pyramid)
+            if first_new == 0:
                 self.play_btn.setEnabled(True)
-                self.save_btn.setEnabled(True)
-                print("Log: Speech generated successfully. Output file valid. Play/Save buttons enabled.")
+                if self.stream_autoplay:
+                    print("Log: First sentence ready, starting playback")
+                    self.player.play()
+        
+        done = sum(1 for chunk in self.stream_chunks if chunk)
+        self.status_label.setText(f"Generating speech... {done}/{len(self.stream_chunks)} sentences")
+        if self.current_job is not None:
+            self.jobs.progress(self.current_job, done * 100 // len(self.stream_chunks),
+                               f"{done}/{len(self.stream_chunks)} sentences")
+        if done == len(self.stream_chunks):
+            self.finish_streaming_synthesis()
+    
+    def set_clip(self, clip):
+        """Make clip the generated audio that Play and Save work on"""
+        self.clip = clip
+        self.clip_pyramid = None
+        self.player.set_clip(clip)
+        self.waveform.set_pyramid(None)
+    
+    def append_audio(self, frames, params):
+        self.clip.append(frames, params)
+        if not peaks_available():
+            return
+        if self.clip_pyramid is None:
+            self.clip_pyramid = PeakPyramid(params[2], params[0])
+        self.clip_pyramid.append(frames)
+    
+    def finish_streaming_synthesis(self):
+        """Mark the clip complete and remember it in the synthesis cache"""
+        print(f"Log: Rendered {len(self.stream_chunks)} sentence(s), {self.clip.size} bytes of audio")
+        self.stream_chunks = []
+        self.stream_futures = []
+        if self.stream_settings is not None:
+            self.segment_map = SegmentMap(self.stream_settings, self.clip.params)
+            for sentence, (offset, size) in zip(self.stream_sentences, self.stream_layout):
+                self.segment_map.add(sentence, offset, size)
+        cached_file = None
+        if self.pending_cache_key:
+            try:
+                cached_file = self.synthesis_cache.put_frames(self.pending_cache_key, self.clip.frames(), self.clip.params)
+            except OSError as e:
+                print(f"Log: Could not store the result in the synthesis cache: {e}")
+            self.pending_cache_key = None
+            self.update_cache_stats()
+        self.clip_finished()
+        self.finish_synthesis_job(self.store_render(cached_file))
+    
+    def store_render(self, source=None):
+        """Index the finished generation in the output store, copying the cached WAV when there is one
+        
+        Returns the store entry, or None if the generation could not be stored.
+        """
+        render, self.pending_render = self.pending_render, None
+        if self.output_store is None or render is None:
+            return None
+        try:
+            if source:
+                entry = self.output_store.add(source=source, **render)
             else:
-                self.status_label.setText(f"Error: Speech generation reported success, but output file is missing or empty ({self.output_file})")
-                self.play_btn.setEnabled(False)
-                self.save_btn.setEnabled(False)
-                print(f"Log: Error - Piper reported success, but output file d:\Developer\Windows\Piper\output\output.wav is missing or empty.")
+                entry = self.output_store.add(frames=self.clip.frames(), params=self.clip.params, **render)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Log: Could not add the generation to the history: {e}")
+            return None
+        if self.output_store.total_bytes > self.output_store.max_bytes:
+            threading.Thread(target=self.output_store.prune, daemon=True).start()
+        if self.history_dialog is not None and self.history_dialog.isVisible():
+            self.history_dialog.reload()
+        return entry
+    
+    def show_history(self):
+        """Open the list of earlier generations"""
+        self.finish_startup()
+        if self.output_store is None:
+            self.status_label.setText("Error: The generation history is not available")
+            return
+        if self.history_dialog is None:
+            self.history_dialog = HistoryDialog(self.output_store, self)
+            self.history_dialog.entry_activated.connect(self.open_history_entry)
         else:
-            # Try to get more error details if QProcess captured some
-            error_output = self.process.readAllStandardError().data().decode(errors="replace").strip()
-            error_string = self.process.errorString() # QProcess specific error like "crashed"
-            
-            status_message = f"Error: Process exited with code {exit_code} (Status: {exit_status})"
-            if error_output:
-                status_message += f"\nPiper stderr: {error_output}"
-                print(f"Log: Piper stderr on error: {error_output}")
-            if error_string and error_string.lower() != "unknown error": # QProcess error string
-                 status_message += f"\nProcess error: {error_string}"
-                 print(f"Log: QProcess errorString: {error_string}")
-
-            self.status_label.setText(status_message)
-            print(f"Log: Process finished with error. UI updated.")
+            self.history_dialog.reload()
+        self.history_dialog.show()
+        self.history_dialog.raise_()
     
+    def open_history_entry(self, entry):
+        """Load an earlier generation into the player, as if it had just been generated"""
+        if self.current_job is not None:
+            self.status_label.setText(f"Wait for {self.current_job.description} to finish, or cancel it in the job list")
+            return
+        self.output_file = os.path.join(OUTPUT_DIR, os.path.basename(entry.path))
+        self.play_cached_audio(entry.path)
+        self.status_label.setText(f"Loaded from history: {entry.excerpt[:60]}")
+    
+    def play_cached_audio(self, cached_file, autoplay=None):
+        """Load a cached WAV into memory and treat it like freshly generated audio"""
+        try:
+            params, frames = read_wav(cached_file)
+        except (OSError, EOFError, ValueError) as e:
+            self.status_label.setText(f"Error: Could not read cached audio: {e}")
+            return
+        self.set_clip(PcmClip())
+        self.segment_map = None  # sentence boundaries of cached audio are not known
+        # Peaks of a file come from the sidecar next to it, built once through a memory map
+        self.clip_pyramid = self.file_peaks(cached_file)
+        if self.clip_pyramid is None:
+            self.append_audio(frames, params)
+        else:
+            self.clip.append(frames, params)
+        self.clip_finished()
+        if self.stream_checkbox.isChecked() if autoplay is None else autoplay:
+            self.player.play()
+    
+    def file_peaks(self, path):
+        if not peaks_available():
+            return None
+        try:
+            return load_peaks(path)
+        except (OSError, ValueError) as e:
+            print(f"Log: Could not load waveform peaks of {path}: {e}")
+            return None
+    
+    def clip_finished(self):
+        if self.request_started is not None:
+            METRICS.record_stage("request", time.perf_counter() - self.request_started)
+            self.request_started = None
+        self.clip.finish()
+        if self.clip_pyramid is not None:
+            self.clip_pyramid.finish()
+        self.waveform.set_pyramid(self.clip_pyramid)
+        self.player.data_available()
+        self.play_btn.setEnabled(True)
+        self.save_btn.setEnabled(True)
+        self.status_label.setText("Speech generated successfully")
+        print("Log: Speech generated successfully. Play/Save buttons enabled.")
+    
+    def stream_chunk_failed(self, stream_id, error_message):
+        if stream_id != self.stream_id:
+            return
+        self.stream_id += 1  # ignore the remaining sentences of this stream
+        self.stream_chunks = []
+        self.pending_render = None
+        self.process_failed(error_message)
+    
+    def record_first_audio(self):
+        """Time from pressing Generate to the first samples reaching the audio device"""
+        if self.first_audio_pending is not None:
+            METRICS.record_stage("time_to_first_audio", time.perf_counter() - self.first_audio_pending)
+            self.first_audio_pending = None
+    
+    def write_metrics(self):
+        try:
+            METRICS.write(METRICS_FILE)
+        except OSError as e:
+            print(f"Log: Could not write metrics to {METRICS_FILE}: {e}")
+    
+    def player_position_changed(self, position):
+        self.waveform.set_position(position)
+    
+    def seek_audio(self, position):
+        """Jump to a position clicked in the waveform"""
+        if self.player.state() != PcmPlayer.StoppedState:
+            self.player.set_position(position)
+    
+    def process_failed(self, error_message):
+        """Handle a synthesis request that failed inside the worker pool"""
+        print(f"Log: Synthesis failed: {error_message}")
+        if self.request_started is not None:
+            METRICS.record_stage("request", time.perf_counter() - self.request_started, outcome="error")
+            self.request_started = None
+        self.first_audio_pending = None
+        self.pending_cache_key = None
+        self.stream_futures = []
+        self.status_label.setText(f"Error: {error_message}")
+        self.finish_synthesis_job(error=error_message)
+    
+    def open_synthesis_cache(self):
+        """Open the synthesis cache, which lists every cached WAV (runs on its own thread)"""
+        try:
+            cache = SynthesisCache(os.path.join(CACHE_DIR, "synthesis"), SYNTHESIS_CACHE_SIZE)
+        except OSError as e:
+            print(f"Log: Synthesis cache unavailable: {e}")
+            cache = None
+        self.synthesis_signals.cache_opened.emit(cache)
+    
+    def synthesis_cache_opened(self, cache):
+        self.synthesis_cache = cache
+        self.update_cache_stats()
+    
+    def update_cache_stats(self):
+        """Show synthesis cache hit/miss counters in the status bar"""
+        if self.synthesis_cache is None:
+            return
+        self.cache_stats_label.setText(self.synthesis_cache.stats_text())
+
     def play_audio(self):
-        """Play the generated audio"""
-        if self.player.state() == QMediaPlayer.PlayingState:
+        """Play the generated audio from memory"""
+        if self.player.state() == PcmPlayer.PlayingState:
             self.player.pause()
             return
-            
-        abs_output_file = os.path.abspath(self.output_file)
-        print(f"Log: play_audio called. Checking for file: {abs_output_file}")
-        if os.path.exists(abs_output_file) and os.path.getsize(abs_output_file) > 0:
-            print(f"Log: File found for playback: {abs_output_file}")
-            content = QMediaContent(QUrl.fromLocalFile(abs_output_file))
-            if content.isNull():
-                print(f"Log: QMediaContent is null for {abs_output_file}. The file might be corrupted or an unsupported format for QMediaPlayer.")
-                self.status_label.setText(f"Error: Cannot create media content for {os.path.basename(abs_output_file)}. File might be invalid.")
-                return
-
-            self.player.setMedia(content)
-            
-            # Check player status and error
-            if self.player.error() != QMediaPlayer.NoError:
-                print(f"Log: QMediaPlayer error before play: {self.player.errorString()}")
-                self.status_label.setText(f"Player Error: {self.player.errorString()}")
-
-            self.player.play()
-            print(f"Log: Play command issued. Player state: {self.player.state()}")
-        else:
-            print(f"Log: Play audio - file not found or empty at {abs_output_file}")
-            self.status_label.setText(f"Error: Output file not found or empty at {os.path.basename(abs_output_file)}")
+        if self.clip is None or not self.clip.size:
+            self.status_label.setText("Error: No generated audio to play")
+            return
+        self.player.play()
+        print(f"Log: Play command issued. Player state: {self.player.state()}")
     
     def save_audio(self):
-        """Save the generated audio to a user-specified location"""
-        abs_output_file = os.path.abspath(self.output_file)
-        print(f"Log: save_audio called. Checking for file: {abs_output_file}")
-        if not os.path.exists(abs_output_file) or os.path.getsize(abs_output_file) == 0:
-            self.status_label.setText("Error: No audio file to save (missing or empty)")
-            print(f"Log: Save audio - file not found or empty at {abs_output_file}")
+        """Export the generated audio to a user-specified location in the selected format"""
+        if self.clip is None or not self.clip.complete or not self.clip.size:
+            self.status_label.setText("Error: No audio to save")
+            print("Log: Save audio - no finished audio in memory")
             return
         
+        export_format = self.format_combo.currentData()
+        extension = EXPORT_FORMATS[export_format][0]
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save Audio File", "", "WAV Files (*.wav);;All Files (*.*)"
+            self, "Save Audio File", os.path.splitext(self.output_file)[0] + extension,
+            f"{FORMAT_DISPLAY_NAMES[export_format]} Files (*{extension});;All Files (*.*)"
         )
         
         if file_path:
-            # Copy the output file to the selected location
-            try:
-                with open(self.output_file, 'rb') as src_file:
-                    with open(file_path, 'wb') as dst_file:
-                        dst_file.write(src_file.read())
-                
-                self.status_label.setText(f"Audio saved to {file_path}")
-            except Exception as e:
-                self.status_label.setText(f"Error saving audio: {str(e)}")
+            # Written on an export thread so large files do not block the window
+            self.export_batch = [self.export_manager.enqueue(self.clip, file_path, export_format)]
+            # WAVs keep their sentence layout next to them, as documents rendered from the command line do
+            self.export_segment_map = None
+            if export_format == "wav" and self.segment_map:
+                self.export_segment_map = (self.export_batch[0], self.segment_map)
+    
+    def export_files(self):
+        """Copy or transcode several WAV files into one folder in the background"""
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select Files to Export", OUTPUT_DIR, "WAV Files (*.wav)")
+        if not paths:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Export To Folder", os.path.dirname(paths[0]))
+        if not output_dir:
+            return
+        export_format = self.format_combo.currentData()
+        self.export_batch = self.export_manager.enqueue_files(paths, output_dir, export_format)
+        print(f"Log: Exporting {len(paths)} files as {export_format} to {output_dir}")
+    
+    def export_item_updated(self, key):
+        """Summarize the progress of the current export request in the status line"""
+        if not any(item.key == key for item in self.export_batch):
+            return
+        
+        batch = self.export_batch
+        active = [item for item in batch if item.status in ("queued", "exporting")]
+        failed = [item for item in batch if item.status == "failed"]
+        if active:
+            percent = sum(item.percent for item in batch) // len(batch)
+            name = batch[0].description if len(batch) == 1 else f"{len(batch)} files"
+            self.status_label.setText(f"Exporting {name}... {percent}%")
+        elif len(batch) == 1:
+            item = batch[0]
+            if item.status == "done":
+                self.status_label.setText(f"Audio saved to {item.destination}")
+                if self.export_segment_map and self.export_segment_map[0] is item:
+                    try:
+                        self.export_segment_map[1].save(item.destination)
+                    except OSError as e:
+                        print(f"Log: Could not save the segment map: {e}")
+                    self.export_segment_map = None
+            else:
+                self.status_label.setText(f"Error saving audio: {item.error or item.status}")
+        else:
+            done = sum(1 for item in batch if item.status == "done")
+            message = f"Exported {done} of {len(batch)} files to {os.path.dirname(batch[0].destination)}"
+            if failed:
+                message += f" ({failed[0].description}: {failed[0].error})"
+            self.status_label.setText(message)
     
     def check_cuda_support(self):
         """Check if CUDA is available for Piper"""
@@ -1354,31 +2137,38 @@ class SUZAVoiceStudio(QMainWindow):
 
     def reset_fields(self):
         self.text_edit.clear()
-        self.speed_slider.setValue(100)
-        self.pitch_slider.setValue(0)
-        self.emotion_slider.setValue(50)
         self.format_combo.setCurrentIndex(0)
         self.status_label.setText("Ready")
         self.waveform.setText("[waveform]")
 
     def rewind_audio(self):
-        self.player.setPosition(0)
+        self.player.set_position(0)
         self.duration_label.setText("00:00")
 
     def sample_button_clicked(self):
         """Handle sample button clicks with play/stop toggle functionality"""
-        # If player is already playing, stop it
-        if self.sample_player.state() == QMediaPlayer.PlayingState:
-            self.sample_player.stop()
-            self.sample_button.setText("▶ Play Sample")
+        # If a sample is already playing (or being rendered), stop it
+        if self.sample_playing():
+            self.stop_sample()
             self.status_label.setText("Ready")
             return
             
         # Otherwise play the sample
         self.play_voice_sample()
+    
+    def sample_playing(self):
+        return (self.pending_preview is not None or self.preview_player.state() == PcmPlayer.PlayingState
+                or (self.sample_player is not None and self.sample_player.state() == PcmPlayer.PlayingState))
+    
+    def stop_sample(self):
+        self.pending_preview = None
+        self.preview_player.stop()
+        if self.sample_player is not None:
+            self.sample_player.stop()
+        self.sample_button.setText("▶ Play Sample")
 
     def play_voice_sample(self):
-        """Play a sample of the selected voice from local samples folder"""
+        """Play a preview of the selected voice: a local sample, one rendered from the installed model, or the online one"""
         language_code = self.language_combo.currentData()
         voice_id = self.voice_combo.currentData()
         quality = self.quality_combo.currentData()
@@ -1388,46 +2178,77 @@ class SUZAVoiceStudio(QMainWindow):
             return
             
         # Update status
-        voice_name = MODEL_REPOSITORY[language_code][voice_id]["name"] if language_code in MODEL_REPOSITORY and voice_id in MODEL_REPOSITORY[language_code] else voice_id
+        voice_name = CATALOG.voice_name(language_code, voice_id)
         self.status_label.setText(f"Playing sample of {voice_name}...")
         self.sample_button.setText("⏹ Stop")
+        speaker_id = self.selected_speaker()
+        
+        # Samples shipped with the app or fetched earlier, and previews rendered earlier
+        sample_path = self.preview_cache.find(language_code, voice_id, quality, speaker_id)
+        if sample_path:
+            self.play_sample_file(sample_path)
+            return
         
-        # First try to play from local samples
-        sample_path = os.path.join(SAMPLES_DIR, "en", language_code, voice_id, quality, "samples", "speaker_0.mp3")
-        if os.path.exists(sample_path):
+        # An installed model can speak its own preview
+        model_path = CATALOG.model_path(language_code, voice_id, quality)
+        self.finish_startup()
+        if self.worker_pool is not None and CATALOG.is_downloaded(language_code, voice_id, quality):
+            self.status_label.setText(f"Rendering a sample of {voice_name}...")
+            future = self.preview_cache.render(self.worker_pool, model_path, language_code, voice_id, quality, speaker_id)
+            self.pending_preview = self.preview_cache.rendered_path(language_code, voice_id, quality, speaker_id)
+            future.add_done_callback(lambda f, path=self.pending_preview: self.synthesis_signals.preview_finished.emit(
+                path, str(f.exception() or "")))
+            return
+        
+        # Otherwise stream the online sample, and keep a copy for next time
+        sample_url = self.preview_cache.sample_url(language_code, voice_id, speaker_id)
+        if not sample_url:
+            self.stop_sample()
+            self.status_label.setText(f"No sample available for {voice_name}")
+            return
+        from PyQt5.QtMultimedia import QMediaContent
+        self.get_sample_player().setMedia(QMediaContent(QUrl(sample_url)))
+        self.sample_player.play()
+        self.preview_cache.fetch(language_code, [voice_id], speaker_id)
+        print(f"Log: Playing online sample from {sample_url}")
+    
+    def play_sample_file(self, path):
+        """Play a preview from the in-memory cache of decoded clips; MP3s not decoded yet go through QMediaPlayer"""
+        clip = self.preview_cache.cached_clip(path)
+        if clip is None and path.endswith(".wav"):
             try:
-                media_content = QMediaContent(QUrl.fromLocalFile(sample_path))
-                self.sample_player.setMedia(media_content)
-                self.sample_player.play()
-                print(f"Log: Playing local sample from {sample_path}")
+                clip = self.preview_cache.clip(path)
+            except (OSError, EOFError, ValueError) as e:
+                self.handle_sample_error(f"Error playing sample: {e}")
                 return
-            except Exception as e:
-                print(f"Log: Error playing local sample: {str(e)}")
-                # Continue to try online sample if local fails
-            
-        # If local sample not found or failed, try online sample
-        if language_code in MODEL_REPOSITORY and voice_id in MODEL_REPOSITORY[language_code]:
-            voice_info = MODEL_REPOSITORY[language_code][voice_id]
-            
-            # Try to get sample URL for current quality
-            sample_url = voice_info.get("sample_url", "")
-            if sample_url:
-                try:
-                    # Create a QMediaContent from the URL
-                    media_content = QMediaContent(QUrl(sample_url))
-                    self.sample_player.setMedia(media_content)
-                    self.sample_player.play()
-                    print(f"Log: Playing online sample from {sample_url}")
-                    
-                    # Connect error handler
-                    self.sample_player.error.connect(lambda: self.status_label.setText(f"Error playing sample: {self.sample_player.errorString()}"))
-                except Exception as e:
-                    print(f"Log: Error playing online sample: {str(e)}")
-                    self.status_label.setText(f"Error playing sample: {str(e)}")
-            else:
-                self.status_label.setText(f"No sample available for {voice_name}")
+        if clip is not None:
+            self.preview_player.set_clip(clip)
+            self.preview_player.play()
         else:
-            self.status_label.setText(f"No sample available for {voice_name}")
+            from PyQt5.QtMultimedia import QMediaContent
+            self.get_sample_player().setMedia(QMediaContent(QUrl.fromLocalFile(path)))
+            self.sample_player.play()
+            self.preview_cache.decode_in_background(path)  # played from memory next time
+        print(f"Log: Playing local sample from {path}")
+    
+    def preview_rendered(self, path, error_message):
+        """A preview rendered with an installed model is ready; play it unless the user moved on"""
+        if path != self.pending_preview:
+            return
+        self.pending_preview = None
+        if error_message:
+            self.handle_sample_error(f"Error rendering sample: {error_message}")
+            return
+        self.play_sample_file(path)
+    
+    def prefetch_samples(self):
+        """Fetch the online samples of the selected language's voices in the background"""
+        language_code = self.language_combo.currentData()
+        if not language_code:
+            return
+        queued = self.preview_cache.fetch(language_code, [voice_id for voice_id, _ in CATALOG.voices(language_code)])
+        if queued:
+            print(f"Log: Fetching {len(queued)} voice samples for {language_code}")
     
     def handle_sample_error(self, error_message):
         """Handle errors during sample playback"""
@@ -1436,26 +2257,28 @@ class SUZAVoiceStudio(QMainWindow):
         print(f"Log: Sample playback error: {error_message}")
     
     def handle_sample_playback_state(self, state):
-        """Handle sample player state changes"""
-        if state == QMediaPlayer.StoppedState:
+        """Handle sample player state changes; both sample players use QMediaPlayer's state values"""
+        if state == PcmPlayer.StoppedState and not self.sample_playing():
             self.sample_button.setText("▶ Play Sample")
             self.status_label.setText("Ready")
-        elif state == QMediaPlayer.PlayingState:
+        elif state == PcmPlayer.PlayingState:
             self.sample_button.setText("⏹ Stop")
 
     def update_sample_button_state(self):
-        """Update the state of the sample button based on the selected voice"""
+        """Enable the sample button for voices with an online sample or an installed model to render one"""
         language_code = self.language_combo.currentData()
         voice_id = self.voice_combo.currentData()
         
         if language_code and voice_id:
-            # Check for sample URL
-            sample_available = False
-            if language_code in MODEL_REPOSITORY and voice_id in MODEL_REPOSITORY[language_code]:
-                if "sample_url" in MODEL_REPOSITORY[language_code][voice_id]:
-                    sample_available = True
-            
+            voice_info = CATALOG.voice_info(language_code, voice_id)
+            sample_available = bool(voice_info and "sample_url" in voice_info) or \
+                bool(CATALOG.downloaded_qualities(language_code, voice_id))
             self.sample_button.setEnabled(sample_available)
+            # The selected voice's preview is decoded before the sample button is pressed
+            sample_path = self.preview_cache.find(language_code, voice_id, self.quality_combo.currentData(),
+                                                  self.selected_speaker())
+            if sample_path:
+                self.preview_cache.decode_in_background(sample_path)
         else:
             self.sample_button.setEnabled(False)
 
@@ -1463,10 +2286,89 @@ class SUZAVoiceStudio(QMainWindow):
         """Open the SUZA Voice Studio website"""
         webbrowser.open("https://suzagear.com/voicestudio")
 
+    def closeEvent(self, event):
+        """Close the warm Piper processes together with the window"""
+        self.jobs.cancel_all()
+        self.player.stop()
+        self.stop_sample()
+        self.preview_cache.shutdown()
+        self.download_manager.shutdown()
+        self.export_manager.shutdown()
+        if self.output_store is not None:
+            self.output_store.close()
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+        if METRICS_FILE:
+            self.write_metrics()
+        super().closeEvent(event)
+
 def main():
+    # Headless bulk synthesis: python piper_ui.py batch manifest.csv ...
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from piper_batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+    # Long document rendering: python piper_ui.py document book.txt ...
+    if len(sys.argv) > 1 and sys.argv[1] == "document":
+        from piper_document import main as document_main
+        sys.exit(document_main(sys.argv[2:]))
+    # HTTP synthesis server: python piper_ui.py serve --port 5002 ...
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from piper_server import main as server_main
+        sys.exit(server_main(sys.argv[2:]))
+    # Catalog maintenance: python piper_ui.py catalog --update [voices.json]
+    if len(sys.argv) > 1 and sys.argv[1] == "catalog":
+        from piper_catalog import main as catalog_main
+        sys.exit(catalog_main(sys.argv[2:]))
+    # Installed models: python piper_ui.py inventory [--hash]
+    if len(sys.argv) > 1 and sys.argv[1] == "inventory":
+        from piper_inventory import main as inventory_main
+        sys.exit(inventory_main(sys.argv[2:]))
+    # Bulk model download: python piper_ui.py prefetch --language en_US ...
+    if len(sys.argv) > 1 and sys.argv[1] == "prefetch":
+        from piper_download import main as prefetch_main
+        sys.exit(prefetch_main(sys.argv[2:]))
+    # Bulk export: python piper_ui.py export --format flac --output-dir exported output/*.wav
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        from piper_export import main as export_main
+        sys.exit(export_main(sys.argv[2:]))
+    # Generation history: python piper_ui.py store --list --search "chapter one"
+    if len(sys.argv) > 1 and sys.argv[1] == "store":
+        from piper_store import main as store_main
+        sys.exit(store_main(sys.argv[2:]))
+    # Per-host worker/thread/affinity tuning: python piper_ui.py tune [--fake] ...
+    if len(sys.argv) > 1 and sys.argv[1] == "tune":
+        from piper_tuning import main as tune_main
+        sys.exit(tune_main(sys.argv[2:]))
+    # Voice cost measurements: python piper_ui.py benchmark [--fake] ...
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        from piper_benchmark import main as benchmark_main
+        sys.exit(benchmark_main(sys.argv[2:]))
+    
+    # Where start-up time goes: python piper_ui.py --profile-startup
+    profiler = None
+    if "--profile-startup" in sys.argv[1:]:
+        sys.argv.remove("--profile-startup")
+        import cProfile
+        profiler = cProfile.Profile()
+    STARTUP.mark("import modules")
+    if profiler is not None:
+        profiler.enable()
+    
     app = QApplication(sys.argv)
+    app.setStyleSheet(APP_STYLESHEET)
+    STARTUP.mark("create QApplication")
     window = SUZAVoiceStudio()
     window.show()  # Ensure the window is shown
+    STARTUP.mark("show window")
+    
+    if profiler is not None:
+        def report_startup():
+            # Runs once the deferred start-up work queued by the window is done
+            STARTUP.mark("first idle event loop")
+            profiler.disable()
+            print(STARTUP.report(profiler))
+            window.close()
+        QTimer.singleShot(0, report_startup)
     sys.exit(app.exec_())  # Start the Qt event loop
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RangeServer:
+    """Local stand-in for the model host: serves byte strings with HEAD and Range support
+
+    requests records (method, path, Range header) for every request. Faults
+    can be injected per path: drop_after[path] = n sends only n bytes of the
+    next GET before closing the connection, fail_from[path] = {start} answers
+    the next range request starting at that offset with a 500.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        self.accept_ranges = True
+        self.drop_after = {}
+        self.fail_from = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def ranges(self, path):
+        return [range_header for method, request_path, range_header in self.requests
+                if method == "GET" and request_path == path]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.respond(head=True)
+
+            def do_GET(self):
+                self.respond(head=False)
+
+            def respond(self, head):
+                range_header = self.headers.get("Range")
+                with server.lock:
+                    server.requests.append((self.command, self.path, range_header))
+                data = server.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                start, end = 0, len(data)
+                if range_header and server.accept_ranges and not head:
+                    first, _, last = range_header.split("=", 1)[1].partition("-")
+                    start = int(first)
+                    end = int(last) + 1 if last else len(data)
+                    with server.lock:
+                        failing = server.fail_from.get(self.path, set())
+                        if start in failing:
+                            failing.discard(start)
+                            self.send_error(500)
+                            return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                if server.accept_ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start))
+                self.end_headers()
+                if head:
+                    return
+                body = data[start:end]
+                with server.lock:
+                    drop = server.drop_after.pop(self.path, None)
+                if drop is not None:
+                    self.wfile.write(body[:drop])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        return Handler
+
+
+@pytest.fixture
+def range_server():
+    server = RangeServer()
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from piper_audio import write_wav, PEAKS_SUFFIX
+from piper_cache import ModelHashes, SynthesisCache
+
+PARAMS = (1, 2, 22050)
+
+
+@pytest.fixture
+def model(tmp_path):
+    path = tmp_path / "en_US-amy-medium.onnx"
+    path.write_bytes(b"model weights")
+    (tmp_path / "en_US-amy-medium.onnx.json").write_text('{"audio": {"sample_rate": 22050}}')
+    return str(path)
+
+
+@pytest.fixture
+def model_hashes(tmp_path):
+    return ModelHashes(str(tmp_path / "model_hashes.json"))
+
+
+def make_cache(tmp_path, model_hashes, max_bytes=1024 * 1024):
+    return SynthesisCache(str(tmp_path / "cache"), max_bytes, model_hashes=model_hashes)
+
+
+def put(cache, key, size):
+    return cache.put_frames(key, b"\0" * size, PARAMS)
+
+
+def test_key_ignores_whitespace_differences(tmp_path, model, model_hashes):
+    cache = make_cache(tmp_path, model_hashes)
+    assert cache.key_for(model, "Hello  world.\n") == cache.key_for(model, " Hello world.")
+
+
+def test_key_changes_with_text_and_params(tmp_path, model, model_hashes):
+    cache = make_cache(tmp_path, model_hashes)
+    key = cache.key_for(model, "Hello world.", {"length_scale": 1.0})
+    assert cache.key_for(model, "Hello world!", {"length_scale": 1.0}) != key
+    assert cache.key_for(model, "Hello world.", {"length_scale": 1.2}) != key
+    assert cache.key_for(model, "Hello world.", {"length_scale": 1.0}) == key
+
+
+def test_key_changes_with_model_and_config(tmp_path, model, model_hashes):
+    cache = make_cache(tmp_path, model_hashes)
+    key = cache.key_for(model, "Hello world.")
+
+    with open(model + ".json", "w") as f:
+        f.write('{"audio": {"sample_rate": 8000}}')
+    config_key = cache.key_for(model, "Hello world.")
+    assert config_key != key
+
+    with open(model, "wb") as f:
+        f.write(b"retrained weights")
+    assert cache.key_for(model, "Hello world.") not in (key, config_key)
+
+
+def test_model_hashes_are_memoized_across_instances(tmp_path, model, model_hashes):
+    assert not make_cache(tmp_path, model_hashes).hashes_known(model)
+    make_cache(tmp_path, model_hashes).hash_model(model)
+
+    reloaded = ModelHashes(model_hashes.path)
+    assert make_cache(tmp_path, reloaded).hashes_known(model)
+    assert reloaded.known(model) == model_hashes.get(model)
+
+
+def test_fetch_copies_instead_of_sharing_the_file(tmp_path, model_hashes):
+    cache = make_cache(tmp_path, model_hashes)
+    cached = put(cache, "ab" * 32, 1000)
+    output = str(tmp_path / "output.wav")
+
+    assert cache.fetch("ab" * 32, output)
+    assert os.stat(output).st_nlink == 1
+    write_wav(output, b"\1" * 10, PARAMS)
+    assert os.path.getsize(cached) > os.path.getsize(output)
+
+
+def test_miss_and_hit_counters(tmp_path, model_hashes):
+    cache = make_cache(tmp_path, model_hashes)
+    assert cache.get("cd" * 32) is None
+    put(cache, "cd" * 32, 100)
+    assert cache.get("cd" * 32) == cache.path_for("cd" * 32)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_eviction_drops_least_recently_used(tmp_path, model_hashes):
+    cache = make_cache(tmp_path, model_hashes, max_bytes=2500)
+    first, second, third = "01" * 32, "02" * 32, "03" * 32
+    put(cache, first, 1000)
+    put(cache, second, 1000)
+    cache.get(first)  # second is now the least recently used
+    with open(cache.path_for(second) + PEAKS_SUFFIX, "wb") as f:
+        f.write(b"peaks")
+    put(cache, third, 1000)
+
+    assert cache.get(second) is None
+    assert not os.path.exists(cache.path_for(second))
+    assert not os.path.exists(cache.path_for(second) + PEAKS_SUFFIX)
+    assert cache.get(first) and cache.get(third)
+    assert cache.total_bytes <= 2500
+
+
+def test_eviction_keeps_the_newest_entry_even_if_too_large(tmp_path, model_hashes):
+    cache = make_cache(tmp_path, model_hashes, max_bytes=100)
+    put(cache, "04" * 32, 1000)
+    assert cache.get("04" * 32) is not None
+
+
+def test_scan_restores_entries_oldest_first(tmp_path, model_hashes):
+    cache = make_cache(tmp_path, model_hashes)
+    old, new = "05" * 32, "06" * 32
+    put(cache, old, 1000)
+    put(cache, new, 1000)
+    os.utime(cache.path_for(old), (1, 1))
+
+    reopened = make_cache(tmp_path, model_hashes)
+    assert list(reopened.entries) == [old, new]
+    assert reopened.total_bytes == cache.total_bytes
@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+
+import pytest
+import requests
+
+import piper_download
+from piper_download import Downloader, DownloadCancelled, IntegrityError
+
+DATA = bytes(range(256)) * 256  # 64 KiB
+
+
+@pytest.fixture
+def session():
+    # A plain session: no proxies from the environment, no retries hiding injected faults
+    session = requests.Session()
+    session.trust_env = False
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(piper_download, "MIN_SEGMENT_SIZE", 4096)
+
+
+def test_single_download(range_server, session, tmp_path):
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+
+    Downloader(session, segments=1).download(range_server.url("/model.onnx"), path)
+
+    assert open(path, "rb").read() == DATA
+    assert not os.path.exists(path + ".part")
+    assert range_server.ranges("/model.onnx") == [None]
+
+
+def test_segmented_download(range_server, session, tmp_path, small_segments):
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+    progress = []
+
+    Downloader(session, segments=4).download(range_server.url("/model.onnx"), path,
+                                             sha256=hashlib.sha256(DATA).hexdigest(),
+                                             progress=lambda done, total: progress.append((done, total)))
+
+    assert open(path, "rb").read() == DATA
+    assert sorted(range_server.ranges("/model.onnx")) == [
+        "bytes=0-16383", "bytes=16384-32767", "bytes=32768-49151", "bytes=49152-65535"]
+    assert progress[-1] == (len(DATA), len(DATA))
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_small_file_uses_one_connection(range_server, session, tmp_path):
+    range_server.files["/model.onnx.json"] = DATA[:1000]
+    path = str(tmp_path / "model.onnx.json")
+
+    Downloader(session, segments=4).download(range_server.url("/model.onnx.json"), path)
+
+    assert open(path, "rb").read() == DATA[:1000]
+    assert range_server.ranges("/model.onnx.json") == [None]
+
+
+def test_resume_after_dropped_connection(range_server, session, tmp_path, monkeypatch):
+    # Bytes of a read cut short by the drop are lost inside urllib3; whole chunks before it are kept
+    monkeypatch.setattr(piper_download, "DOWNLOAD_CHUNK_SIZE", 1000)
+    range_server.files["/model.onnx"] = DATA
+    range_server.drop_after["/model.onnx"] = 10000
+    path = str(tmp_path / "model.onnx")
+    downloader = Downloader(session, segments=1)
+
+    with pytest.raises(requests.RequestException):
+        downloader.download(range_server.url("/model.onnx"), path)
+    assert os.path.getsize(path + ".part") == 10000
+
+    downloader.download(range_server.url("/model.onnx"), path)
+    assert open(path, "rb").read() == DATA
+    assert range_server.ranges("/model.onnx") == [None, "bytes=10000-"]
+
+
+def test_resume_without_range_support_starts_over(range_server, session, tmp_path):
+    range_server.files["/model.onnx"] = DATA
+    range_server.accept_ranges = False
+    path = str(tmp_path / "model.onnx")
+    with open(path + ".part", "wb") as f:
+        f.write(b"stale" * 100)
+
+    Downloader(session, segments=1).download(range_server.url("/model.onnx"), path)
+
+    assert open(path, "rb").read() == DATA
+    assert range_server.ranges("/model.onnx") == [None]
+
+
+def test_segmented_resume_fetches_only_missing_segment(range_server, session, tmp_path, small_segments):
+    range_server.files["/model.onnx"] = DATA
+    range_server.fail_from["/model.onnx"] = {32768}
+    path = str(tmp_path / "model.onnx")
+    downloader = Downloader(session, segments=4)
+
+    with pytest.raises(requests.HTTPError):
+        downloader.download(range_server.url("/model.onnx"), path)
+    with open(path + ".part.json", encoding="utf-8") as f:
+        saved = json.load(f)["segments"]
+    missing = [f"bytes={start + done}-{end - 1}" for start, end, done in saved if start + done < end]
+    assert "bytes=32768-49151" in missing
+
+    requests_before = len(range_server.ranges("/model.onnx"))
+    downloader.download(range_server.url("/model.onnx"), path)
+
+    assert open(path, "rb").read() == DATA
+    assert sorted(range_server.ranges("/model.onnx")[requests_before:]) == sorted(missing)
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_integrity_failure_discards_partial_file(range_server, session, tmp_path):
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+
+    with pytest.raises(IntegrityError):
+        Downloader(session, segments=1).download(range_server.url("/model.onnx"), path,
+                                                 sha256=hashlib.sha256(b"other").hexdigest())
+
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_size_mismatch_is_an_integrity_failure(range_server, session, tmp_path, small_segments):
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+
+    with pytest.raises(IntegrityError):
+        Downloader(session, segments=4).download(range_server.url("/model.onnx"), path,
+                                                 expected_size=len(DATA) + 1)
+
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_retry_after_integrity_failure_without_ranges(range_server, session, tmp_path, small_segments):
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+    with pytest.raises(IntegrityError):
+        Downloader(session, segments=4).download(range_server.url("/model.onnx"), path,
+                                                 expected_size=len(DATA) + 1)
+
+    range_server.accept_ranges = False
+    Downloader(session, segments=4).download(range_server.url("/model.onnx"), path)
+    assert open(path, "rb").read() == DATA
+
+
+def test_leftover_segment_state_without_part_file(range_server, session, tmp_path):
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+    with open(path + ".part.json", "w", encoding="utf-8") as f:
+        json.dump({"size": len(DATA), "segments": []}, f)
+
+    Downloader(session, segments=1).download(range_server.url("/model.onnx"), path)
+
+    assert open(path, "rb").read() == DATA
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_cancel_keeps_partial_file(range_server, session, tmp_path, monkeypatch):
+    monkeypatch.setattr(piper_download, "DOWNLOAD_CHUNK_SIZE", 4096)
+    range_server.files["/model.onnx"] = DATA
+    path = str(tmp_path / "model.onnx")
+
+    class CancelAfterFirstChunk:
+        calls = 0
+
+        def is_set(self):
+            self.calls += 1
+            return self.calls > 1
+
+    with pytest.raises(DownloadCancelled):
+        Downloader(session, segments=1).download(range_server.url("/model.onnx"), path,
+                                                 cancel_event=CancelAfterFirstChunk())
+
+    assert not os.path.exists(path)
+    assert os.path.getsize(path + ".part") == 4096
@@ -0,0 +1,57 @@
+import os
+import pickle
+import socket
+import threading
+import itertools
+from multiprocessing.connection import Connection
+
+import pytest
+
+import piper_forkserver
+from piper_engine import onnx_available
+from piper_forkserver import ForkServerEngine, ForkedWorker
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork") or not onnx_available(),
+                                reason="the fork-server engine needs os.fork and onnxruntime")
+
+
+def fake_worker(key, pid, reply):
+    """A worker whose process end answers one request with reply(request)"""
+    ours, theirs = socket.socketpair()
+    peer = Connection(theirs.detach())
+
+    def serve():
+        try:
+            request = peer.recv()
+            peer.send_bytes(reply(request))
+        except (EOFError, OSError):
+            pass
+
+    threading.Thread(target=serve, daemon=True).start()
+    return ForkedWorker(key, pid, Connection(ours.detach()))
+
+
+def test_garbled_reply_retires_the_worker(tmp_path, monkeypatch):
+    engine = ForkServerEngine(workers_per_model=1, max_workers=1)
+    replies = iter([lambda request: b"not a pickle",
+                    lambda request: pickle.dumps((True, ((1, 2, 22050), b"\0\0")))])
+    pids = itertools.count(1)
+    spawned = []
+
+    def spawn(key):
+        worker = fake_worker(key, next(pids), next(replies))
+        spawned.append(worker)
+        return worker
+
+    monkeypatch.setattr(engine, "_spawn_worker", spawn)
+    model_path = str(tmp_path / "model.onnx")
+
+    with pytest.raises(pickle.UnpicklingError):
+        engine._synthesize_pcm(model_path, "Hello.", None)
+    assert engine.worker_count() == 0
+
+    # With one worker per model, a leaked checkout would make this wait forever
+    monkeypatch.setattr(piper_forkserver, "CHECKOUT_POLL", 0.05)
+    assert engine._synthesize_pcm(model_path, "Hello.", None) == ((1, 2, 22050), b"\0\0")
+    assert [worker.pid for worker in spawned] == [1, 2]
+    engine.executor.shutdown(wait=False)
@@ -0,0 +1,62 @@
+import os
+
+from piper_inventory import ModelInventory
+
+
+def install(models_dir, language, voice, quality="medium"):
+    directory = os.path.join(models_dir, language, voice)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{language}-{voice}-{quality}.onnx")
+    with open(path, "wb") as f:
+        f.write(b"model")
+    with open(path + ".json", "w") as f:
+        f.write("{}")
+    return path
+
+
+def test_scan_finds_installed_models_and_their_directories(tmp_path):
+    models_dir = str(tmp_path)
+    amy = install(models_dir, "en_US", "amy")
+    os.remove(install(models_dir, "de_DE", "thorsten") + ".json")
+
+    inventory = ModelInventory(models_dir)
+    assert inventory.scan() == 2
+    assert inventory.is_installed(amy)
+    assert [record.path for record in inventory.installed_records()] == [amy]
+    assert sorted(inventory.directories()) == sorted([
+        models_dir, os.path.join(models_dir, "de_DE"), os.path.join(models_dir, "de_DE", "thorsten"),
+        os.path.join(models_dir, "en_US"), os.path.join(models_dir, "en_US", "amy")])
+
+
+def test_rescan_of_one_directory(tmp_path):
+    models_dir = str(tmp_path)
+    amy = install(models_dir, "en_US", "amy")
+    inventory = ModelInventory(models_dir)
+    inventory.scan()
+
+    ryan = install(models_dir, "en_US", "ryan")
+    os.remove(amy)
+    os.remove(amy + ".json")
+    os.rmdir(os.path.dirname(amy))
+    inventory.scan(os.path.join(models_dir, "en_US"))
+
+    assert inventory.is_installed(ryan)
+    assert not inventory.is_installed(amy)
+    assert sorted(inventory.directories(os.path.join(models_dir, "en_US"))) == [
+        os.path.join(models_dir, "en_US"), os.path.join(models_dir, "en_US", "ryan")]
+    assert models_dir in inventory.directories()
+
+
+def test_removed_directory_is_forgotten(tmp_path):
+    models_dir = str(tmp_path)
+    amy = install(models_dir, "en_US", "amy")
+    inventory = ModelInventory(models_dir)
+    inventory.scan()
+
+    for path in (amy, amy + ".json"):
+        os.remove(path)
+    os.rmdir(os.path.dirname(amy))
+    inventory.scan(os.path.dirname(amy))
+
+    assert not inventory.is_installed(amy)
+    assert os.path.dirname(amy) not in inventory.directories()
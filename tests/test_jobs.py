@@ -0,0 +1,142 @@
+from piper_jobs import Job, JobScheduler
+
+
+class Recorder:
+    """Jobs whose run only records the start; the test finishes them"""
+
+    def __init__(self):
+        self.started = []
+        self.cancelled = []
+
+    def job(self, description, kind="render", priority="normal", depends_on=None):
+        return Job(kind, description, run=lambda job: self.started.append(job.description),
+                   priority=priority, depends_on=depends_on, cancel=lambda job: self.cancelled.append(job.description))
+
+
+def running_job(scheduler):
+    return next(job for job in scheduler.active_jobs() if job.state == "running")
+
+
+def test_priority_then_queue_order():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 1})
+    first = scheduler.submit(jobs.job("first"))
+    scheduler.submit(jobs.job("low", priority="low"))
+    scheduler.submit(jobs.job("normal"))
+    scheduler.submit(jobs.job("high", priority="high"))
+
+    for _ in range(3):
+        scheduler.finish(running_job(scheduler))
+    assert first.state == "done"
+    assert jobs.started == ["first", "high", "normal", "low"]
+
+
+def test_limits_per_kind():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 2, "download": 1})
+    for index in range(3):
+        scheduler.submit(jobs.job(f"render {index}"))
+        scheduler.submit(jobs.job(f"download {index}", kind="download"))
+
+    assert jobs.started == ["render 0", "download 0", "render 1"]
+    assert scheduler.queued_count("render") == 1
+    assert scheduler.queued_count("download") == 2
+
+
+def test_set_priority_moves_a_queued_job_ahead():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 1})
+    running = scheduler.submit(jobs.job("running"))
+    scheduler.submit(jobs.job("a"))
+    later = scheduler.submit(jobs.job("b"))
+
+    assert scheduler.set_priority(later.id, "high")
+    scheduler.finish(running)
+    assert jobs.started == ["running", "b"]
+
+
+def test_cancel_queued_job_never_starts_it():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 1})
+    running = scheduler.submit(jobs.job("running"))
+    queued = scheduler.submit(jobs.job("queued"))
+
+    assert scheduler.cancel(queued.id)
+    scheduler.finish(running)
+    assert queued.state == "cancelled"
+    assert jobs.started == ["running"]
+    assert jobs.cancelled == []
+
+
+def test_cancel_running_job_calls_its_cancel_and_starts_the_next():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 1})
+    running = scheduler.submit(jobs.job("running"))
+    scheduler.submit(jobs.job("next"))
+
+    assert scheduler.cancel(running.id)
+    assert jobs.cancelled == ["running"]
+    assert jobs.started == ["running", "next"]
+
+    scheduler.finish(running, error="late report")
+    assert running.state == "cancelled"
+
+
+def test_cancel_all_starts_nothing_new():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 1})
+    scheduler.submit(jobs.job("running"))
+    scheduler.submit(jobs.job("queued 1"))
+    scheduler.submit(jobs.job("queued 2"))
+
+    scheduler.cancel_all()
+    assert jobs.started == ["running"]
+    assert jobs.cancelled == ["running"]
+    assert scheduler.active_jobs() == []
+
+
+def test_dependent_job_waits_and_fails_with_its_dependency():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 2, "download": 1})
+    download = scheduler.submit(jobs.job("download", kind="download"))
+    render = scheduler.submit(jobs.job("render", depends_on=download))
+    assert jobs.started == ["download"]
+
+    scheduler.finish(download, error="404")
+    assert render.state == "failed"
+    assert render.error == "download failed"
+    assert jobs.started == ["download"]
+
+
+def test_dependent_job_starts_when_its_dependency_is_done():
+    jobs = Recorder()
+    scheduler = JobScheduler({"render": 1, "download": 1})
+    download = scheduler.submit(jobs.job("download", kind="download"))
+    scheduler.submit(jobs.job("render", depends_on=download))
+
+    scheduler.finish(download)
+    assert jobs.started == ["download", "render"]
+
+
+def test_job_that_fails_to_start_is_marked_failed():
+    def run(job):
+        raise RuntimeError("no piper.exe")
+
+    scheduler = JobScheduler({"render": 1})
+    job = scheduler.submit(Job("render", "broken", run))
+    assert job.state == "failed"
+    assert job.error == "no piper.exe"
+
+
+def test_synchronous_finish_starts_the_rest():
+    scheduler = JobScheduler({"render": 1})
+    done = []
+
+    def run(job):
+        done.append(job.description)
+        scheduler.finish(job)
+
+    for index in range(3):
+        scheduler.submit(Job("render", f"job {index}", run))
+    assert done == ["job 0", "job 1", "job 2"]
+    assert scheduler.active_jobs() == []
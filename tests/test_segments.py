@@ -0,0 +1,62 @@
+from piper_segments import SegmentMap, render_settings
+
+PARAMS = (1, 2, 22050)
+SENTENCES = ["The first sentence is here.", "Then comes the second one.", "And a third to finish."]
+
+
+def rendered(sentences, settings=None):
+    segment_map = SegmentMap(settings or render_settings("model-hash"), PARAMS)
+    offset = 0
+    for index, sentence in enumerate(sentences):
+        size = (index + 1) * 100
+        segment_map.add(sentence, offset, size)
+        offset += size
+    return segment_map
+
+
+def offsets(plan):
+    return [segment["offset"] if segment else None for segment in plan]
+
+
+def test_unchanged_text_reuses_every_segment():
+    assert offsets(rendered(SENTENCES).plan(SENTENCES, render_settings("model-hash"))) == [0, 100, 300]
+
+
+def test_edited_sentence_is_rendered_again():
+    edited = [SENTENCES[0], "Then comes a changed one.", SENTENCES[2]]
+    assert offsets(rendered(SENTENCES).plan(edited, render_settings("model-hash"))) == [0, None, 300]
+
+
+def test_inserted_moved_and_duplicated_sentences():
+    sentences = [SENTENCES[2], "A brand new sentence.", SENTENCES[0], SENTENCES[2]]
+    assert offsets(rendered(SENTENCES).plan(sentences, render_settings("model-hash"))) == [300, None, 0, 300]
+
+
+def test_whitespace_changes_still_match():
+    sentences = ["The  first sentence\nis here.", SENTENCES[1]]
+    assert offsets(rendered(SENTENCES).plan(sentences, render_settings("model-hash"))) == [0, 100]
+
+
+def test_changed_settings_reuse_nothing():
+    segment_map = rendered(SENTENCES)
+    assert segment_map.plan(SENTENCES, render_settings("other-model")) == [None] * 3
+    assert segment_map.plan(SENTENCES, render_settings("model-hash", speaker_id=2)) == [None] * 3
+    assert segment_map.plan(SENTENCES, render_settings("model-hash", silence_ms=300)) == [None] * 3
+
+
+def test_save_and_load_round_trip(tmp_path):
+    wav_path = str(tmp_path / "doc.wav")
+    segment_map = rendered(SENTENCES)
+    segment_map.save(wav_path)
+
+    loaded = SegmentMap.load(wav_path, data_size=600)
+    assert loaded.params == PARAMS
+    assert offsets(loaded.plan(SENTENCES, render_settings("model-hash"))) == [0, 100, 300]
+
+
+def test_load_rejects_a_map_that_does_not_fit_the_wav(tmp_path):
+    wav_path = str(tmp_path / "doc.wav")
+    rendered(SENTENCES).save(wav_path)
+
+    assert SegmentMap.load(wav_path, data_size=500) is None
+    assert SegmentMap.load(str(tmp_path / "missing.wav")) is None
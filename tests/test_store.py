@@ -0,0 +1,133 @@
+import os
+import time
+import sqlite3
+
+import pytest
+
+from piper_audio import write_wav, PEAKS_SUFFIX
+from piper_store import OutputStore
+
+PARAMS = (1, 2, 22050)
+FRAMES = b"\0" * 2000
+DAY = 86400
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OutputStore(str(tmp_path / "store"), max_bytes=0, max_age_days=0)
+    yield store
+    store.close()
+
+
+def add(store, text, days_old=0, voice="amy", frames=FRAMES, settings_key="settings"):
+    return store.add(text, frames=frames, params=PARAMS, voice=voice, quality="medium",
+                     created=time.time() - days_old * DAY, settings_key=settings_key)
+
+
+def test_same_text_voice_and_settings_is_stored_once(store):
+    first = add(store, "Hello world.", days_old=2)
+    again = add(store, "Hello  world. ")
+
+    assert again.id == first.id
+    assert again.created > first.created
+    assert store.count() == 1
+    assert add(store, "Hello world.", voice="ryan").id != first.id
+
+
+def test_render_with_other_settings_is_stored_again(store):
+    first = add(store, "Hello world.", days_old=1)
+    longer = add(store, "Hello world.", frames=b"\0" * 10000, settings_key="longer pauses")
+
+    assert longer.id != first.id
+    assert longer.duration > first.duration
+    assert store.find("Hello world.", "amy", "medium").id == longer.id
+    assert store.find("Hello world.", "amy", "medium", settings_key="settings").id == first.id
+    assert store.count() == 2
+
+
+def test_render_without_settings_key_is_always_stored(store):
+    first = add(store, "Hello world.", settings_key=None)
+    again = add(store, "Hello world.", frames=b"\0" * 10000, settings_key=None)
+
+    assert again.id != first.id
+    assert store.count() == 2
+
+
+def test_store_without_settings_column_is_upgraded(tmp_path):
+    root = tmp_path / "old"
+    root.mkdir()
+    db = sqlite3.connect(str(root / "index.sqlite"))
+    db.execute("CREATE TABLE renders (id TEXT PRIMARY KEY, path TEXT NOT NULL, text_hash TEXT NOT NULL, "
+               "excerpt TEXT NOT NULL, language TEXT, voice TEXT, quality TEXT, speaker INTEGER, "
+               "duration REAL NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL)")
+    db.commit()
+    db.close()
+
+    store = OutputStore(str(root))
+    entry = add(store, "Hello world.")
+    assert store.get(entry.id).settings_key == "settings"
+    store.close()
+
+
+def test_add_copies_a_source_file(store, tmp_path):
+    source = str(tmp_path / "render.wav")
+    write_wav(source, FRAMES, PARAMS)
+
+    entry = store.add("From a file.", source=source, voice="amy")
+
+    assert os.path.exists(source)
+    assert os.stat(entry.path).st_nlink == 1
+    assert store.find("From a file.", "amy").id == entry.id
+
+
+def test_prune_by_age(store):
+    old = add(store, "Old render.", days_old=40)
+    new = add(store, "New render.", days_old=1)
+    with open(old.path + PEAKS_SUFFIX, "wb") as f:
+        f.write(b"peaks")
+
+    assert store.prune(max_age_days=30) == 1
+
+    assert store.get(old.id) is None
+    assert not os.path.exists(old.path)
+    assert not os.path.exists(old.path + PEAKS_SUFFIX)
+    assert store.get(new.id) is not None
+    assert store.count() == 1
+
+
+def test_prune_by_size_removes_oldest_first(store):
+    entries = [add(store, f"Render number {index}.", days_old=10 - index) for index in range(5)]
+    size = entries[0].size
+
+    assert store.prune(max_bytes=size * 2 + 1) == 3
+
+    assert [entry.id for entry in store.history()] == [entries[4].id, entries[3].id]
+    assert store.total_bytes == size * 2
+    for entry in entries[:3]:
+        assert not os.path.exists(entry.path)
+
+
+def test_prune_within_limits_removes_nothing(store):
+    add(store, "Small render.")
+    assert store.prune(max_bytes=1024 * 1024, max_age_days=30) == 0
+    assert store.count() == 1
+
+
+def test_totals_survive_reopening(store):
+    add(store, "First.")
+    add(store, "Second.")
+    store.prune(max_bytes=store.total_bytes - 1)
+
+    reopened = OutputStore(store.root)
+    assert (reopened.count(), reopened.total_bytes) == (store.count(), store.total_bytes)
+    reopened.close()
+
+
+def test_history_search_and_paging(store):
+    for index in range(5):
+        add(store, f"Chapter {index} text.", days_old=5 - index)
+
+    assert [entry.excerpt for entry in store.history(search="Chapter 3")] == ["Chapter 3 text."]
+    newest = store.history(limit=2)
+    older = store.history(limit=2, before=newest[-1].created)
+    assert [entry.excerpt for entry in newest + older] == [f"Chapter {index} text." for index in (4, 3, 2, 1)]